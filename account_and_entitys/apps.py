@@ -3,3 +3,9 @@ from django.apps import AppConfig
 class AccountAndEntitysConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'account_and_entitys'
+
+    def ready(self):
+        """
+        Register the signals maintaining the entity / account closure tables
+        """
+        from . import signals  # noqa: F401
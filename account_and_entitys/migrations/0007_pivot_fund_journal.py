@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:04
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def snapshot_pivot_funds(apps, schema_editor):
+    """Baseline snapshot of the current balances, the journal starts empty"""
+    PivotFund = apps.get_model('account_and_entitys', 'XX_PivotFund')
+    PivotFundSnapshot = apps.get_model('account_and_entitys', 'XX_PivotFundSnapshot')
+    snapshots = []
+    for fund in PivotFund.objects.all().iterator():
+        snapshots.append(PivotFundSnapshot(
+            entity=str(fund.entity),
+            account=str(fund.account),
+            year=fund.year,
+            encumbrance=fund.encumbrance or Decimal('0'),
+            actual=fund.actual or Decimal('0'),
+            last_movement_id=0,
+        ))
+    PivotFundSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_and_entitys', '0006_alter_xx_account_entity_limit_is_transer_allowed_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XX_PivotFundMovement',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entity', models.CharField(max_length=50)),
+                ('account', models.CharField(max_length=50)),
+                ('year', models.IntegerField(blank=True, null=True)),
+                ('transaction_id', models.IntegerField(blank=True, null=True)),
+                ('transfer_id', models.IntegerField(blank=True, null=True)),
+                ('decide', models.IntegerField(choices=[(0, 'adjustment'), (1, 'submit'), (2, 'approve'), (3, 'reject')])),
+                ('encumbrance_delta', models.DecimalField(decimal_places=2, default=0, max_digits=30)),
+                ('actual_delta', models.DecimalField(decimal_places=2, default=0, max_digits=30)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'XX_PIVOT_FUND_MOVEMENT_XX',
+                'indexes': [models.Index(fields=['entity', 'account', 'year', 'id'], name='XX_PF_MOVE_FUND_IDX'), models.Index(fields=['transaction_id'], name='XX_PF_MOVE_TRX_IDX'), models.Index(fields=['created_at'], name='XX_PF_MOVE_DATE_IDX')],
+            },
+        ),
+        migrations.CreateModel(
+            name='XX_PivotFundSnapshot',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entity', models.CharField(max_length=50)),
+                ('account', models.CharField(max_length=50)),
+                ('year', models.IntegerField(blank=True, null=True)),
+                ('encumbrance', models.DecimalField(decimal_places=2, default=0, max_digits=30)),
+                ('actual', models.DecimalField(decimal_places=2, default=0, max_digits=30)),
+                ('last_movement_id', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'XX_PIVOT_FUND_SNAPSHOT_XX',
+                'indexes': [models.Index(fields=['entity', 'account', 'year', 'created_at'], name='XX_PF_SNAP_FUND_IDX')],
+            },
+        ),
+        migrations.RunPython(snapshot_pivot_funds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:16
+
+from django.db import migrations, models
+
+from public_funtion.hierarchy_closure import rebuild_closure
+
+
+def build_closures(apps, schema_editor):
+    """Closure rows of the existing entity and account trees"""
+    rebuild_closure(
+        apps.get_model('account_and_entitys', 'XX_Entity'),
+        apps.get_model('account_and_entitys', 'XX_EntityClosure'),
+        'entity',
+    )
+    rebuild_closure(
+        apps.get_model('account_and_entitys', 'XX_Account'),
+        apps.get_model('account_and_entitys', 'XX_AccountClosure'),
+        'account',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_and_entitys', '0007_pivot_fund_journal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XX_AccountClosure',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('ancestor', models.CharField(max_length=50)),
+                ('descendant', models.CharField(max_length=50)),
+                ('depth', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'XX_ACCOUNT_CLOSURE_XX',
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='XX_ACCOUNT_CLOSURE_DESC_IDX')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='XX_ACCOUNT_CLOSURE_UNQ')],
+            },
+        ),
+        migrations.CreateModel(
+            name='XX_EntityClosure',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('ancestor', models.CharField(max_length=50)),
+                ('descendant', models.CharField(max_length=50)),
+                ('depth', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'XX_ENTITY_CLOSURE_XX',
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='XX_ENTITY_CLOSURE_DESC_IDX')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='XX_ENTITY_CLOSURE_UNQ')],
+            },
+        ),
+        migrations.RunPython(build_closures, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account_and_entitys', '0008_hierarchy_closure'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XX_EntityScopeGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('generation', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'XX_ENTITY_SCOPE_GENERATION_XX',
+            },
+        ),
+    ]
@@ -24,7 +24,64 @@ class XX_Entity(models.Model):
    
     class Meta:
      db_table = 'XX_Entity_XX'
- 
+
+class XX_EntityClosure(models.Model):
+    """
+    Closure of the XX_Entity tree: one row per (ancestor, descendant) entity
+    code pair, every entity being its own ancestor at depth 0. Maintained by
+    the account_and_entitys signals (see public_funtion.hierarchy_closure).
+    """
+    id = models.BigAutoField(primary_key=True)
+    ancestor = models.CharField(max_length=50)
+    descendant = models.CharField(max_length=50)
+    depth = models.IntegerField()
+
+    def __str__(self):
+        return f"{self.ancestor} > {self.descendant} ({self.depth})"
+
+    class Meta:
+        db_table = 'XX_ENTITY_CLOSURE_XX'
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='XX_ENTITY_CLOSURE_UNQ'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='XX_ENTITY_CLOSURE_DESC_IDX'),
+        ]
+
+class XX_AccountClosure(models.Model):
+    """Closure of the XX_Account tree, see XX_EntityClosure"""
+    id = models.BigAutoField(primary_key=True)
+    ancestor = models.CharField(max_length=50)
+    descendant = models.CharField(max_length=50)
+    depth = models.IntegerField()
+
+    def __str__(self):
+        return f"{self.ancestor} > {self.descendant} ({self.depth})"
+
+    class Meta:
+        db_table = 'XX_ACCOUNT_CLOSURE_XX'
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='XX_ACCOUNT_CLOSURE_UNQ'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='XX_ACCOUNT_CLOSURE_DESC_IDX'),
+        ]
+
+class XX_EntityScopeGeneration(models.Model):
+    """
+    Generation counter of the users' entity scopes: bumped whenever a user
+    ability or the entity tree changes, so every process can tell its cached
+    scopes are stale (see public_funtion.entity_scope_cache)
+    """
+    name = models.CharField(max_length=50, unique=True)
+    generation = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} generation {self.generation}"
+
+    class Meta:
+        db_table = 'XX_ENTITY_SCOPE_GENERATION_XX'
+
 class XX_PivotFund(models.Model):
     """Model representing ADJD pivot funds"""
     entity = models.CharField(max_length=50)
@@ -45,6 +102,64 @@ class XX_PivotFund(models.Model):
         ]
         db_table = 'XX_PivotFund_XX'
  
+class XX_PivotFundMovement(models.Model):
+    """
+    Append-only journal of pivot fund movements: one row per transfer line
+    posted by the ledger (submit, approve or reject) with its deltas, plus
+    adjustments for balances changed outside the ledger
+    """
+    DECIDE_CHOICES = [
+        (0, 'adjustment'),  # imports and manual corrections
+        (1, 'submit'),
+        (2, 'approve'),
+        (3, 'reject'),
+    ]
+    id = models.BigAutoField(primary_key=True)
+    entity = models.CharField(max_length=50)
+    account = models.CharField(max_length=50)
+    year = models.IntegerField(null=True, blank=True)
+    transaction_id = models.IntegerField(null=True, blank=True)  # xx_BudgetTransfer
+    transfer_id = models.IntegerField(null=True, blank=True)  # xx_TransactionTransfer line
+    decide = models.IntegerField(choices=DECIDE_CHOICES)
+    encumbrance_delta = models.DecimalField(max_digits=30, decimal_places=2, default=0)
+    actual_delta = models.DecimalField(max_digits=30, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Movement {self.id}: {self.entity}/{self.account} ({self.get_decide_display()})"
+
+    class Meta:
+        db_table = 'XX_PIVOT_FUND_MOVEMENT_XX'
+        indexes = [
+            models.Index(fields=['entity', 'account', 'year', 'id'], name='XX_PF_MOVE_FUND_IDX'),
+            models.Index(fields=['transaction_id'], name='XX_PF_MOVE_TRX_IDX'),
+            models.Index(fields=['created_at'], name='XX_PF_MOVE_DATE_IDX'),
+        ]
+
+class XX_PivotFundSnapshot(models.Model):
+    """
+    Materialized pivot fund balance as of a journal position: the fund values
+    once every movement up to last_movement_id is applied. Older movements
+    can be compacted away once a snapshot covers them.
+    """
+    id = models.BigAutoField(primary_key=True)
+    entity = models.CharField(max_length=50)
+    account = models.CharField(max_length=50)
+    year = models.IntegerField(null=True, blank=True)
+    encumbrance = models.DecimalField(max_digits=30, decimal_places=2, default=0)
+    actual = models.DecimalField(max_digits=30, decimal_places=2, default=0)
+    last_movement_id = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Snapshot {self.entity}/{self.account} @ {self.last_movement_id}"
+
+    class Meta:
+        db_table = 'XX_PIVOT_FUND_SNAPSHOT_XX'
+        indexes = [
+            models.Index(fields=['entity', 'account', 'year', 'created_at'], name='XX_PF_SNAP_FUND_IDX'),
+        ]
+ 
 class XX_TransactionAudit(models.Model):
     """Model representing ADJD transaction audit records"""
     id = models.AutoField(primary_key=True)
@@ -0,0 +1,81 @@
+"""
+Django signals for XX_Entity and XX_Account
+Keep the hierarchy closure tables in step with the entity / account trees,
+and mark the cached user entity scopes stale when the entity tree changes
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+import logging
+from .models import XX_Account, XX_Entity
+from public_funtion.entity_scope_cache import bump_entity_scope_generation
+from public_funtion.hierarchy_closure import add_node, closure_of, move_node, remove_node
+
+logger = logging.getLogger('hierarchy_closure_signals')
+
+# ============================================================================
+# XX_Entity / XX_Account Signals
+# ============================================================================
+
+
+@receiver(pre_save, sender=XX_Entity)
+@receiver(pre_save, sender=XX_Account)
+def hierarchy_node_pre_save(sender, instance, **kwargs):
+    """
+    Function executed BEFORE saving an entity or account
+    Remember the stored code and parent so post_save can tell what moved
+    """
+    try:
+        _, code_field = closure_of(sender)
+        instance._closure_previous = (
+            sender.objects.filter(pk=instance.pk).values_list(code_field, 'parent').first()
+            if instance.pk else None
+        )
+    except Exception as e:
+        instance._closure_previous = None
+        logger.error(f"Error in hierarchy_node_pre_save: {str(e)}")
+
+
+@receiver(post_save, sender=XX_Entity)
+@receiver(post_save, sender=XX_Account)
+def hierarchy_node_post_save(sender, instance, created, **kwargs):
+    """
+    Function executed AFTER saving an entity or account
+    """
+    try:
+        _, code_field = closure_of(sender)
+        code = str(getattr(instance, code_field))
+        parent = instance.parent or None
+        previous = getattr(instance, "_closure_previous", None)
+
+        if created or previous is None:
+            add_node(sender, code, parent)
+        elif str(previous[0]) != code:
+            # A new code is a different node for the children's parent lookup
+            remove_node(sender, previous[0])
+            add_node(sender, code, parent)
+        elif (previous[1] or None) != parent:
+            move_node(sender, code, parent)
+        else:
+            return
+
+        if sender is XX_Entity:
+            bump_entity_scope_generation()
+
+    except Exception as e:
+        logger.error(f"Error in hierarchy_node_post_save: {str(e)}")
+
+
+@receiver(post_delete, sender=XX_Entity)
+@receiver(post_delete, sender=XX_Account)
+def hierarchy_node_post_delete(sender, instance, **kwargs):
+    """
+    Function executed AFTER deleting an entity or account
+    """
+    try:
+        _, code_field = closure_of(sender)
+        remove_node(sender, getattr(instance, code_field))
+        if sender is XX_Entity:
+            bump_entity_scope_generation()
+
+    except Exception as e:
+        logger.error(f"Error in hierarchy_node_post_delete: {str(e)}")
@@ -0,0 +1,74 @@
+from decimal import Decimal
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from account_and_entitys.models import XX_PivotFund, XX_PivotFundMovement
+from account_and_entitys.views import PivotFundCreateView, PivotFundDeleteView, PivotFundUpdateView
+from public_funtion.pivot_fund_journal import ensure_baseline_snapshots, pivot_fund_balance
+from public_funtion.pivot_fund_reconcile import reconcile_pivot_funds
+from user_management.models import xx_User
+
+
+class PivotFundJournalTests(TestCase):
+    """Manual pivot fund edits are journaled as adjustments"""
+
+    def setUp(self):
+        self.user = xx_User.objects.create(username="fund-user", role="admin")
+        self.fund = XX_PivotFund.objects.create(
+            entity="100", account="500", year=2025, budget=1000, encumbrance=10, actual=20
+        )
+        # A fund the ledger already posted to
+        ensure_baseline_snapshots([self.fund])
+
+    def call(self, view, method, data=None, **kwargs):
+        request = getattr(APIRequestFactory(), method)("/", data, format="json")
+        force_authenticate(request, user=self.user)
+        return view.as_view()(request, **kwargs)
+
+    def fund_data(self, **values):
+        data = {"entity": "100", "account": "500", "year": 2025, "budget": "1000", "encumbrance": "10", "actual": "20"}
+        data.update(values)
+        return data
+
+    def balance(self, entity="100", account="500", year=2025):
+        balance = pivot_fund_balance(entity, account, year)
+        return balance["encumbrance"], balance["actual"]
+
+    def test_update_journals_the_change(self):
+        response = self.call(
+            PivotFundUpdateView, "put", self.fund_data(encumbrance="15", actual="5"), pk=self.fund.pk
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.balance(), (Decimal("15.00"), Decimal("5.00")))
+        movement = XX_PivotFundMovement.objects.get()
+        self.assertEqual(movement.decide, 0)
+        self.assertEqual(reconcile_pivot_funds()["journal_drift"], [])
+
+    def test_update_moving_the_fund_journals_both_keys(self):
+        self.call(PivotFundDeleteView, "delete", pk=self.fund.pk)
+        fund = XX_PivotFund.objects.create(entity="200", account="500", year=2025, encumbrance=3, actual=4)
+        ensure_baseline_snapshots([fund])
+
+        self.call(PivotFundUpdateView, "put", self.fund_data(encumbrance="7", actual="8"), pk=fund.pk)
+
+        self.assertEqual(self.balance(entity="200"), (Decimal("0.00"), Decimal("0.00")))
+        self.assertEqual(self.balance(), (Decimal("7.00"), Decimal("8.00")))
+        self.assertEqual(reconcile_pivot_funds()["journal_drift"], [])
+
+    def test_delete_and_create_journal_the_values(self):
+        self.call(PivotFundDeleteView, "delete", pk=self.fund.pk)
+        self.assertEqual(self.balance(), (Decimal("0.00"), Decimal("0.00")))
+
+        response = self.call(PivotFundCreateView, "post", self.fund_data(encumbrance="30", actual="0"))
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.balance(), (Decimal("30.00"), Decimal("0.00")))
+        self.assertEqual(reconcile_pivot_funds()["journal_drift"], [])
+
+    def test_funds_the_journal_does_not_know_are_not_journaled(self):
+        self.call(PivotFundCreateView, "post", self.fund_data(entity="300"))
+
+        self.assertFalse(XX_PivotFundMovement.objects.exists())
+        self.assertIsNone(pivot_fund_balance("300", "500", 2025))
@@ -2,7 +2,7 @@ from django.urls import path
 from .views import (
     AccountListView, AccountCreateView, AccountDetailView, AccountUpdateView, AccountDeleteView,
     EntityListView, EntityCreateView, EntityDetailView, EntityUpdateView, EntityDeleteView,
-    PivotFundListView, PivotFundCreateView, PivotFundDetailView, PivotFundUpdateView, PivotFundDeleteView,
+    PivotFundListView, PivotFundCreateView, PivotFundDetailView, PivotFundUpdateView, PivotFundDeleteView, PivotFundBulkView, PivotFundImportView,
     AdjdTransactionAuditListView, AdjdTransactionAuditCreateView, AdjdTransactionAuditDetailView, 
     AdjdTransactionAuditUpdateView, AdjdTransactionAuditDeleteView, list_ACCOUNT_ENTITY_LIMIT,UpdateAccountEntityLimit,DeleteAccountEntityLimit,AccountEntityLimitAPI
    
@@ -27,6 +27,8 @@ urlpatterns = [
     path('pivot-funds/', PivotFundListView.as_view(), name='pivotfund-list'),
     path('pivot-funds/create/', PivotFundCreateView.as_view(), name='pivotfund-create'),
     path('pivot-funds/getdetail/', PivotFundDetailView.as_view(), name='pivotfund-detail'),
+    path('pivot-funds/bulk/', PivotFundBulkView.as_view(), name='pivotfund-bulk'),
+    path('pivot-funds/import/', PivotFundImportView.as_view(), name='pivotfund-import'),
     path('pivot-funds/<int:pk>/update/', PivotFundUpdateView.as_view(), name='pivotfund-update'),
     path('pivot-funds/<int:pk>/delete/', PivotFundDeleteView.as_view(), name='pivotfund-delete'),
     
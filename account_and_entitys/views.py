@@ -1,3 +1,5 @@
+import copy
+
 import numpy as np
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -5,8 +7,17 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 
-from budget_management.models import get_entities_with_children
 from .models import XX_Account, XX_Entity, XX_PivotFund, XX_TransactionAudit, XX_ACCOUNT_ENTITY_LIMIT
+from public_funtion.pivot_fund_lookup import (
+    get_pivot_fund,
+    get_pivot_funds_bulk,
+    get_transfer_fiscal_year,
+    resolve_fiscal_year,
+)
+from public_funtion.entity_scope_cache import entity_codes_q, get_allowed_entity_codes
+from public_funtion.pivot_fund_cache import invalidate_account_entity_limit, invalidate_pivot_fund
+from public_funtion.pivot_fund_import import PivotFundImportError, import_pivot_funds
+from public_funtion.pivot_fund_journal import journal_fund_change
 from .serializers import AccountSerializer, EntitySerializer, PivotFundSerializer, TransactionAuditSerializer, AccountEntityLimitSerializer
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
@@ -149,9 +160,9 @@ class EntityListView(APIView):
 
         # 🔹 Apply permissions filter
         if request.user.abilities.count() > 0:
-            entity_ids = [ability.Entity.id for ability in request.user.abilities.all() if ability.Entity]
-            # get_entities_with_children already returns XX_Entity objects
-            entities = get_entities_with_children(entity_ids)
+            # Cached codes of the user's entities and their children
+            entity_codes = get_allowed_entity_codes(request.user)
+            entities = entities.filter(entity_codes_q('entity', entity_codes)) if entity_codes else []
         # 🔹 Apply search filter (treat entity as string)
         search_query = request.query_params.get("search")
         if search_query:
@@ -295,7 +306,11 @@ class PivotFundCreateView(APIView):
             for index, fund_data in enumerate(request.data):
                 serializer = PivotFundSerializer(data=fund_data)
                 if serializer.is_valid():
-                    fund = serializer.save()
+                    with transaction.atomic():
+                        fund = serializer.save()
+                        journal_fund_change(None, fund)
+                    # A cached "no such fund" must not outlive the creation
+                    invalidate_pivot_fund(fund.entity, fund.account, fund.year)
                     created_funds.append(PivotFundSerializer(fund).data)
                 else:
                     errors.append({
@@ -321,7 +336,10 @@ class PivotFundCreateView(APIView):
         else:
             serializer = PivotFundSerializer(data=request.data)
             if serializer.is_valid():
-                fund = serializer.save()
+                with transaction.atomic():
+                    fund = serializer.save()
+                    journal_fund_change(None, fund)
+                invalidate_pivot_fund(fund.entity, fund.account, fund.year)
                 return Response({
                     'message': 'Pivot fund created successfully.',
                     'data': PivotFundSerializer(fund).data
@@ -331,26 +349,64 @@ class PivotFundCreateView(APIView):
                 'errors': serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
 
-class PivotFundDetailView(APIView):
-    """Retrieve a specific pivot fund"""
+class PivotFundImportView(APIView):
+    """
+    Import / upsert pivot funds from an Excel (.xlsx) or CSV file
+
+    Columns: entity, account, year and any of budget, fund, actual,
+    encumbrance (only the amount columns present are written). Existing
+    (entity, account, year) funds are updated, the others created; invalid
+    rows are skipped and listed in the report. dry_run=true only validates.
+    """
     permission_classes = [IsAuthenticated]
-    
-    def get_object(self, entity,account):
+    parser_classes = [MultiPartParser]
+    max_reported_errors = 1000
+
+    def post(self, request):
+        uploaded_file = request.FILES.get('file')
+        if uploaded_file is None:
+            return Response({
+                'status': 'error',
+                'message': 'Please upload a file.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = str(request.data.get('dry_run', 'false')).lower() == 'true'
+
         try:
-           
-            return XX_PivotFund.objects.get(entity=entity,account=account)
-        
-        except XX_PivotFund.DoesNotExist:
-            
+            summary = import_pivot_funds(uploaded_file, uploaded_file.name, dry_run=dry_run)
+        except PivotFundImportError as e:
+            return Response({'status': 'error', 'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({'status': 'error', 'message': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            return None
+        summary['errors'] = summary['errors'][:self.max_reported_errors]
+        summary['status'] = 'success' if not summary['error_count'] else 'partial'
+        summary['dry_run'] = dry_run
+        if summary['error_count'] and summary['error_count'] == summary['rows']:
+            summary['status'] = 'error'
+            return Response(summary, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary, status=status.HTTP_200_OK)
+
+class PivotFundDetailView(APIView):
+    """Retrieve a specific pivot fund (year defaults to the latest loaded year)"""
+    permission_classes = [IsAuthenticated]
+    
+    def get_object(self, entity, account, year=None):
+        if year:
+            return get_pivot_fund(entity, account, year)
+        # Latest year, read backwards on the (entity, account, year) index
+        return XX_PivotFund.objects.filter(entity=entity, account=account).order_by('-year').first()
     
     def get(self, request):
 
         entity=request.query_params.get('entity_id')
         account=request.query_params.get('account_id')
-        print(entity,account)
-        pivot_fund = self.get_object(entity,account)
+        year=request.query_params.get('year')
+        if year and not year.isdigit():
+            return Response({
+                'message': 'year must be an integer.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        print(entity,account,year)
+        pivot_fund = self.get_object(entity,account,year)
 
         if pivot_fund is None:
             return Response({
@@ -362,33 +418,110 @@ class PivotFundDetailView(APIView):
             'data': serializer.data
         })
 
+class PivotFundBulkView(APIView):
+    """
+    Budget figures of many cost center / account pairs in one request
+
+    POST {"pairs": [{"entity_id": .., "account_id": ..}, ...] (or [entity, account]
+    lists), "year": optional fiscal year, "transaction_id": optional transfer
+    whose fiscal year is used}. The year defaults to the current fiscal year.
+    Results come back in request order with budget, fund, actual, encumbrance
+    and available (budget - encumbrance - actual); pairs without a fund have
+    found=false.
+    """
+    permission_classes = [IsAuthenticated]
+    max_pairs = 1000
+
+    def post(self, request):
+        raw_pairs = request.data.get('pairs') or []
+        if not isinstance(raw_pairs, list) or not raw_pairs:
+            return Response({
+                'message': 'pairs must be a non-empty list of entity_id / account_id pairs.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(raw_pairs) > self.max_pairs:
+            return Response({
+                'message': f'At most {self.max_pairs} pairs per request.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        pairs = []
+        for index, pair in enumerate(raw_pairs):
+            if isinstance(pair, dict):
+                entity, account = pair.get('entity_id'), pair.get('account_id')
+            elif isinstance(pair, (list, tuple)) and len(pair) == 2:
+                entity, account = pair
+            else:
+                entity = account = None
+            if entity in (None, '') or account in (None, ''):
+                return Response({
+                    'message': f'Pair {index} needs an entity_id and an account_id.'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            pairs.append((str(entity), str(account)))
+
+        year = request.data.get('year')
+        transaction_id = request.data.get('transaction_id')
+        try:
+            if year not in (None, ''):
+                year = int(year)
+            elif transaction_id not in (None, ''):
+                year = get_transfer_fiscal_year(int(transaction_id))
+            else:
+                year = resolve_fiscal_year()
+        except (TypeError, ValueError):
+            return Response({
+                'message': 'year and transaction_id must be integers.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        funds = get_pivot_funds_bulk(pairs, year)
+        results = []
+        for entity, account in pairs:
+            fund = funds.get((entity, account))
+            result = {'entity_id': entity, 'account_id': account, 'year': year, 'found': fund is not None}
+            for field in ('budget', 'fund', 'actual', 'encumbrance', 'available'):
+                result[field] = fund[field] if fund is not None else None
+            results.append(result)
+
+        return Response({
+            'message': 'Pivot funds retrieved successfully.',
+            'year': year,
+            'count': len(results),
+            'found': sum(1 for result in results if result['found']),
+            'data': results,
+        }, status=status.HTTP_200_OK)
+
 class PivotFundUpdateView(APIView):
     """Update a specific pivot fund"""
     permission_classes = [IsAuthenticated]
     
     def get_object(self, pk):
+        # Locked like the ledger does, the journal records the change from these values
         try:
-            return XX_PivotFund.objects.get(pk=pk)
+            return XX_PivotFund.objects.select_for_update().get(pk=pk)
         except XX_PivotFund.DoesNotExist:
             return None
     
     def put(self, request, pk):
-        pivot_fund = self.get_object(pk)
-        if pivot_fund is None:
-            return Response({
-                'message': 'Pivot fund not found.'
-            }, status=status.HTTP_404_NOT_FOUND)
-        serializer = PivotFundSerializer(pivot_fund, data=request.data)
-        if serializer.is_valid():
+        with transaction.atomic():
+            pivot_fund = self.get_object(pk)
+            if pivot_fund is None:
+                return Response({
+                    'message': 'Pivot fund not found.'
+                }, status=status.HTTP_404_NOT_FOUND)
+            serializer = PivotFundSerializer(pivot_fund, data=request.data)
+            if not serializer.is_valid():
+                return Response({
+                    'message': 'Failed to update pivot fund.',
+                    'errors': serializer.errors
+                }, status=status.HTTP_400_BAD_REQUEST)
+            before = copy.copy(pivot_fund)
             updated_fund = serializer.save()
-            return Response({
-                'message': 'Pivot fund updated successfully.',
-                'data': PivotFundSerializer(updated_fund).data
-            })
+            journal_fund_change(before, updated_fund)
+        # The update may move the fund to another entity / account / year
+        invalidate_pivot_fund(before.entity, before.account, before.year)
+        invalidate_pivot_fund(updated_fund.entity, updated_fund.account, updated_fund.year)
         return Response({
-            'message': 'Failed to update pivot fund.',
-            'errors': serializer.errors
-        }, status=status.HTTP_400_BAD_REQUEST)
+            'message': 'Pivot fund updated successfully.',
+            'data': PivotFundSerializer(updated_fund).data
+        })
 
 class PivotFundDeleteView(APIView):
     """Delete a specific pivot fund"""
@@ -396,17 +529,20 @@ class PivotFundDeleteView(APIView):
     
     def get_object(self, pk):
         try:
-            return XX_PivotFund.objects.get(pk=pk)
+            return XX_PivotFund.objects.select_for_update().get(pk=pk)
         except XX_PivotFund.DoesNotExist:
             return None
     
     def delete(self, request, pk):
-        pivot_fund = self.get_object(pk)
-        if pivot_fund is None:
-            return Response({
-                'message': 'Pivot fund not found.'
-            }, status=status.HTTP_404_NOT_FOUND)
-        pivot_fund.delete()
+        with transaction.atomic():
+            pivot_fund = self.get_object(pk)
+            if pivot_fund is None:
+                return Response({
+                    'message': 'Pivot fund not found.'
+                }, status=status.HTTP_404_NOT_FOUND)
+            journal_fund_change(pivot_fund, None)
+            pivot_fund.delete()
+        invalidate_pivot_fund(pivot_fund.entity, pivot_fund.account, pivot_fund.year)
         return Response({
             'message': 'Pivot fund deleted successfully.'
         }, status=status.HTTP_200_OK)
@@ -623,7 +759,8 @@ class AccountEntityLimitAPI(APIView):
                     try:
                         serializer = AccountEntityLimitSerializer(data=record)
                         if serializer.is_valid():
-                            serializer.save()
+                            limit_record = serializer.save()
+                            invalidate_account_entity_limit(limit_record.entity_id, limit_record.account_id)
                             created_count += 1
                         else:
                             errors.append({
@@ -658,7 +795,8 @@ class AccountEntityLimitAPI(APIView):
         serializer = AccountEntityLimitSerializer(data=data)
         
         if serializer.is_valid():
-            serializer.save()
+            limit_record = serializer.save()
+            invalidate_account_entity_limit(limit_record.entity_id, limit_record.account_id)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -687,7 +825,9 @@ class UpdateAccountEntityLimit(APIView):
             return Response({'message': 'Limit record not found.'}, status=status.HTTP_404_NOT_FOUND)
         serializer = AccountEntityLimitSerializer(limit_record, data=request.data)
         if serializer.is_valid():
+            invalidate_account_entity_limit(limit_record.entity_id, limit_record.account_id)
             updated_record = serializer.save()
+            invalidate_account_entity_limit(updated_record.entity_id, updated_record.account_id)
             return Response({
                 'message': 'Limit record updated successfully.',
                 'data': AccountEntityLimitSerializer(updated_record).data
@@ -710,6 +850,7 @@ class DeleteAccountEntityLimit(APIView):
         limit_record = self.get_object(pk)
         if limit_record is None:
             return Response({'message': 'Limit record not found.'}, status=status.HTTP_404_NOT_FOUND)
+        invalidate_account_entity_limit(limit_record.entity_id, limit_record.account_id)
         limit_record.delete()
         return Response({'message': 'Limit record deleted successfully.'}, status=status.HTTP_200_OK)
 
@@ -4,12 +4,19 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from .models import xx_TransactionTransfer
-from account_and_entitys.models import XX_Entity, XX_PivotFund, XX_ACCOUNT_ENTITY_LIMIT
 from budget_management.models import xx_BudgetTransfer
 from .serializers import AdjdTransactionTransferSerializer
 from decimal import Decimal
 from django.db.models import Sum
-from public_funtion.update_pivot_fund import update_pivot_fund
+from django.db import transaction
+from public_funtion.pivot_fund_ledger import post_pivot_fund_lines
+from public_funtion.pivot_fund_lookup import get_transfer_fiscal_year
+from public_funtion.pivot_fund_cache import get_cached_account_entity_limit, get_cached_pivot_fund
+from budget_transfer.global_function.dashboard_aggregates import (
+    apply_transfer_delta,
+    get_transfer_state,
+)
+from budget_transfer.global_function.approval_queue import sync_approval_queue_item
 from django.utils import timezone
 from user_management.models import xx_notification
 import pandas as pd
@@ -98,18 +105,18 @@ def validate_adjd_transaction(data, code=None):
 
 def validate_adjd_transcation_transfer(data, code=None, errors=None):
     # Validation 1: Check for fund is available if not then no combination code
-    existing_code_combintion = XX_PivotFund.objects.filter(
-        entity=data["cost_center_code"], account=data["account_code"]
-    )
-    if not existing_code_combintion.exists():
+    # (in the fiscal year of the transaction, resolved once by the caller when possible)
+    # Both reads are served from the in-process cache (public_funtion.pivot_fund_cache)
+    fiscal_year = data.get("fiscal_year") or get_transfer_fiscal_year(data["transaction_id"])
+    if get_cached_pivot_fund(data["cost_center_code"], data["account_code"], fiscal_year) is None:
         errors.append(
-            f"Code combination not found for {data['cost_center_code']} and {data['account_code']}"
+            f"Code combination not found for {data['cost_center_code']} and {data['account_code']} in {fiscal_year}"
         )
     print("existing_code_combintion", type(data["cost_center_code"]),":", type(data["account_code"]))
     # Validation 2: Check if is allowed to make trasfer using this cost_center_code and account_code
-    allowed_to_make_transfer = XX_ACCOUNT_ENTITY_LIMIT.objects.filter(
-        entity_id=str(data["cost_center_code"]), account_id=str(data["account_code"])
-    ).first()
+    allowed_to_make_transfer = get_cached_account_entity_limit(
+        data["cost_center_code"], data["account_code"]
+    )
     print("allowed_to_make_transfer", allowed_to_make_transfer)
     
     # Check if no matching record found
@@ -120,18 +127,18 @@ def validate_adjd_transcation_transfer(data, code=None, errors=None):
         return errors
     else:
         # Check transfer permissions if record exists
-        if allowed_to_make_transfer.is_transer_allowed == "No":
+        if allowed_to_make_transfer["is_transer_allowed"] == "No":
             errors.append(
                 f"Not allowed to make transfer for {data['cost_center_code']} and {data['account_code']} according to the rules"
             )
-        elif allowed_to_make_transfer.is_transer_allowed == "Yes":
+        elif allowed_to_make_transfer["is_transer_allowed"] == "Yes":
             if data["from_center"] > 0:
-                if allowed_to_make_transfer.is_transer_allowed_for_source != "Yes":
+                if allowed_to_make_transfer["is_transer_allowed_for_source"] != "Yes":
                     errors.append(
                         f"Not allowed to make transfer for {data['cost_center_code']} and {data['account_code']} according to the rules (can't transfer from this account)"
                     )
             if data["to_center"] > 0:
-                if allowed_to_make_transfer.is_transer_allowed_for_target != "Yes":
+                if allowed_to_make_transfer["is_transer_allowed_for_target"] != "Yes":
                     errors.append(
                         f"Not allowed to make transfer for {data['cost_center_code']} and {data['account_code']} according to the rules (can't transfer to this account)"
                     )
@@ -314,6 +321,7 @@ class AdjdTransactionTransferListView(APIView):
             transaction=transaction_id
         )
         serializer = AdjdTransactionTransferSerializer(transfers, many=True)
+        fiscal_year = get_transfer_fiscal_year(transaction_object)
 
         # Create response with validation for each transfer
         response_data = []
@@ -342,6 +350,7 @@ class AdjdTransactionTransferListView(APIView):
                 "cost_center_code": cost_center_code,
                 "account_code": account_code,
                 "transfer_id": transfer_id,  # Fixed: was using 'transfer_id' instead of 'id'
+                "fiscal_year": fiscal_year,  # resolved once for all the lines
             }
 
             # Validate the transfer
@@ -376,7 +385,15 @@ class AdjdTransactionTransferListView(APIView):
 
             if total_from_center == total_to_center:
                 transaction_object.amount = total_from_center
-                xx_BudgetTransfer.objects.filter(pk=transaction_id).update(amount=total_from_center)
+                previous_state = get_transfer_state(transaction_id)
+                updated = xx_BudgetTransfer.objects.filter(pk=transaction_id).exclude(
+                    amount=total_from_center
+                ).update(amount=total_from_center)
+                if updated:
+                    # QuerySet.update() skips the signals, keep the dashboard series amounts
+                    # and the approvers' work queue in step
+                    apply_transfer_delta(transaction_id, previous_state, get_transfer_state(transaction_id))
+                    sync_approval_queue_item(transaction_object)
 
             if transaction_object.code[0:3] == "AFR":
                 summary = {
@@ -558,65 +575,34 @@ class AdjdtranscationtransferSubmit(APIView):
                         status=status.HTTP_404_NOT_FOUND,
                     )
 
-                # Validate all transfers have corresponding pivot funds
-                missing_pivot_funds = []
-                for transfer in transfers:
-                    try:
-                        pivot_fund = XX_PivotFund.objects.get(
-                            entity=transfer.cost_center_code,
-                            account=transfer.account_code,
-                        )
-                    except XX_PivotFund.DoesNotExist:
-                        missing_pivot_funds.append(
-                            {
-                                "transfer_id": transfer.transfer_id,
-                                "cost_center_code": transfer.cost_center_code,
-                                "account_code": transfer.account_code,
-                            }
-                        )
-
-                # If any pivot funds are missing, return error with details
-                if missing_pivot_funds:
-                    return Response(
-                        {
-                            "error": "Missing pivot funds",
-                            "message": f"Some transfers do not have corresponding pivot funds",
-                            "missing_pivot_funds": missing_pivot_funds,
-                        },
-                        status=status.HTTP_404_NOT_FOUND,
-                    )
-
-                # Process each transfer for the transaction (only if all pivot funds exist)
-                for transfer in transfers:
-                    # Use the utility function to update pivot fund
-                    update_result = update_pivot_fund(
-                        transfer.cost_center_code,
-                        transfer.account_code,
-                        transfer.from_center,
-                        transfer.to_center,
-                        decide=1,
+                # Post every line to the pivot funds and move the transfer to the
+                # next level in one transaction; the fund rows stay locked until
+                # the status change is committed
+                with transaction.atomic():
+                    ledger_result = post_pivot_fund_lines(
+                        transfers, decide=1, fiscal_year=get_transfer_fiscal_year(transaction_id)
                     )
-                    print(f"Update result: {update_result}")
+                    print(f"Update result: {ledger_result}")
 
-                    # Check if error key exists and has a value
-                    if "error" in update_result and update_result["error"]:
+                    # If any pivot funds are missing, nothing was posted
+                    if ledger_result["status"] == "failed":
                         return Response(
                             {
-                                "error": "Budget transfer not found",
-                                "message": f"No PIVOT FUND AVAILABLE: {transaction_id}",
+                                "error": "Missing pivot funds",
+                                "message": f"Some transfers do not have corresponding pivot funds",
+                                "missing_pivot_funds": ledger_result["missing_pivot_funds"],
+                                "ambiguous_pivot_funds": ledger_result["ambiguous_pivot_funds"],
                             },
                             status=status.HTTP_404_NOT_FOUND,
                         )
-
-                    # If we get here, update was successful
-                    pivot_updates.append(update_result)
-
-                # Update the budget transfer status
-                budget_transfer = xx_BudgetTransfer.objects.get(pk=transaction_id)
-                budget_transfer.status_level = 2
-                budget_transfer.approvel_1 = request.user.username
-                budget_transfer.approvel_1_date = timezone.now()
-                budget_transfer.save()
+                    pivot_updates = ledger_result["updates"]
+
+                    # Update the budget transfer status
+                    budget_transfer = xx_BudgetTransfer.objects.get(pk=transaction_id)
+                    budget_transfer.status_level = 2
+                    budget_transfer.approvel_1 = request.user.username
+                    budget_transfer.approvel_1_date = timezone.now()
+                    budget_transfer.save()
 
                 # user_submit=xx_notification()
                 # user_submit.create_notification(user=request.user,message=f"you have submited the trasnation {transaction_id} secessfully ")
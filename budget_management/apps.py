@@ -11,8 +11,8 @@ class BudgetManagementConfig(AppConfig):
         This ensures signals are registered when Django starts
         """
         try:
-            # Import budget transfer signals to register them
-            from .signals import budget_trasnfer
+            # Import budget transfer and transfer line signals to register them
+            from .signals import budget_trasnfer, transcation_transfer, transfer_search, approval_queue
             print("Budget management signals registered successfully")
         except ImportError as e:
             print(f"Error importing budget management signals: {e}")
@@ -0,0 +1,135 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from budget_management.views import DashboardBudgetTransferView
+from budget_transfer.global_function.dashbaord import (
+    dashboard_for_entities,
+    dashboard_normal,
+    dashboard_smart,
+)
+from budget_transfer.global_function.dashboard_aggregates import rebuild_dashboard_aggregates
+from budget_transfer.global_function.json_stream import iter_json
+from budget_transfer.global_function.dashboard_benchmark import (
+    find_regressions,
+    generate_synthetic_transfers,
+    measure,
+)
+from user_management.models import xx_User
+
+
+def consume(chunks):
+    """Exhaust an iterator of response / JSON chunks without keeping them"""
+    for _ in chunks:
+        pass
+
+
+class Rollback(Exception):
+    """Raised to roll the synthetic data back"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark dashboard_smart, dashboard_normal and the dashboard view on synthetic "
+        "transfers (time, query count, peak memory). All data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            default="1000,10000,100000,1000000",
+            help="Comma separated transfer counts to benchmark (default: 1000,10000,100000,1000000)",
+        )
+        parser.add_argument("--lines", type=int, default=2, help="Lines per transfer (default 2)")
+        parser.add_argument("--cost-centers", type=int, default=50, help="Distinct cost centers (default 50)")
+        parser.add_argument("--accounts", type=int, default=200, help="Distinct accounts (default 200)")
+        parser.add_argument("--output", help="Write the results as JSON to this file")
+        parser.add_argument("--baseline", help="Fail if results regress against this JSON results file")
+        parser.add_argument(
+            "--max-ratio",
+            type=float,
+            default=2.0,
+            help="Allowed growth factor against the baseline before failing (default 2.0)",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Run on a database other than SQLite (use a local stand-in, never production)",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite" and not options["force"]:
+            raise CommandError(
+                f"Refusing to benchmark on a {connection.vendor} database without --force; "
+                "point the settings at SQLite or a local stand-in"
+            )
+        try:
+            sizes = [int(size) for size in options["sizes"].split(",") if size.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be a comma separated list of integers")
+
+        results = {}
+        for size in sizes:
+            self.stdout.write(f"Benchmarking {size} transfers...")
+            results[str(size)] = self.run_size(size, options)
+            for name, metrics in results[str(size)].items():
+                self.stdout.write(
+                    f"  {name:<22} {metrics['time']:>9.3f}s {metrics['queries']:>6} queries "
+                    f"{metrics['peak_memory_kb']:>12.1f} KB peak"
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options["baseline"]:
+            with open(options["baseline"]) as baseline_file:
+                baseline = json.load(baseline_file)
+            regressions = find_regressions(results, baseline, options["max_ratio"])
+            if regressions:
+                for regression in regressions:
+                    self.stdout.write(self.style.ERROR(regression))
+                raise CommandError(f"{len(regressions)} benchmark regressions against {options['baseline']}")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+
+    def run_size(self, size, options):
+        """Generate size transfers, measure every benchmark and roll everything back"""
+        metrics = {}
+        try:
+            with transaction.atomic():
+                cost_centers = generate_synthetic_transfers(
+                    size,
+                    lines_per_transfer=options["lines"],
+                    cost_centers=options["cost_centers"],
+                    accounts=options["accounts"],
+                )
+                # bulk_create skips the signals, so seed the aggregates the way an operator would
+                metrics["rebuild_aggregates"] = measure(rebuild_dashboard_aggregates)
+                metrics["dashboard_smart"] = measure(dashboard_smart)
+                metrics["dashboard_normal"] = measure(dashboard_normal)
+                entity_codes = [str(code) for code in cost_centers[: len(cost_centers) // 2]]
+                metrics["dashboard_entities"] = measure(
+                    lambda: consume(iter_json(dashboard_for_entities(entity_codes)))
+                )
+
+                user = xx_User.objects.create(username="dashboard-benchmark", role="admin")
+                factory = APIRequestFactory()
+                view = DashboardBudgetTransferView.as_view()
+
+                def get_dashboard():
+                    request = factory.get("/api/budget/dashboard/", {"type": "all"})
+                    force_authenticate(request, user=user)
+                    response = view(request)
+                    if response.streaming:
+                        consume(response.streaming_content)
+                    else:
+                        response.content
+
+                metrics["dashboard_view"] = measure(get_dashboard)
+                raise Rollback()
+        except Rollback:
+            pass
+        return metrics
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from public_funtion.pivot_fund_journal import compact_pivot_fund_journal
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold settled pivot fund movements into balance snapshots and delete the "
+        "movements older than the retention window that a snapshot covers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            help="Keep movements for this many days (default PIVOT_FUND_JOURNAL_RETENTION_DAYS)",
+        )
+
+    def handle(self, *args, **options):
+        result = compact_pivot_fund_journal(retention_days=options["retention_days"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {result['snapshots']} snapshots up to movement {result['position']}, "
+                f"deleted {result['movements_deleted']} movements"
+            )
+        )
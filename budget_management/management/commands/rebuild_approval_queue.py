@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from budget_management.models import xx_ApprovalQueueItem, xx_BudgetTransfer
+from budget_transfer.global_function.approval_queue import rebuild_approval_queue
+
+
+class Command(BaseCommand):
+    help = "Rebuild the approvers' work queue from the pending budget transfers"
+
+    def handle(self, *args, **options):
+        count = rebuild_approval_queue(xx_BudgetTransfer, xx_ApprovalQueueItem)
+        self.stdout.write(self.style.SUCCESS(f"Queued {count} pending transfers"))
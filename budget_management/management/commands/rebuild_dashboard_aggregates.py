@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+
+from budget_transfer.global_function.dashbaord import dashboard_normal, dashboard_smart
+from budget_transfer.global_function.dashboard_aggregates import rebuild_dashboard_aggregates
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the incremental dashboard aggregates from the transfer tables, "
+        "report any drift and rewrite the stored aggregates"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report differences, do not rewrite the stored aggregates",
+        )
+
+    def handle(self, *args, **options):
+        check_only = options["check"]
+        diffs = rebuild_dashboard_aggregates(check_only=check_only)
+
+        for diff in diffs["counters"]:
+            self.stdout.write(
+                f"counter {diff['key']}: stored={diff['stored']} expected={diff['expected']}"
+            )
+        for diff in diffs["scope_counters"]:
+            self.stdout.write(
+                f"scope [{diff['scope']}] counter {diff['key']}: "
+                f"stored={diff['stored']} expected={diff['expected']}"
+            )
+        for diff in diffs["account_totals"]:
+            self.stdout.write(
+                f"scope [{diff['scope']}] total {diff['cost_center_code']}/{diff['account_code']} "
+                f"fy {diff['fiscal_year']} {diff['status']}: "
+                f"stored={diff['stored']} expected={diff['expected']}"
+            )
+        for diff in diffs["series"]:
+            self.stdout.write(
+                f"scope [{diff['scope']}] series {diff['granularity']} {diff['period_start']} "
+                f"{diff['status']}/{diff['transfer_type']}: "
+                f"stored={diff['stored']} expected={diff['expected']}"
+            )
+        for diff in diffs["transfer_scopes"]:
+            self.stdout.write(
+                f"transfer {diff['transaction_id']} scope: "
+                f"stored={diff['stored']} expected={diff['expected']}"
+            )
+
+        drift = sum(len(items) for items in diffs.values())
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Dashboard aggregates are consistent"))
+            return
+
+        if check_only:
+            self.stdout.write(self.style.WARNING(f"Found {drift} differences (not repaired)"))
+        else:
+            dashboard_normal()
+            dashboard_smart()
+            self.stdout.write(self.style.SUCCESS(f"Repaired {drift} differences"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from public_funtion.hierarchy_closure import rebuild_hierarchy_closures
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the entity and account closure tables from the parent codes "
+        "(after bulk loads or updates that skip the model signals)"
+    )
+
+    def handle(self, *args, **options):
+        result = rebuild_hierarchy_closures()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {result['entity']} entity and {result['account']} account closure rows"
+            )
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from budget_transfer.global_function.transfer_search import index_path, rebuild_transfer_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the full-text search index of the transfer notes and line "
+        "reasons / account and cost center names"
+    )
+
+    def handle(self, *args, **options):
+        result = rebuild_transfer_search_index()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {result['transfers']} transfers and {result['lines']} transfer lines in {index_path()}"
+            )
+        )
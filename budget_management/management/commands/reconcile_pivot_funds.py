@@ -0,0 +1,86 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from public_funtion.pivot_fund_reconcile import CHUNK_SIZE, reconcile_pivot_funds
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the pivot fund encumbrance / actual with the postings expected from "
+        "the transfer lines and with the movement journal, and optionally repair them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repair",
+            action="store_true",
+            help="Post the differences as adjustment movements instead of only reporting them",
+        )
+        parser.add_argument(
+            "--since",
+            help=(
+                "Check the transfers requested from this date (default and earliest: "
+                "since the journal covers every posting)"
+            ),
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=CHUNK_SIZE,
+            help=f"Transfers / funds per chunk (default {CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options["since"]:
+            since = parse_datetime(options["since"])
+            if since is None:
+                day = parse_date(options["since"])
+                if day is None:
+                    self.stderr.write(self.style.ERROR(f"Invalid --since date: {options['since']}"))
+                    return
+                since = datetime(day.year, day.month, day.day)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        result = reconcile_pivot_funds(
+            repair=options["repair"], since=since, chunk_size=options["chunk_size"]
+        )
+
+        if result["since_clamped"]:
+            self.stdout.write(self.style.WARNING(
+                "Postings made before the movement journal covered them cannot be checked, "
+                f"--since moved up to {result['since'] or 'the start of the journal'}"
+            ))
+        if result["since"] is None:
+            self.stdout.write("The movement journal is empty, no transfers to check")
+        else:
+            self.stdout.write(
+                f"Checked {result['transfers']} transfers requested since {result['since']}"
+            )
+        for entry in result["transfer_drift"]:
+            self.stdout.write(
+                f"  {entry['entity']}/{entry['account']} {entry['year']}: "
+                f"encumbrance {entry['encumbrance']:+}, actual {entry['actual']:+} "
+                f"(transactions {', '.join(str(id) for id in entry['transactions'])})"
+            )
+        self.stdout.write(f"Checked {result['funds']} pivot funds against the journal")
+        for entry in result["journal_drift"]:
+            self.stdout.write(
+                f"  {entry['entity']}/{entry['account']} {entry['year']}: "
+                f"encumbrance {entry['ledger_encumbrance']} (journal {entry['journal_encumbrance']}), "
+                f"actual {entry['ledger_actual']} (journal {entry['journal_actual']})"
+            )
+        for entity, account, year in result["missing_pivot_funds"]:
+            self.stdout.write(self.style.WARNING(f"  No pivot fund {entity}/{account} {year}, not repaired"))
+
+        found = len(result["transfer_drift"]) + len(result["journal_drift"])
+        if not found:
+            self.stdout.write(self.style.SUCCESS("No differences found"))
+        elif result["repaired"]:
+            self.stdout.write(self.style.SUCCESS(f"Repaired {found} differences"))
+        else:
+            self.stdout.write(self.style.WARNING(f"Found {found} differences, run with --repair to fix them"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from budget_management.models import xx_BudgetTransfer, xx_TransferCodeSequence
+from budget_transfer.global_function.transfer_codes import sync_transfer_code_sequences
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the transfer code sequences past the highest codes in use "
+        "(after transfers were loaded without going through the API)"
+    )
+
+    def handle(self, *args, **options):
+        result = sync_transfer_code_sequences(xx_BudgetTransfer, xx_TransferCodeSequence)
+        for prefix, last_value in result.items():
+            self.stdout.write(self.style.SUCCESS(f"{prefix}: last code number {last_value}"))
@@ -0,0 +1,83 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:36
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_dashboard_aggregates(apps, schema_editor):
+    """Seed the incremental aggregates from the existing transfers"""
+    BudgetTransfer = apps.get_model('budget_management', 'xx_BudgetTransfer')
+    TransactionTransfer = apps.get_model('adjd_transaction', 'xx_TransactionTransfer')
+    DashboardCounter = apps.get_model('budget_management', 'xx_DashboardCounter')
+    DashboardAccountTotal = apps.get_model('budget_management', 'xx_DashboardAccountTotal')
+
+    counters = {}
+    for row in BudgetTransfer.objects.values('status', 'status_level', 'code').iterator():
+        keys = ['total']
+        if row['status']:
+            keys.append(f"status:{row['status']}")
+        if row['status_level'] is not None:
+            keys.append(f"level:{row['status_level']}")
+        prefix = (row['code'] or '')[:3].upper()
+        if prefix in ('FAR', 'AFR', 'FAD'):
+            keys.append(f'code:{prefix}')
+        for key in keys:
+            counters[key] = counters.get(key, 0) + 1
+    DashboardCounter.objects.bulk_create(
+        [DashboardCounter(counter_key=key, value=value) for key, value in counters.items()]
+    )
+
+    totals = (
+        TransactionTransfer.objects.filter(transaction__status='approved')
+        .values('cost_center_code', 'account_code')
+        .annotate(total_from=Sum('from_center'), total_to=Sum('to_center'))
+    )
+    DashboardAccountTotal.objects.bulk_create(
+        [
+            DashboardAccountTotal(
+                cost_center_code=row['cost_center_code'],
+                account_code=row['account_code'],
+                total_from_center=row['total_from'] or 0,
+                total_to_center=row['total_to'] or 0,
+            )
+            for row in totals
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget_management', '0008_alter_xx_budgettransfer_transaction_date'),
+        ('adjd_transaction', '0003_alter_xx_transactiontransfer_account_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='xx_DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counter_key', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'XX_DASHBOARD_COUNTER_XX',
+            },
+        ),
+        migrations.CreateModel(
+            name='xx_DashboardAccountTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cost_center_code', models.IntegerField(blank=True, null=True)),
+                ('account_code', models.IntegerField(blank=True, null=True)),
+                ('total_from_center', models.DecimalField(decimal_places=2, default=0, max_digits=30)),
+                ('total_to_center', models.DecimalField(decimal_places=2, default=0, max_digits=30)),
+            ],
+            options={
+                'db_table': 'XX_DASHBOARD_ACCOUNT_TOTAL_XX',
+                'unique_together': {('cost_center_code', 'account_code')},
+            },
+        ),
+        migrations.RunPython(populate_dashboard_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:37
+
+import json
+
+from django.db import migrations, models
+
+
+def split_dashboard_blob(apps, schema_editor):
+    """Copy each section of the legacy single-row dashboard into its own row"""
+    DashboardBudgetTransfer = apps.get_model('budget_management', 'xx_DashboardBudgetTransfer')
+    DashboardSection = apps.get_model('budget_management', 'xx_DashboardSection')
+
+    legacy = DashboardBudgetTransfer.objects.filter(Dashboard_id=1).first()
+    if legacy is None or not legacy.data:
+        return
+    try:
+        sections = json.loads(legacy.data)
+    except ValueError:
+        return
+    for section, data in sections.items():
+        DashboardSection.objects.create(section=section, version=1, data=json.dumps(data))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget_management', '0009_dashboard_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='xx_DashboardSection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(max_length=20, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+                ('data', models.TextField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'XX_DASHBOARD_SECTION_XX',
+            },
+        ),
+        migrations.RunPython(split_dashboard_blob, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,150 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:41
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_dashboard_scopes(apps, schema_editor):
+    """Attribute the existing transfers to scopes and seed the per-scope slices"""
+    BudgetTransfer = apps.get_model('budget_management', 'xx_BudgetTransfer')
+    TransactionTransfer = apps.get_model('adjd_transaction', 'xx_TransactionTransfer')
+    DashboardScope = apps.get_model('budget_management', 'xx_DashboardScope')
+    DashboardTransferScope = apps.get_model('budget_management', 'xx_DashboardTransferScope')
+    DashboardScopeCounter = apps.get_model('budget_management', 'xx_DashboardScopeCounter')
+    DashboardAccountTotal = apps.get_model('budget_management', 'xx_DashboardAccountTotal')
+
+    centers = {}
+    for transaction_id, cost_center_code in TransactionTransfer.objects.values_list(
+        'transaction_id', 'cost_center_code'
+    ).distinct():
+        if cost_center_code is not None:
+            centers.setdefault(transaction_id, set()).add(str(cost_center_code))
+
+    scope_ids = {}
+
+    def get_scope_id(key):
+        if key not in scope_ids:
+            scope_ids[key] = DashboardScope.objects.create(
+                scope_hash=hashlib.sha256(key.encode('utf-8')).hexdigest(), entity_codes=key
+            ).id
+        return scope_ids[key]
+
+    transfer_scopes = {}
+    counters = {}
+    for row in BudgetTransfer.objects.values('transaction_id', 'status', 'status_level', 'code').iterator():
+        scope_id = get_scope_id(','.join(sorted(centers.get(row['transaction_id'], ()))))
+        transfer_scopes[row['transaction_id']] = scope_id
+        keys = ['total']
+        if row['status']:
+            keys.append(f"status:{row['status']}")
+        if row['status_level'] is not None:
+            keys.append(f"level:{row['status_level']}")
+        prefix = (row['code'] or '')[:3].upper()
+        if prefix in ('FAR', 'AFR', 'FAD'):
+            keys.append(f'code:{prefix}')
+        for key in keys:
+            counters[(scope_id, key)] = counters.get((scope_id, key), 0) + 1
+
+    DashboardTransferScope.objects.bulk_create(
+        [
+            DashboardTransferScope(transaction_id=transaction_id, scope_id=scope_id)
+            for transaction_id, scope_id in transfer_scopes.items()
+        ],
+        batch_size=1000,
+    )
+    DashboardScopeCounter.objects.bulk_create(
+        [
+            DashboardScopeCounter(scope_id=scope_id, counter_key=key, value=value)
+            for (scope_id, key), value in counters.items()
+        ],
+        batch_size=1000,
+    )
+
+    # Replace the global per cost center/account totals by per-scope ones
+    totals = {}
+    rows = (
+        TransactionTransfer.objects.filter(transaction__status='approved')
+        .values('transaction_id', 'cost_center_code', 'account_code')
+        .annotate(total_from=Sum('from_center'), total_to=Sum('to_center'))
+    )
+    for row in rows:
+        key = (transfer_scopes[row['transaction_id']], row['cost_center_code'], row['account_code'])
+        total_from, total_to = totals.get(key, (0, 0))
+        totals[key] = (total_from + (row['total_from'] or 0), total_to + (row['total_to'] or 0))
+
+    DashboardAccountTotal.objects.all().delete()
+    DashboardAccountTotal.objects.bulk_create(
+        [
+            DashboardAccountTotal(
+                scope_id=scope_id,
+                cost_center_code=cost_center_code,
+                account_code=account_code,
+                total_from_center=total_from,
+                total_to_center=total_to,
+            )
+            for (scope_id, cost_center_code, account_code), (total_from, total_to) in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget_management', '0010_dashboard_section'),
+        ('adjd_transaction', '0003_alter_xx_transactiontransfer_account_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='xx_DashboardScope',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope_hash', models.CharField(max_length=64, unique=True)),
+                ('entity_codes', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'XX_DASHBOARD_SCOPE_XX',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='xx_dashboardaccounttotal',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='xx_dashboardaccounttotal',
+            name='scope',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='account_totals', to='budget_management.xx_dashboardscope'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='xx_dashboardaccounttotal',
+            unique_together={('scope', 'cost_center_code', 'account_code')},
+        ),
+        migrations.CreateModel(
+            name='xx_DashboardTransferScope',
+            fields=[
+                ('transaction_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('scope', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfers', to='budget_management.xx_dashboardscope')),
+            ],
+            options={
+                'db_table': 'XX_DASHBOARD_TRANSFER_SCOPE_XX',
+            },
+        ),
+        migrations.CreateModel(
+            name='xx_DashboardScopeCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counter_key', models.CharField(max_length=50)),
+                ('value', models.BigIntegerField(default=0)),
+                ('scope', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counters', to='budget_management.xx_dashboardscope')),
+            ],
+            options={
+                'db_table': 'XX_DASHBOARD_SCOPE_COUNTER_XX',
+                'unique_together': {('scope', 'counter_key')},
+            },
+        ),
+        migrations.RunPython(populate_dashboard_scopes, migrations.RunPython.noop),
+    ]
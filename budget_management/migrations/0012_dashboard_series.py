@@ -0,0 +1,84 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:45
+
+from datetime import timedelta
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_dashboard_series(apps, schema_editor):
+    """Bucket the existing transfers by request date"""
+    BudgetTransfer = apps.get_model('budget_management', 'xx_BudgetTransfer')
+    DashboardTransferScope = apps.get_model('budget_management', 'xx_DashboardTransferScope')
+    DashboardSeriesBucket = apps.get_model('budget_management', 'xx_DashboardSeriesBucket')
+
+    scopes = dict(DashboardTransferScope.objects.values_list('transaction_id', 'scope_id'))
+    buckets = {}
+    rows = BudgetTransfer.objects.filter(request_date__isnull=False).values(
+        'transaction_id', 'request_date', 'status', 'code', 'amount'
+    )
+    for row in rows.iterator():
+        if row['transaction_id'] not in scopes:
+            continue
+        request_date = row['request_date']
+        if timezone.is_aware(request_date):
+            request_date = timezone.localtime(request_date)
+        day = request_date.date()
+        prefix = (row['code'] or '')[:3].upper()
+        transfer_type = prefix if prefix in ('FAR', 'AFR', 'FAD') else 'OTHER'
+        periods = {
+            'day': day,
+            'week': day - timedelta(days=day.weekday()),
+            'month': day.replace(day=1),
+        }
+        for granularity, start in periods.items():
+            key = (scopes[row['transaction_id']], granularity, start, row['status'] or 'none', transfer_type)
+            count, amount = buckets.get(key, (0, Decimal('0')))
+            buckets[key] = (count + 1, amount + (row['amount'] or 0))
+
+    DashboardSeriesBucket.objects.bulk_create(
+        [
+            DashboardSeriesBucket(
+                scope_id=scope_id,
+                granularity=granularity,
+                period_start=start,
+                status=status,
+                transfer_type=transfer_type,
+                transfer_count=count,
+                total_amount=amount,
+            )
+            for (scope_id, granularity, start, status, transfer_type), (count, amount) in buckets.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget_management', '0011_dashboard_scopes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='xx_DashboardSeriesBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('period_start', models.DateField()),
+                ('status', models.CharField(max_length=10)),
+                ('transfer_type', models.CharField(max_length=5)),
+                ('transfer_count', models.BigIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=30)),
+                ('scope', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series_buckets', to='budget_management.xx_dashboardscope')),
+            ],
+            options={
+                'db_table': 'XX_DASHBOARD_SERIES_BUCKET_XX',
+                'indexes': [models.Index(fields=['granularity', 'period_start'], name='XX_DASH_SERIES_PERIOD_IDX')],
+                'unique_together': {('scope', 'granularity', 'period_start', 'status', 'transfer_type')},
+            },
+        ),
+        migrations.RunPython(populate_dashboard_series, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:48
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def populate_dashboard_cube(apps, schema_editor):
+    """Rebuild the totals as a cube over all transfer statuses and fiscal years"""
+    TransactionTransfer = apps.get_model('adjd_transaction', 'xx_TransactionTransfer')
+    DashboardTransferScope = apps.get_model('budget_management', 'xx_DashboardTransferScope')
+    DashboardAccountTotal = apps.get_model('budget_management', 'xx_DashboardAccountTotal')
+
+    scopes = dict(DashboardTransferScope.objects.values_list('transaction_id', 'scope_id'))
+    totals = {}
+    rows = (
+        TransactionTransfer.objects.filter(transaction__isnull=False)
+        .values('transaction_id', 'cost_center_code', 'account_code', 'transaction__fy', 'transaction__status')
+        .annotate(total_from=Sum('from_center'), total_to=Sum('to_center'))
+    )
+    for row in rows:
+        if row['transaction_id'] not in scopes:
+            continue
+        key = (
+            scopes[row['transaction_id']],
+            row['cost_center_code'],
+            row['account_code'],
+            row['transaction__fy'],
+            row['transaction__status'],
+        )
+        total_from, total_to = totals.get(key, (0, 0))
+        totals[key] = (total_from + (row['total_from'] or 0), total_to + (row['total_to'] or 0))
+
+    DashboardAccountTotal.objects.all().delete()
+    DashboardAccountTotal.objects.bulk_create(
+        [
+            DashboardAccountTotal(
+                scope_id=scope_id,
+                cost_center_code=cost_center_code,
+                account_code=account_code,
+                fiscal_year=fiscal_year,
+                status=status,
+                total_from_center=total_from,
+                total_to_center=total_to,
+            )
+            for (scope_id, cost_center_code, account_code, fiscal_year, status), (total_from, total_to)
+            in totals.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget_management', '0012_dashboard_series'),
+        ('adjd_transaction', '0003_alter_xx_transactiontransfer_account_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='xx_dashboardaccounttotal',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='xx_dashboardaccounttotal',
+            name='fiscal_year',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='xx_dashboardaccounttotal',
+            name='status',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.AlterUniqueTogether(
+            name='xx_dashboardaccounttotal',
+            unique_together={('scope', 'cost_center_code', 'account_code', 'fiscal_year', 'status')},
+        ),
+        migrations.AddIndex(
+            model_name='xx_dashboardaccounttotal',
+            index=models.Index(fields=['status', 'cost_center_code', 'account_code'], name='XX_DASH_CUBE_CC_IDX'),
+        ),
+        migrations.AddIndex(
+            model_name='xx_dashboardaccounttotal',
+            index=models.Index(fields=['status', 'account_code'], name='XX_DASH_CUBE_ACCT_IDX'),
+        ),
+        migrations.RunPython(populate_dashboard_cube, migrations.RunPython.noop),
+    ]
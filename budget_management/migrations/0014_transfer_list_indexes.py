@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget_management', '0013_dashboard_account_cube'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='xx_budgettransfer',
+            index=models.Index(fields=['status', 'status_level', 'transaction_id'], name='XX_BT_STATUS_IDX'),
+        ),
+        migrations.AddIndex(
+            model_name='xx_budgettransfer',
+            index=models.Index(fields=['request_date', 'transaction_id'], name='XX_BT_REQ_DATE_IDX'),
+        ),
+        migrations.AddIndex(
+            model_name='xx_budgettransfer',
+            index=models.Index(fields=['user_id', 'transaction_id'], name='XX_BT_USER_IDX'),
+        ),
+        migrations.AddIndex(
+            model_name='xx_budgettransfer',
+            index=models.Index(fields=['requested_by', 'transaction_id'], name='XX_BT_REQUESTER_IDX'),
+        ),
+        migrations.AddIndex(
+            model_name='xx_budgettransfer',
+            index=models.Index(fields=['fy', 'type', 'transaction_id'], name='XX_BT_FY_TYPE_IDX'),
+        ),
+        migrations.AddIndex(
+            model_name='xx_budgettransfer',
+            index=models.Index(fields=['type', 'transaction_id'], name='XX_BT_TYPE_IDX'),
+        ),
+        migrations.AddIndex(
+            model_name='xx_budgettransfer',
+            index=models.Index(fields=['code'], name='XX_BT_CODE_IDX'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:27
+
+from django.db import migrations, models
+
+from budget_transfer.global_function.transfer_codes import sync_transfer_code_sequences
+
+
+def seed_sequences(apps, schema_editor):
+    sync_transfer_code_sequences(
+        apps.get_model('budget_management', 'xx_BudgetTransfer'),
+        apps.get_model('budget_management', 'xx_TransferCodeSequence'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget_management', '0014_transfer_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='xx_TransferCodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=10, unique=True)),
+                ('last_value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'XX_TRANSFER_CODE_SEQUENCE_XX',
+            },
+        ),
+        migrations.AlterField(
+            model_name='xx_budgettransfer',
+            name='code',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:29
+
+from django.db import migrations, models
+
+from budget_transfer.global_function.approval_queue import rebuild_approval_queue
+
+
+def build_queue(apps, schema_editor):
+    rebuild_approval_queue(
+        apps.get_model('budget_management', 'xx_BudgetTransfer'),
+        apps.get_model('budget_management', 'xx_ApprovalQueueItem'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget_management', '0015_transfer_code_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='xx_ApprovalQueueItem',
+            fields=[
+                ('transaction_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('status_level', models.IntegerField()),
+                ('code_prefix', models.CharField(max_length=10)),
+                ('code', models.CharField(blank=True, max_length=20, null=True)),
+                ('request_date', models.DateTimeField(blank=True, null=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('requested_by', models.CharField(blank=True, max_length=100, null=True)),
+                ('user_id', models.IntegerField(blank=True, null=True)),
+                ('transaction_date', models.CharField(max_length=10)),
+            ],
+            options={
+                'db_table': 'XX_APPROVAL_QUEUE_ITEM_XX',
+                'indexes': [models.Index(fields=['status_level', 'code_prefix', 'request_date', 'transaction_id'], name='XX_APPROVAL_QUEUE_IDX')],
+            },
+        ),
+        migrations.RunPython(build_queue, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_scope_entities(apps, schema_editor):
+    scope_model = apps.get_model('budget_management', 'xx_DashboardScope')
+    entity_model = apps.get_model('budget_management', 'xx_DashboardScopeEntity')
+    rows = []
+    for scope_id, entity_codes in scope_model.objects.values_list('id', 'entity_codes').iterator():
+        rows.extend(
+            entity_model(scope_id=scope_id, entity_code=code)
+            for code in (entity_codes or '').split(',') if code
+        )
+        if len(rows) >= 1000:
+            entity_model.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    entity_model.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget_management', '0016_approval_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='xx_DashboardScopeEntity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_code', models.CharField(max_length=50)),
+                ('scope', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entities', to='budget_management.xx_dashboardscope')),
+            ],
+            options={
+                'db_table': 'XX_DASHBOARD_SCOPE_ENTITY_XX',
+                'unique_together': {('scope', 'entity_code')},
+            },
+        ),
+        migrations.RunPython(fill_scope_entities, migrations.RunPython.noop),
+    ]
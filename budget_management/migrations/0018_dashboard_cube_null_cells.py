@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:50
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+def merge_duplicate_cells(apps, schema_editor):
+    """Fold the cells a NULL key let the signals create twice into one row"""
+    total_model = apps.get_model('budget_management', 'xx_DashboardAccountTotal')
+    cells = {}
+    duplicates = []
+    rows = total_model.objects.order_by('id').values_list(
+        'id', 'scope_id', 'cost_center_code', 'account_code', 'fiscal_year', 'status',
+        'total_from_center', 'total_to_center',
+    )
+    for row_id, *key, total_from, total_to in rows.iterator():
+        key = tuple(key)
+        if key not in cells:
+            cells[key] = [row_id, total_from, total_to, False]
+            continue
+        cell = cells[key]
+        cell[1] += total_from
+        cell[2] += total_to
+        cell[3] = True
+        duplicates.append(row_id)
+    for row_id, total_from, total_to, merged in cells.values():
+        if merged:
+            total_model.objects.filter(id=row_id).update(total_from_center=total_from, total_to_center=total_to)
+    for start in range(0, len(duplicates), 1000):
+        total_model.objects.filter(id__in=duplicates[start:start + 1000]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget_management', '0017_dashboard_scope_entities'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='xx_dashboardaccounttotal',
+            unique_together=set(),
+        ),
+        migrations.RunPython(merge_duplicate_cells, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='xx_dashboardaccounttotal',
+            constraint=models.UniqueConstraint(models.F('scope'), django.db.models.functions.comparison.Coalesce('cost_center_code', models.Value(-1)), django.db.models.functions.comparison.Coalesce('account_code', models.Value(-1)), django.db.models.functions.comparison.Coalesce('fiscal_year', models.Value(-1)), models.F('status'), name='XX_DASH_CUBE_CELL_UNQ'),
+        ),
+    ]
@@ -16,7 +16,7 @@ class xx_BudgetTransfer(models.Model):
     user_id = models.IntegerField(null=True, blank=True)
     request_date = models.DateTimeField(auto_now_add=True)
     notes = models.TextField(null=True, blank=True)  # Keep as TextField but avoid in complex queries
-    code = models.CharField(max_length=10, null=True, blank=True)
+    code = models.CharField(max_length=20, null=True, blank=True)
     gl_posting_status = models.CharField(max_length=50, null=True, blank=True)  # Changed from EncryptedCharField
     approvel_1 = models.CharField(max_length=100, null=True, blank=True)  # Changed from EncryptedCharField
     approvel_2 = models.CharField(max_length=100, null=True, blank=True)  # Changed from EncryptedCharField
@@ -40,6 +40,16 @@ class xx_BudgetTransfer(models.Model):
     
     class Meta:
         db_table = 'XX_BUDGET_TRANSFER_XX'
+        # The list filters (transfer_filters), each ending in the list order
+        indexes = [
+            models.Index(fields=['status', 'status_level', 'transaction_id'], name='XX_BT_STATUS_IDX'),
+            models.Index(fields=['request_date', 'transaction_id'], name='XX_BT_REQ_DATE_IDX'),
+            models.Index(fields=['user_id', 'transaction_id'], name='XX_BT_USER_IDX'),
+            models.Index(fields=['requested_by', 'transaction_id'], name='XX_BT_REQUESTER_IDX'),
+            models.Index(fields=['fy', 'type', 'transaction_id'], name='XX_BT_FY_TYPE_IDX'),
+            models.Index(fields=['type', 'transaction_id'], name='XX_BT_TYPE_IDX'),
+            models.Index(fields=['code'], name='XX_BT_CODE_IDX'),
+        ]
     
     def __str__(self):
         return f"Transfer {self.transaction_id}: {self.amount} requested by {self.requested_by}"
@@ -49,92 +59,81 @@ class xx_BudgetTransfer(models.Model):
 # JOIN XX_Entity_XX ON XX_Transaction_Transfer_XX.cost_center_code = XX_Entity_XX.entity 
 # WHERE XX_Entity_XX.id IN (value1, value2, ...);
 
-from django.db.models import Q, Count, F
+from django.db.models import Q, Count, F, Exists, OuterRef
 from django.db.models import Value
-from django.db.models.functions import Cast
+from django.db.models.functions import Cast, Coalesce
 from django.db.models import CharField
+from public_funtion.entity_scope_cache import get_allowed_entity_codes
+from public_funtion.hierarchy_closure import subtree_codes
 
 def get_entities_with_children(entity_ids):
     """
     Given a list of entity IDs, return all XX_Entity objects including their children (recursively).
+
+    The subtrees are read from the XX_EntityClosure table in one query.
+    """
+    codes = XX_Entity.objects.filter(id__in=entity_ids).values('entity')
+    return list(XX_Entity.objects.filter(entity__in=subtree_codes(XX_Entity, codes)))
+
+def get_user_entity_codes(user, Type=None):
+    """
+    Return the codes of the entities (including children) the user has abilities on.
+
+    Args:
+        user: xx_User instance
+        Type (str, optional): Only abilities of this type ('edit' or 'approve'); all when None
+
+    The codes are cached per user and type (see public_funtion.entity_scope_cache).
     """
-    # Start with the initial set
-    entities = list(XX_Entity.objects.filter(id__in=entity_ids))
-    collected_ids = set(e.id for e in entities)
+    return list(get_allowed_entity_codes(user, Type))
 
-    queue = list(entities)  # start with base entities
-    while queue:
-        parent_entity = queue.pop(0)
+def user_entity_codes_subquery(user, Type=None):
+    """
+    Subquery of the entity codes (including children) the user has abilities
+    on, read from the entity closure table inside the calling statement
+
+    Args:
+        user: xx_User instance
+        Type (str, optional): Only abilities of this type ('edit' or 'approve'); all when None
+    """
+    # One filter() call, so both conditions apply to the same ability row
+    conditions = {'user_abilities__user_id': user.pk}
+    if Type is not None:
+        conditions['user_abilities__Type'] = Type
+    return subtree_codes(XX_Entity, XX_Entity.objects.filter(**conditions).values('entity'))
 
-        # Find children where parent matches the string version of this entity number
-        children = XX_Entity.objects.filter(parent=str(parent_entity.entity))
+def filter_transactions_all_in_entities(queryset, user, Type='edit'):
+    """
+    Keep the rows of queryset whose transaction has *all* its lines in the
+    user's entities (or that the user created).
 
-        for child in children:
-            if child.id not in collected_ids:
-                collected_ids.add(child.id)
-                entities.append(child)
-                queue.append(child)
+    queryset is any queryset with transaction_id and user_id fields
+    (xx_BudgetTransfer, xx_ApprovalQueueItem, ...). Transactions without
+    lines are kept. The check is a NOT EXISTS on the lines outside the
+    user's entity subtrees, joined to the closure table in the same
+    statement, so no code or id list is sent to the database.
+    """
+    from adjd_transaction.models import xx_TransactionTransfer
 
-    return entities
+    # Line codes are numbers, the closure holds the entity codes as text
+    outside_lines = (
+        xx_TransactionTransfer.objects.filter(
+            transaction_id=OuterRef('transaction_id'), cost_center_code__isnull=False
+        )
+        .annotate(cost_center_text=Cast('cost_center_code', CharField(max_length=50)))
+        .exclude(cost_center_text__in=user_entity_codes_subquery(user, Type))
+    )
+    return queryset.filter(~Exists(outside_lines) | Q(user_id=user.id))
 
 def filter_budget_transfers_all_in_entities(budget_transfers, user, Type = 'edit'):
     """
     From a given queryset of BudgetTransfer objects,
     return only those where *all* related transactions
-    belong to the given entity_ids.
-    
-    Modified to avoid Oracle NCLOB issues with complex annotations.
-    """
-    entity_ids = [ability.Entity.id for ability in user.abilities.all() if ability.Entity and ability.Type == Type]
-    entities = get_entities_with_children(entity_ids)
-    entity_codes = [e.entity for e in entities]
-    
-    # Simplified approach to avoid NCLOB issues
-    # Get transfer IDs that have all their transactions in allowed entities
-    from django.db import connection
-    
-    try:
-        # Use raw SQL to avoid NCLOB issues with complex annotations
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT bt.transaction_id
-                FROM XX_BUDGET_TRANSFER_XX bt
-                WHERE NOT EXISTS (
-                    SELECT 1 
-                    FROM XX_Transaction_Transfer_XX tt 
-                    WHERE tt.transaction_id = bt.transaction_id 
-                    AND tt.cost_center_code NOT IN %s
-                )
-                AND EXISTS (
-                    SELECT 1 
-                    FROM XX_Transaction_Transfer_XX tt2 
-                    WHERE tt2.transaction_id = bt.transaction_id
-                )
-
-                UNION
-
-                SELECT bt.transaction_id
-                FROM XX_BUDGET_TRANSFER_XX bt
-                WHERE NOT EXISTS (
-                    SELECT 1 
-                    FROM XX_Transaction_Transfer_XX tt 
-                    WHERE tt.transaction_id = bt.transaction_id
-                )
-            """, [tuple(entity_codes) if entity_codes else ()])
-
-            allowed_ids = [row[0] for row in cursor.fetchall()]
-        
-        combined = budget_transfers.filter(
-            Q(transaction_id__in=allowed_ids) | Q(user_id=user.id)
-        ).distinct()
-        return combined
+    belong to the user's entities (or that the user created).
 
-    except Exception as e:
-        # Fallback to simple filtering if raw SQL fails
-        print(f"Error occurred: {e}")
-        return budget_transfers.filter(
-            Q(adjd_transfers__cost_center_code__in=entity_codes) | Q(user_id=user.id)
-        ).distinct()
+    See filter_transactions_all_in_entities.
+    """
+    return filter_transactions_all_in_entities(budget_transfers, user, Type)
 
 
 
@@ -181,10 +180,52 @@ class xx_BudgetTransferRejectReason(models.Model):
         return f"Reject Reason for Transfer {self.budget_transfer_id}: {self.reason_text}"
 
 
+class xx_TransferCodeSequence(models.Model):
+    """Last number handed out per transfer code prefix (FAR, AFR, FAD), see transfer_codes"""
+    prefix = models.CharField(max_length=10, unique=True)
+    last_value = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'XX_TRANSFER_CODE_SEQUENCE_XX'
+
+    def __str__(self):
+        return f"Transfer Code Sequence {self.prefix}: {self.last_value}"
+
+
+class xx_ApprovalQueueItem(models.Model):
+    """
+    Approvers' work queue: one row per pending budget transfer with the
+    fields of the approval list, keyed for the inbox read (level, code prefix,
+    newest first). Maintained by the budget_management signals, see
+    approval_queue.
+    """
+    transaction_id = models.IntegerField(primary_key=True)  # xx_BudgetTransfer
+    status_level = models.IntegerField()
+    code_prefix = models.CharField(max_length=10)
+    code = models.CharField(max_length=20, null=True, blank=True)
+    request_date = models.DateTimeField(null=True, blank=True)
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    requested_by = models.CharField(max_length=100, null=True, blank=True)
+    user_id = models.IntegerField(null=True, blank=True)
+    transaction_date = models.CharField(max_length=10)
+
+    class Meta:
+        db_table = 'XX_APPROVAL_QUEUE_ITEM_XX'
+        indexes = [
+            models.Index(
+                fields=['status_level', 'code_prefix', 'request_date', 'transaction_id'],
+                name='XX_APPROVAL_QUEUE_IDX',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Approval Queue Item {self.transaction_id} at level {self.status_level}"
+
+
 
 
 class xx_DashboardBudgetTransfer(models.Model):
-    """Model to store dashboard data for budget transfers"""
+    """Legacy single-row store of all dashboard data (replaced by xx_DashboardSection)"""
     Dashboard_id = models.AutoField(primary_key=True)
     data = models.TextField(null=True, blank=True)  # Keep as TextField but avoid in complex queries
     date = models.DateTimeField(auto_now_add=True)  # Changed from EncryptedDateTimeField
@@ -203,4 +244,156 @@ class xx_DashboardBudgetTransfer(models.Model):
         db_table = 'XX_DASHBOARD_BUDGET_TRANSFER_XX'
     
     def __str__(self):
-        return f"Dashboard Data {self.Dashboard_id} from {self.date}"
\ No newline at end of file
+        return f"Dashboard Data {self.Dashboard_id} from {self.date}"
+
+
+class xx_DashboardSection(models.Model):
+    """Model to store one dashboard section (smart, normal, ...) per row with a version number"""
+    section = models.CharField(max_length=20, unique=True)
+    version = models.BigIntegerField(default=0)
+    data = models.TextField(null=True, blank=True)  # Keep as TextField but avoid in complex queries
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def get_data(self):
+        """Helper method to retrieve JSON data as dictionary"""
+        if self.data:
+            return json.loads(self.data)
+        return None
+
+    class Meta:
+        db_table = 'XX_DASHBOARD_SECTION_XX'
+
+    def __str__(self):
+        return f"Dashboard Section {self.section} v{self.version}"
+
+
+class xx_DashboardCounter(models.Model):
+    """Incrementally maintained counters behind the normal dashboard (status, level, code prefix)"""
+    counter_key = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'XX_DASHBOARD_COUNTER_XX'
+
+    def __str__(self):
+        return f"Dashboard Counter {self.counter_key}: {self.value}"
+
+
+class xx_DashboardScope(models.Model):
+    """
+    Set of cost centers a transfer's lines touch. Dashboard slices are keyed by
+    scope so a user's dashboard is the merge of the scopes inside their entities.
+    """
+    scope_hash = models.CharField(max_length=64, unique=True)
+    entity_codes = models.TextField(null=True, blank=True)  # Comma separated, sorted; keep out of complex queries
+
+    class Meta:
+        db_table = 'XX_DASHBOARD_SCOPE_XX'
+
+    def get_entity_codes(self):
+        """Helper method to retrieve the entity codes as a set"""
+        return set(code for code in (self.entity_codes or '').split(',') if code)
+
+    def __str__(self):
+        return f"Dashboard Scope {self.id}: {self.entity_codes}"
+
+
+class xx_DashboardScopeEntity(models.Model):
+    """Cost centers of a dashboard scope as rows, so scopes can be matched to entities in SQL"""
+    scope = models.ForeignKey(xx_DashboardScope, on_delete=models.CASCADE, related_name='entities')
+    entity_code = models.CharField(max_length=50)
+
+    class Meta:
+        db_table = 'XX_DASHBOARD_SCOPE_ENTITY_XX'
+        unique_together = ('scope', 'entity_code')
+
+    def __str__(self):
+        return f"Scope {self.scope_id} Entity {self.entity_code}"
+
+
+class xx_DashboardTransferScope(models.Model):
+    """Current dashboard scope of each budget transfer"""
+    transaction_id = models.IntegerField(primary_key=True)
+    scope = models.ForeignKey(xx_DashboardScope, on_delete=models.CASCADE, related_name='transfers')
+
+    class Meta:
+        db_table = 'XX_DASHBOARD_TRANSFER_SCOPE_XX'
+
+    def __str__(self):
+        return f"Transfer {self.transaction_id} in scope {self.scope_id}"
+
+
+class xx_DashboardScopeCounter(models.Model):
+    """Normal dashboard counters per scope"""
+    scope = models.ForeignKey(xx_DashboardScope, on_delete=models.CASCADE, related_name='counters')
+    counter_key = models.CharField(max_length=50)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'XX_DASHBOARD_SCOPE_COUNTER_XX'
+        unique_together = ('scope', 'counter_key')
+
+    def __str__(self):
+        return f"Scope {self.scope_id} Counter {self.counter_key}: {self.value}"
+
+
+class xx_DashboardSeriesBucket(models.Model):
+    """Transfer count and amount per scope, period, status and code type (by request date)"""
+    GRANULARITY_CHOICES = [
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ]
+    scope = models.ForeignKey(xx_DashboardScope, on_delete=models.CASCADE, related_name='series_buckets')
+    granularity = models.CharField(max_length=5, choices=GRANULARITY_CHOICES)
+    period_start = models.DateField()  # Day, Monday of the week or first day of the month
+    status = models.CharField(max_length=10)
+    transfer_type = models.CharField(max_length=5)  # FAR, AFR, FAD or OTHER
+    transfer_count = models.BigIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=30, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'XX_DASHBOARD_SERIES_BUCKET_XX'
+        unique_together = ('scope', 'granularity', 'period_start', 'status', 'transfer_type')
+        indexes = [
+            models.Index(fields=['granularity', 'period_start'], name='XX_DASH_SERIES_PERIOD_IDX'),
+        ]
+
+    def __str__(self):
+        return f"Dashboard Series {self.granularity} {self.period_start} {self.status}/{self.transfer_type}: {self.transfer_count}"
+
+
+class xx_DashboardAccountTotal(models.Model):
+    """
+    Cube of transfer line from/to sums per scope, cost center, account, fiscal
+    year and transfer status, maintained incrementally from the transfer signals
+    """
+    scope = models.ForeignKey(xx_DashboardScope, on_delete=models.CASCADE, related_name='account_totals', null=True, blank=True)
+    cost_center_code = models.IntegerField(null=True, blank=True)
+    account_code = models.IntegerField(null=True, blank=True)
+    fiscal_year = models.IntegerField(null=True, blank=True)  # fy of the transfer
+    status = models.CharField(max_length=10, null=True, blank=True)  # status of the transfer
+    total_from_center = models.DecimalField(max_digits=30, decimal_places=2, default=0)
+    total_to_center = models.DecimalField(max_digits=30, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'XX_DASHBOARD_ACCOUNT_TOTAL_XX'
+        constraints = [
+            # NULLs never collide in a plain unique key, cells without a fiscal
+            # year, cost center or account are kept unique under -1 instead
+            models.UniqueConstraint(
+                'scope',
+                Coalesce('cost_center_code', Value(-1)),
+                Coalesce('account_code', Value(-1)),
+                Coalesce('fiscal_year', Value(-1)),
+                'status',
+                name='XX_DASH_CUBE_CELL_UNQ',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'cost_center_code', 'account_code'], name='XX_DASH_CUBE_CC_IDX'),
+            models.Index(fields=['status', 'account_code'], name='XX_DASH_CUBE_ACCT_IDX'),
+        ]
+
+    def __str__(self):
+        return f"Dashboard Total {self.cost_center_code}/{self.account_code}"
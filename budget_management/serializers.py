@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import xx_BudgetTransfer
+from .models import xx_ApprovalQueueItem, xx_BudgetTransfer
 
 class BudgetTransferSerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,3 +21,25 @@ class BudgetTransferSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
+
+
+class ApprovalQueueItemSerializer(serializers.ModelSerializer):
+    """The approval list fields, read from the approvers' work queue"""
+    status = serializers.SerializerMethodField()
+
+    class Meta:
+        model = xx_ApprovalQueueItem
+        fields = [
+            'transaction_id',
+            'amount',
+            'status',
+            'status_level',
+            'requested_by',
+            'request_date',
+            'code',
+            'transaction_date',
+        ]
+
+    def get_status(self, obj):
+        # Only pending transfers are queued
+        return "pending"
@@ -12,5 +12,29 @@ except ImportError as e:
 except Exception as e:
     print(f"✗ Unexpected error loading budget transfer signals: {e}")
 
+try:
+    from . import transcation_transfer
+    print("✓ Transaction transfer signals imported successfully")
+except ImportError as e:
+    print(f"✗ Error importing transaction transfer signals: {e}")
+except Exception as e:
+    print(f"✗ Unexpected error loading transaction transfer signals: {e}")
+
+try:
+    from . import transfer_search
+    print("✓ Transfer search signals imported successfully")
+except ImportError as e:
+    print(f"✗ Error importing transfer search signals: {e}")
+except Exception as e:
+    print(f"✗ Unexpected error loading transfer search signals: {e}")
+
+try:
+    from . import approval_queue
+    print("✓ Approval queue signals imported successfully")
+except ImportError as e:
+    print(f"✗ Error importing approval queue signals: {e}")
+except Exception as e:
+    print(f"✗ Unexpected error loading approval queue signals: {e}")
+
 # You can add more signal imports here in the future
 # from . import other_signals_file
\ No newline at end of file
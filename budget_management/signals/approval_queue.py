@@ -0,0 +1,32 @@
+"""
+Django signals keeping the approvers' work queue up to date
+The queue row is written in the same transaction as the transfer
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from ..models import xx_BudgetTransfer
+import logging
+from budget_transfer.global_function.approval_queue import (
+    remove_approval_queue_item,
+    sync_approval_queue_item,
+)
+# Configure logging for approval queue signals
+logger = logging.getLogger('approval_queue_signals')
+
+
+@receiver(post_save, sender=xx_BudgetTransfer)
+def budget_transfer_queue_post_save(sender, instance, **kwargs):
+    """Queue, update or unqueue the transfer after a status or field change"""
+    try:
+        sync_approval_queue_item(instance)
+    except Exception as e:
+        logger.error(f"Error updating the approval queue: {str(e)}")
+
+
+@receiver(post_delete, sender=xx_BudgetTransfer)
+def budget_transfer_queue_post_delete(sender, instance, **kwargs):
+    """Unqueue the deleted transfer"""
+    try:
+        remove_approval_queue_item(instance.transaction_id)
+    except Exception as e:
+        logger.error(f"Error updating the approval queue: {str(e)}")
@@ -8,7 +8,13 @@ from django.utils import timezone
 from ..models import xx_BudgetTransfer
 from user_management.models import xx_notification
 import logging
-from budget_transfer.global_function.dashbaord import dashboard_smart,dashboard_normal
+from budget_transfer.global_function.dashboard_refresh import schedule_dashboard_refresh
+from budget_transfer.global_function.dashboard_aggregates import (
+    TRANSFER_STATE_FIELDS,
+    apply_transfer_delta,
+    get_transfer_state,
+    instance_state,
+)
 # Configure logging for budget transfer signals
 logger = logging.getLogger('budget_transfer_signals')
 
@@ -18,6 +24,19 @@ logger = logging.getLogger('budget_transfer_signals')
 
 
 
+@receiver(pre_save, sender=xx_BudgetTransfer)
+def budget_transfer_pre_save(sender, instance, **kwargs):
+    """
+    Function executed BEFORE saving xx_BudgetTransfer
+    Remember the stored state so post_save can apply the dashboard delta
+    """
+    try:
+        instance._dashboard_previous_state = get_transfer_state(instance.pk)
+    except Exception as e:
+        instance._dashboard_previous_state = None
+        logger.error(f"Error in budget_transfer_pre_save: {str(e)}")
+
+
 @receiver(post_save, sender=xx_BudgetTransfer)
 def budget_transfer_post_save(sender, instance, created, **kwargs):
     """
@@ -25,24 +44,49 @@ def budget_transfer_post_save(sender, instance, created, **kwargs):
     Use this for notifications, related updates, or post-processing
     """
     try:
-        # Run dashboard function for ALL saves (create AND update)
-        if instance.status == "approved":
-            print("approved enterd")
-            dashboard_smart()
-        # elif instance.status == "pending":
-        print("pending enterd")
-        dashboard_normal()
+        # Apply the change to the incremental dashboard aggregates
+        previous_state = getattr(instance, "_dashboard_previous_state", None)
+        apply_transfer_delta(
+            instance.transaction_id,
+            previous_state,
+            instance_state(instance, TRANSFER_STATE_FIELDS),
+        )
+        was_approved = bool(previous_state) and previous_state["status"] == "approved"
+
+        # Queue a dashboard rebuild for ALL saves (create AND update); the refresh
+        # worker coalesces them so a bulk approval triggers one rebuild per section
+        if instance.status == "approved" or was_approved:
+            schedule_dashboard_refresh("smart", "normal")
+        else:
+            schedule_dashboard_refresh("normal")
         
         if created:
-            logger.info(f"New BudgetTransfer created: {instance.transaction_id} - Dashboard updated")
+            logger.info(f"New BudgetTransfer created: {instance.transaction_id} - Dashboard refresh queued")
         else:
-            logger.info(f"BudgetTransfer updated: {instance.transaction_id} - Dashboard updated")
+            logger.info(f"BudgetTransfer updated: {instance.transaction_id} - Dashboard refresh queued")
                 
     except Exception as e:
         logger.error(f"Error in budget_transfer_post_save: {str(e)}")
 
 
 
+@receiver(pre_delete, sender=xx_BudgetTransfer)
+def budget_transfer_pre_delete(sender, instance, **kwargs):
+    """
+    Function executed BEFORE deleting xx_BudgetTransfer
+    The dashboard delta is booked here, while all lines still exist: the line
+    foreign key is nullable, so Django may delete the lines after the transfer
+    """
+    try:
+        apply_transfer_delta(
+            instance.transaction_id,
+            get_transfer_state(instance.transaction_id) or instance_state(instance, TRANSFER_STATE_FIELDS),
+            None,
+        )
+    except Exception as e:
+        logger.error(f"Error in budget_transfer_pre_delete: {str(e)}")
+
+
 @receiver(post_delete, sender=xx_BudgetTransfer)
 def budget_transfer_post_delete(sender, instance, **kwargs):
     """
@@ -50,9 +94,9 @@ def budget_transfer_post_delete(sender, instance, **kwargs):
     Use this for cleanup, notifications, or post-deletion processing
     """
     try:
-        dashboard_smart()
+        schedule_dashboard_refresh("smart", "normal")
 
-        logger.info(f"Dashboard updated after deleting BudgetTransfer {instance.transaction_id}")
+        logger.info(f"Dashboard refresh queued after deleting BudgetTransfer {instance.transaction_id}")
             
     except Exception as e:
         logger.error(f"Error in budget_transfer_post_delete: {str(e)}")
@@ -0,0 +1,68 @@
+"""
+Django signals for xx_TransactionTransfer model
+Keep the dashboard per cost center/account totals in step with transfer lines
+"""
+from django.db.models.signals import post_save, pre_save, post_delete
+from django.dispatch import receiver
+from adjd_transaction.models import xx_TransactionTransfer
+import logging
+from budget_transfer.global_function.dashboard_refresh import schedule_dashboard_refresh
+from budget_transfer.global_function.dashboard_aggregates import (
+    LINE_STATE_FIELDS,
+    apply_line_delta,
+    get_line_state,
+    instance_state,
+)
+# Configure logging for transaction transfer signals
+logger = logging.getLogger('transaction_transfer_signals')
+
+# ============================================================================
+# xx_TransactionTransfer Signals
+# ============================================================================
+
+
+@receiver(pre_save, sender=xx_TransactionTransfer)
+def transaction_transfer_pre_save(sender, instance, **kwargs):
+    """
+    Function executed BEFORE saving xx_TransactionTransfer
+    Remember the stored line so post_save can apply the dashboard delta
+    """
+    try:
+        instance._dashboard_previous_state = get_line_state(instance.pk)
+    except Exception as e:
+        instance._dashboard_previous_state = None
+        logger.error(f"Error in transaction_transfer_pre_save: {str(e)}")
+
+
+@receiver(post_save, sender=xx_TransactionTransfer)
+def transaction_transfer_post_save(sender, instance, created, **kwargs):
+    """
+    Function executed AFTER saving xx_TransactionTransfer
+    Only lines of approved transfers change the dashboard totals
+    """
+    try:
+        changed = apply_line_delta(
+            getattr(instance, "_dashboard_previous_state", None),
+            instance_state(instance, LINE_STATE_FIELDS),
+        )
+        if changed:
+            schedule_dashboard_refresh("smart")
+            logger.info(f"TransactionTransfer {instance.transfer_id} saved - Dashboard refresh queued")
+
+    except Exception as e:
+        logger.error(f"Error in transaction_transfer_post_save: {str(e)}")
+
+
+@receiver(post_delete, sender=xx_TransactionTransfer)
+def transaction_transfer_post_delete(sender, instance, **kwargs):
+    """
+    Function executed AFTER deleting xx_TransactionTransfer
+    """
+    try:
+        changed = apply_line_delta(instance_state(instance, LINE_STATE_FIELDS), None)
+        if changed:
+            schedule_dashboard_refresh("smart")
+            logger.info(f"TransactionTransfer {instance.transfer_id} deleted - Dashboard refresh queued")
+
+    except Exception as e:
+        logger.error(f"Error in transaction_transfer_post_delete: {str(e)}")
@@ -0,0 +1,51 @@
+"""
+Django signals keeping the transfer full-text search index up to date
+The side index is written once the database transaction commits
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from ..models import xx_BudgetTransfer
+from adjd_transaction.models import xx_TransactionTransfer
+import logging
+from budget_transfer.global_function.transfer_search import (
+    index_transfer,
+    index_transfer_line,
+    remove_transfer,
+    remove_transfer_line,
+)
+# Configure logging for search index signals
+logger = logging.getLogger('transfer_search_signals')
+
+
+def _after_commit(function, *args):
+    def run():
+        try:
+            function(*args)
+        except Exception as e:
+            logger.error(f"Error updating the transfer search index: {str(e)}")
+    transaction.on_commit(run)
+
+
+@receiver(post_save, sender=xx_BudgetTransfer)
+def budget_transfer_search_post_save(sender, instance, **kwargs):
+    """Reindex the notes of the transfer"""
+    _after_commit(index_transfer, instance)
+
+
+@receiver(post_delete, sender=xx_BudgetTransfer)
+def budget_transfer_search_post_delete(sender, instance, **kwargs):
+    """Drop the transfer and its lines"""
+    _after_commit(remove_transfer, instance.transaction_id)
+
+
+@receiver(post_save, sender=xx_TransactionTransfer)
+def transaction_transfer_search_post_save(sender, instance, **kwargs):
+    """Reindex the reason, account and cost center names of the line"""
+    _after_commit(index_transfer_line, instance)
+
+
+@receiver(post_delete, sender=xx_TransactionTransfer)
+def transaction_transfer_search_post_delete(sender, instance, **kwargs):
+    """Drop the line"""
+    _after_commit(remove_transfer_line, instance.transfer_id)
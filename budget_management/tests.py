@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from adjd_transaction.models import xx_TransactionTransfer
+from adjd_transaction.views import AdjdTransactionTransferListView
+from budget_management.models import xx_ApprovalQueueItem, xx_BudgetTransfer
+from user_management.models import xx_User
+
+
+class ApprovalQueueTests(TestCase):
+    """The approvers' work queue follows the transfers"""
+
+    def setUp(self):
+        self.user = xx_User.objects.create(username="queue-user", role="admin")
+        self.transfer = xx_BudgetTransfer.objects.create(
+            transaction_date="2025-01-01",
+            amount=1,
+            status="pending",
+            status_level=2,
+            code="FAR-0001",
+            user_id=self.user.id,
+        )
+
+    def queue_amount(self):
+        return xx_ApprovalQueueItem.objects.get(transaction_id=self.transfer.transaction_id).amount
+
+    def test_pending_transfer_is_queued_and_unqueued_when_decided(self):
+        self.assertEqual(self.queue_amount(), Decimal("1.00"))
+        self.transfer.status = "approved"
+        self.transfer.save()
+        self.assertFalse(
+            xx_ApprovalQueueItem.objects.filter(transaction_id=self.transfer.transaction_id).exists()
+        )
+
+    def test_queue_amount_follows_the_line_totals(self):
+        # The line list rewrites the transfer amount with QuerySet.update()
+        for from_center, to_center in ((6, 0), (4, 0), (0, 10)):
+            xx_TransactionTransfer.objects.create(
+                transaction=self.transfer,
+                cost_center_code=100,
+                account_code=500,
+                from_center=from_center,
+                to_center=to_center,
+                approved_budget=0,
+                available_budget=0,
+                encumbrance=0,
+                actual=0,
+            )
+        request = APIRequestFactory().get("/", {"transaction": self.transfer.transaction_id})
+        force_authenticate(request, user=self.user)
+        response = AdjdTransactionTransferListView.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.transfer.refresh_from_db()
+        self.assertEqual(self.transfer.amount, Decimal("10.00"))
+        self.assertEqual(self.queue_amount(), Decimal("10.00"))
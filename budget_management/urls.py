@@ -2,6 +2,7 @@ from django.urls import path
 from .views import (
     CreateBudgetTransferView, 
     ListBudgetTransferView, 
+    TransferSearchView,
     ApproveBudgetTransferView, 
     GetBudgetTransferView,
     UpdateBudgetTransferView,
@@ -12,7 +13,9 @@ from .views import (
     DeleteBudgetTransferAttachmentView,
     ListBudgetTransferAttachmentsView,
     list_budget_transfer_reject_reason,
-    DashboardBudgetTransferView
+    DashboardBudgetTransferView,
+    DashboardTopView,
+    DashboardCombinationsView,
 )
 
 app_name = 'budget_management'
@@ -21,6 +24,7 @@ urlpatterns = [
     # Budget transfer endpoints
     path('transfers/create/', CreateBudgetTransferView.as_view(), name='create-budget-transfer'),
     path('transfers/list/', ListBudgetTransferView.as_view(), name='list-budget-transfers'),
+    path('transfers/search/', TransferSearchView.as_view(), name='search-budget-transfers'),
     path('transfers/list_underapprovel/', ListBudgetTransfer_approvels_View.as_view(), name='list-budget-transfersus_underapprovel'),
 
     path('transfers/<int:transfer_id>/', GetBudgetTransferView.as_view(), name='get-budget-transfer'),
@@ -40,5 +44,7 @@ urlpatterns = [
 
 
     path('dashboard/', DashboardBudgetTransferView.as_view(), name='dashboard-budget-transfer'),
+    path('dashboard/top/', DashboardTopView.as_view(), name='dashboard-top'),
+    path('dashboard/combinations/', DashboardCombinationsView.as_view(), name='dashboard-combinations'),
 
 ]
@@ -6,26 +6,51 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 from django.utils import timezone
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from budget_transfer.global_function.json_stream import iter_json
+from budget_transfer.global_function.transfer_search import search_transfers
+from budget_transfer.global_function.transfer_codes import next_transfer_code
+from budget_transfer.global_function.transfer_filters import (
+    TRANSFER_CODE_PREFIXES,
+    TransferFilterError,
+    apply_transfer_filters,
+    parse_transfer_filters,
+)
+from django.utils.http import parse_etags
 from django.db.models import Q, Sum
 from django.db.models.functions import Cast
 from django.db.models import CharField
 from user_management.models import xx_notification
 from .models import (
     filter_budget_transfers_all_in_entities,
+    filter_transactions_all_in_entities,
+    get_user_entity_codes,
+    xx_ApprovalQueueItem,
     xx_BudgetTransfer,
     xx_BudgetTransferAttachment,
     xx_BudgetTransferRejectReason,
 )
 from account_and_entitys.models import XX_PivotFund, XX_Entity, XX_Account
 from adjd_transaction.models import xx_TransactionTransfer
-from .serializers import BudgetTransferSerializer
+from .serializers import ApprovalQueueItemSerializer, BudgetTransferSerializer
 from user_management.permissions import IsAdmin, CanTransferBudget
 from budget_transfer.global_function.dashbaord import (
-    get_all_dashboard_data, 
-    get_saved_dashboard_data, 
-    refresh_dashboard_data
+    dashboard_etag,
+    dashboard_for_entities,
+    dashboard_smart,
+    is_filtered_smart,
+    get_all_dashboard_payload,
+    get_dashboard_versions,
+    get_saved_dashboard_payload,
+    refresh_dashboard_data,
+    dashboard_combinations,
+    dashboard_top,
+    SMART_GROUPINGS,
 )
-from public_funtion.update_pivot_fund import update_pivot_fund
+from budget_transfer.global_function.dashboard_aggregates import get_scope_ids_within
+from public_funtion.pivot_fund_ledger import PivotFundPostingError, post_pivot_fund_lines
+from public_funtion.pivot_fund_lookup import get_transfer_fiscal_year
 import base64
 from django.db.models.functions import Cast
 from django.db.models import CharField
@@ -42,7 +67,7 @@ from collections import defaultdict
 from decimal import Decimal
 import time
 from itertools import islice
-from django.db import connection
+from django.db import connection, transaction
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -83,39 +108,13 @@ class CreateBudgetTransferView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        transfer_type = request.data.get("type").upper()
-
-        if transfer_type in ["FAR", "AFR", "FAD"]:
-            prefix = f"{transfer_type}-"
-        else:
-
-            prefix = "FAR-"
-            
-
-        last_transfer = (
-                xx_BudgetTransfer.objects
-                .filter(code__startswith=prefix)
-                .order_by("-code")
-                .first()
-            )
-
-        if last_transfer and last_transfer.code:
-            try:
-                last_num = int(last_transfer.code.replace(prefix, ""))
-                new_num = last_num + 1
-            except (ValueError, AttributeError):
-
-                new_num = 1
-        else:
-
-            new_num = 1
-
-        new_code = f"{prefix}{new_num:04d}"
-
         serializer = BudgetTransferSerializer(data=request.data)
 
         if serializer.is_valid():
 
+            # Taken from the per-prefix sequence, unique under concurrent creates
+            new_code = next_transfer_code(request.data.get("type"))
+
             transfer = serializer.save(
                 requested_by=request.user.username,
                 user_id=request.user.id,
@@ -139,17 +138,68 @@ class CreateBudgetTransferView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class ListBudgetTransferView(APIView):
-    """List budget transfers with pagination"""
+    """
+    List budget transfers with pagination
+
+    Filters (body): date, start_date, end_date, status, status_level, type,
+    fy, requested_by, user_id and search / code (code prefix), see
+    transfer_filters.
+
+    Pages are read with LIMIT in the database, newest transaction first
+    (order=asc for oldest first):
+    - cursor: keyset pages after that transaction_id (see 'next'); their cost
+      does not depend on how deep the page is
+    - page: offset pages (without cursor)
+    count_mode is exact (default), approximate (counted up to
+    approximate_count_limit rows, 'count_is_exact' tells) or none. The notes
+    are read for the rows of the page only, include_notes=false omits them.
+    """
 
     permission_classes = [IsAuthenticated]
     pagination_class = TransferPagination
+    approximate_count_limit = 1000
+    # Columns of the list; notes (NCLOB in Oracle) is read separately for the page
+    list_fields = (
+        'transaction_id', 'transaction_date', 'amount', 'status',
+        'requested_by', 'user_id', 'request_date', 'code',
+        'gl_posting_status', 'approvel_1', 'approvel_2', 'approvel_3', 'approvel_4',
+        'approvel_1_date', 'approvel_2_date', 'approvel_3_date', 'approvel_4_date',
+        'status_level', 'attachment', 'fy', 'group_id', 'interface_id',
+        'reject_group_id', 'reject_interface_id', 'approve_group_id', 'approve_interface_id',
+        'report', 'type',
+    )
 
     def post(self, request):
-        code = request.data.get("code", None)
-        date = request.data.get("date", None)
-        start_date = request.data.get("start_date", None)
-        end_date = request.data.get("end_date", None)
-        search = request.data.get("search")
+        try:
+            filters = parse_transfer_filters(request.data)
+        except TransferFilterError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        def param(name, default=None):
+            # Paging parameters come in the query string, or in the body
+            value = request.query_params.get(name)
+            return request.data.get(name, default) if value is None else value
+
+        try:
+            page_size = int(param('page_size', TransferPagination.page_size))
+            page = int(param('page', 1))
+            cursor = param('cursor')
+            cursor = int(cursor) if cursor not in (None, '') else None
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "page, page_size and cursor must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        page_size = max(1, min(page_size, TransferPagination.max_page_size))
+        page = max(1, page)
+        count_mode = str(param('count_mode', 'exact')).lower()
+        if count_mode not in ('exact', 'approximate', 'none'):
+            return Response(
+                {"error": "count_mode must be exact, approximate or none"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        include_notes = str(param('include_notes', 'true')).lower() != 'false'
+        ascending = str(param('order', 'desc')).lower() == 'asc'
 
         # Simplify the query to avoid Oracle NCLOB issues
         if request.user.role == "admin":
@@ -157,61 +207,120 @@ class ListBudgetTransferView(APIView):
         else:
             transfers = xx_BudgetTransfer.objects.filter(user_id=request.user.id)
 
-       
-        print(transfers.count())
-        # Skip complex entity filtering for now to avoid NCLOB issues
-        # TODO: Implement entity filtering without complex annotations
-        
         if request.user.abilities.count() > 0:
             transfers = filter_budget_transfers_all_in_entities(transfers, request.user, 'edit')
-        
-        print(transfers.count())
 
-        if code:
-            transfers = transfers.filter(code__icontains=code)
-        print(transfers.count())
+        transfers = apply_transfer_filters(transfers, filters)
+
         # Use only safe fields for ordering to avoid Oracle NCLOB issues
-        transfers = transfers.order_by("-transaction_id")
-        
-        # Convert to list to avoid lazy evaluation issues with Oracle
-        # Exclude TextField columns that become NCLOB in Oracle
-        transfer_list = list(transfers.values(
-            'transaction_id', 'transaction_date', 'amount', 'status', 
-            'requested_by', 'user_id', 'request_date', 'code', 
-            'gl_posting_status', 'approvel_1', 'approvel_2', 'approvel_3', 'approvel_4',
-            'approvel_1_date', 'approvel_2_date', 'approvel_3_date', 'approvel_4_date',
-            'status_level', 'attachment', 'fy', 'group_id', 'interface_id',
-            'reject_group_id', 'reject_interface_id', 'approve_group_id', 'approve_interface_id',
-            'report', 'type', 'notes'
-            # Excluding 'notes' field as it's TextField/NCLOB in Oracle
-        ))
-        
-        # Manual pagination to avoid Oracle issues
-        page = int(request.GET.get('page', 1))
-        page_size = int(request.GET.get('page_size', 10))
-        start_idx = (page - 1) * page_size
-        end_idx = start_idx + page_size
-        
-        paginated_data = transfer_list[start_idx:end_idx]
-        
-        return Response({
-            'results': paginated_data,
-            'count': len(transfer_list),
-            'next': f"?page={page + 1}&page_size={page_size}" if end_idx < len(transfer_list) else None,
-            'previous': f"?page={page - 1}&page_size={page_size}" if page > 1 else None
-        })
+        ordered = transfers.order_by(
+            "transaction_id" if ascending else "-transaction_id"
+        ).values(*self.list_fields)
+
+        # One row more than the page tells whether there is a next page
+        if cursor is not None:
+            after = {"transaction_id__gt" if ascending else "transaction_id__lt": cursor}
+            rows = list(ordered.filter(**after)[:page_size + 1])
+        else:
+            start_idx = (page - 1) * page_size
+            rows = list(ordered[start_idx:start_idx + page_size + 1])
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if include_notes and rows:
+            notes = dict(
+                xx_BudgetTransfer.objects.filter(
+                    transaction_id__in=[row['transaction_id'] for row in rows]
+                ).values_list('transaction_id', 'notes')
+            )
+            for row in rows:
+                row['notes'] = notes.get(row['transaction_id'])
+
+        def page_link(**values):
+            params = request.query_params.copy()
+            for name in ('page', 'cursor'):
+                params.pop(name, None)
+            params['page_size'] = page_size
+            for name, value in values.items():
+                params[name] = value
+            return f"?{params.urlencode()}"
+
+        data = {'results': rows}
+        if count_mode == 'exact':
+            data['count'] = transfers.count()
+        elif count_mode == 'approximate':
+            # COUNT over at most limit + 1 rows instead of the whole table
+            counted = transfers.order_by().values('transaction_id')[:self.approximate_count_limit + 1].count()
+            data['count'] = min(counted, self.approximate_count_limit)
+            data['count_is_exact'] = counted <= self.approximate_count_limit
+        # Keyset links unless an exact-count client pages by number
+        if cursor is not None or count_mode != 'exact':
+            data['next'] = page_link(cursor=rows[-1]['transaction_id']) if has_next else None
+        else:
+            data['next'] = page_link(page=page + 1) if has_next else None
+        data['previous'] = page_link(page=page - 1) if cursor is None and page > 1 else None
+        return Response(data)
+
+class TransferSearchView(APIView):
+    """
+    Search transfers by the words of their notes and of their lines' reason,
+    account name and cost center name (full-text side index, see
+    transfer_search), best matches first
+
+    q: words to look for (the last one may be a prefix), limit: at most 100
+    results (default 20). Only transfers the user may list are returned.
+    """
+
+    permission_classes = [IsAuthenticated]
+    max_limit = 100
+    # Ranked candidates checked against the user's permissions
+    candidates = 500
+
+    def get(self, request):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get("limit", 20))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.max_limit))
+
+        matches = search_transfers(query, limit=self.candidates)
+        ranked = {match["transaction_id"]: match for match in matches}
+
+        if request.user.role == "admin":
+            transfers = xx_BudgetTransfer.objects.all()
+        else:
+            transfers = xx_BudgetTransfer.objects.filter(user_id=request.user.id)
+        if request.user.abilities.count() > 0:
+            transfers = filter_budget_transfers_all_in_entities(transfers, request.user, 'edit')
+
+        rows = list(
+            transfers.filter(transaction_id__in=list(ranked)).values(
+                "transaction_id", "code", "status", "status_level", "amount",
+                "requested_by", "request_date", "transaction_date",
+            )
+        ) if ranked else []
+        rows.sort(key=lambda row: ranked[row["transaction_id"]]["rank"])
+        for row in rows[:limit]:
+            row["snippet"] = ranked[row["transaction_id"]]["snippet"]
+
+        return Response({"query": query, "count": min(len(rows), limit), "results": rows[:limit]})
 
 class ListBudgetTransfer_approvels_View(APIView):
-    """List budget transfers with pagination"""
+    """
+    List the transfers waiting at the user's approval level, with pagination
+
+    Read from the approvers' work queue (xx_ApprovalQueueItem, see
+    approval_queue): one range scan of its index per page, no transfer rows.
+    """
 
     permission_classes = [IsAuthenticated]
     pagination_class = TransferPagination
 
     def get(self, request):
         code = request.query_params.get("code", None)
-        date = request.data.get("date", None)
-        start_date = request.data.get("start_date", None)
-        end_date = request.data.get("end_date", None)
         if code is None:
             code = "FAR"
         status_level_val = (
@@ -219,39 +328,20 @@ class ListBudgetTransfer_approvels_View(APIView):
             if request.user.user_level.level_order
             else 0
         )
-        transfers = xx_BudgetTransfer.objects.filter(
-            status_level=status_level_val, code__startswith=code,status= "pending"
-        )
-        
-        if request.user.abilities.count() > 0:
-            transfers = filter_budget_transfers_all_in_entities(transfers, request.user, 'approve')
-        
-        if code:
-            transfers = transfers.filter(code__icontains=code)
-
+        items = xx_ApprovalQueueItem.objects.filter(status_level=status_level_val)
+        if code in TRANSFER_CODE_PREFIXES:
+            items = items.filter(code_prefix=code)
+        else:
+            items = items.filter(code__startswith=code)
 
+        if request.user.abilities.count() > 0:
+            items = filter_transactions_all_in_entities(items, request.user, 'approve')
 
-        transfers = transfers.order_by("-request_date")
+        items = items.order_by("-request_date", "-transaction_id")
         paginator = self.pagination_class()
-        paginated_transfers = paginator.paginate_queryset(transfers, request)
-        serializer = BudgetTransferSerializer(paginated_transfers, many=True)
-
-        # Create a list of dictionaries with just the fields we want
-        filtered_data = []
-        for item in serializer.data:
-            filtered_item = {
-                "transaction_id": item.get("transaction_id"),
-                "amount": item.get("amount"),
-                "status": item.get("status"),
-                "status_level": item.get("status_level"),
-                "requested_by": item.get("requested_by"),
-                "request_date": item.get("request_date"),
-                "code": item.get("code"),
-                "transaction_date": item.get("transaction_date"),
-            }
-            filtered_data.append(filtered_item)
-
-        return paginator.get_paginated_response(filtered_data)
+        paginated_items = paginator.paginate_queryset(items, request)
+        serializer = ApprovalQueueItemSerializer(paginated_items, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 class ApproveBudgetTransferView(APIView):
     """Approve or reject budget transfer requests (admin only)"""
@@ -506,88 +596,74 @@ class Adjdtranscationtransferapprovel_reject(APIView):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
             try:
-                # Get the transfer record - use get() for single record
-                trasncation = xx_BudgetTransfer.objects.get(
-                    transaction_id=transaction_id
-                )
-                # Get the transfer type code
-                code = trasncation.code.split("-")[0]
-                # Handle approval flow based on transfer type
-                if code == "FAR" or code == "AFR":
-                    max_level = 4
-                else:
-                    max_level = 3
-                # Update approval based on decision
-                if decide == 2 and trasncation.status_level <= max_level:  # Approve
-                    level = trasncation.status_level
-                    # Set the appropriate approval fields
-                    if level == 2:
-                        trasncation.approvel_2 = request.user.username
-                        trasncation.approvel_2_date = timezone.now()
-                    elif level == 3:
-                        trasncation.approvel_3 = request.user.username
-                        trasncation.approvel_3_date = timezone.now()
-                    elif level == 4:
-                        trasncation.approvel_4 = request.user.username
-                        trasncation.approvel_4_date = timezone.now()
-                    if trasncation.status_level == max_level:
-                        trasncation.status = "approved"
-                    trasncation.status_level += 1
-                elif decide == 3:  # Reject
-                    # Record who rejected it at the current level
-                    level = trasncation.status_level
-                    if level == 2:
-                        trasncation.approvel_2 = request.user.username
-                        trasncation.approvel_2_date = timezone.now()
-                    elif level == 3:
-                        trasncation.approvel_3 = request.user.username
-                        trasncation.approvel_3_date = timezone.now()
-                    elif level == 4:
-                        trasncation.approvel_4 = request.user.username
-                        trasncation.approvel_4_date = timezone.now()
-                    trasncation.status_level = -1
-                    Reson_object = xx_BudgetTransferRejectReason.objects.create(
-                        Transcation_id=trasncation,
-                        reason_text=reson,
-                        reject_by=request.user.username,
-                    )
-                    Reson_object.save()
-                    trasncation.status = "rejected"
-                # Save changes to the transfer
-                trasncation.save()
-                # Update pivot fund if final approval or rejection
-                pivot_updates = []
-                if (
-                    max_level == trasncation.status_level and decide == 2
-                ) or decide == 3:
-                    trasfers = xx_TransactionTransfer.objects.filter(
+                # The decision and the pivot fund posting are committed together;
+                # locking the transfer row stops two approvers deciding it at once
+                with transaction.atomic():
+                    # Get the transfer record - use get() for single record
+                    trasncation = xx_BudgetTransfer.objects.select_for_update().get(
                         transaction_id=transaction_id
                     )
-                    for transfer in trasfers:
-                        try:
-                            # Extract the necessary data
-                            item_cost_center = transfer.cost_center_code
-                            item_account_code = transfer.account_code
-                            from_center = transfer.from_center or 0
-                            to_center = transfer.to_center or 0
-                            # Update the pivot fund
-                            update_result = update_pivot_fund(
-                                item_cost_center,
-                                item_account_code,
-                                from_center,
-                                to_center,
-                                decide,
-                            )
-                            if update_result:
-                                pivot_updates.append(update_result)
-                        except Exception as e:
-                            return Response(
-                                {
-                                    "error": "Error updating pivot fund",
-                                    "message": str(e),
-                                },
-                                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                            )
+                    # Get the transfer type code
+                    code = trasncation.code.split("-")[0]
+                    # Handle approval flow based on transfer type
+                    if code == "FAR" or code == "AFR":
+                        max_level = 4
+                    else:
+                        max_level = 3
+                    # Update approval based on decision
+                    if decide == 2 and trasncation.status_level <= max_level:  # Approve
+                        level = trasncation.status_level
+                        # Set the appropriate approval fields
+                        if level == 2:
+                            trasncation.approvel_2 = request.user.username
+                            trasncation.approvel_2_date = timezone.now()
+                        elif level == 3:
+                            trasncation.approvel_3 = request.user.username
+                            trasncation.approvel_3_date = timezone.now()
+                        elif level == 4:
+                            trasncation.approvel_4 = request.user.username
+                            trasncation.approvel_4_date = timezone.now()
+                        if trasncation.status_level == max_level:
+                            trasncation.status = "approved"
+                        trasncation.status_level += 1
+                    elif decide == 3:  # Reject
+                        # Record who rejected it at the current level
+                        level = trasncation.status_level
+                        if level == 2:
+                            trasncation.approvel_2 = request.user.username
+                            trasncation.approvel_2_date = timezone.now()
+                        elif level == 3:
+                            trasncation.approvel_3 = request.user.username
+                            trasncation.approvel_3_date = timezone.now()
+                        elif level == 4:
+                            trasncation.approvel_4 = request.user.username
+                            trasncation.approvel_4_date = timezone.now()
+                        trasncation.status_level = -1
+                        Reson_object = xx_BudgetTransferRejectReason.objects.create(
+                            Transcation_id=trasncation,
+                            reason_text=reson,
+                            reject_by=request.user.username,
+                        )
+                        Reson_object.save()
+                        trasncation.status = "rejected"
+                    # Save changes to the transfer
+                    trasncation.save()
+                    # Update pivot fund if final approval or rejection
+                    pivot_updates = []
+                    if (
+                        max_level == trasncation.status_level and decide == 2
+                    ) or decide == 3:
+                        trasfers = xx_TransactionTransfer.objects.filter(
+                            transaction_id=transaction_id
+                        )
+                        # All the lines in one locked, set-based posting
+                        ledger_result = post_pivot_fund_lines(
+                            trasfers, decide, fiscal_year=get_transfer_fiscal_year(trasncation)
+                        )
+                        if ledger_result["status"] == "failed":
+                            # Roll the decision back with the (empty) posting
+                            raise PivotFundPostingError(ledger_result)
+                        pivot_updates = ledger_result["updates"]
                         # Add the result for this transaction
                         results.append(
                             {
@@ -597,6 +673,16 @@ class Adjdtranscationtransferapprovel_reject(APIView):
                                 "pivot_updates": pivot_updates,
                             }
                         )
+            except PivotFundPostingError as e:
+                results.append(
+                    {
+                        "transaction_id": transaction_id,
+                        "status": "error",
+                        "message": "Error updating pivot fund",
+                        "missing_pivot_funds": e.result["missing_pivot_funds"],
+                        "ambiguous_pivot_funds": e.result["ambiguous_pivot_funds"],
+                    }
+                )
             except xx_BudgetTransfer.DoesNotExist:
                 results.append(
                     {
@@ -843,10 +929,82 @@ class list_budget_transfer_reject_reason(APIView):
                 {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+def parse_smart_filters(query_params):
+    """
+    Smart dashboard filters from the query string
+
+    Returns:
+        dict: cost_center_code, account_code, fiscal_year (ints or None) and
+            status (default 'approved'), or None if a code is not an integer
+    """
+    filters = {
+        "cost_center_code": query_params.get('cost_center_code'),
+        "account_code": query_params.get('account_code'),
+        "fiscal_year": query_params.get('fiscal_year'),
+        "status": query_params.get('status') or 'approved',
+    }
+    try:
+        for field in ('cost_center_code', 'account_code', 'fiscal_year'):
+            if filters[field] not in (None, ''):
+                filters[field] = int(filters[field])
+            else:
+                filters[field] = None
+    except ValueError:
+        return None
+    return filters
+
+
+def get_dashboard_scope_ids(user):
+    """Dashboard scopes the user may see, or None when they are not limited to entities"""
+    if user.abilities.count() > 0:
+        return get_scope_ids_within(get_user_entity_codes(user))
+    return None
+
+
 class DashboardBudgetTransferView(APIView):
-    """Optimized dashboard view for encrypted budget transfers"""
+    """
+    Optimized dashboard view for encrypted budget transfers
+
+    Responses carry an ETag built from the stored section versions; a poll
+    with a matching If-None-Match is answered with 304 after one version lookup.
+
+    type=smart accepts cost_center_code, account_code, fiscal_year and status
+    (default approved) filters, answered from the dashboard cube.
+    """
     permission_classes = [IsAuthenticated]
 
+    @staticmethod
+    def _not_modified(request, etag):
+        """True if the client's If-None-Match already matches the current ETag"""
+        if not etag:
+            return False
+        if_none_match = request.headers.get('If-None-Match')
+        if not if_none_match:
+            return False
+        client_etags = parse_etags(if_none_match)
+        # Weak comparison, as used for GET
+        return '*' in client_etags or any(
+            client_etag.removeprefix('W/') == etag for client_etag in client_etags
+        )
+
+    @staticmethod
+    def _cache_response(response, etag):
+        """Let browsers keep the response but revalidate it on every poll"""
+        if etag:
+            response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    @staticmethod
+    def _json_response(data):
+        """Stream a (possibly lazy) dashboard payload without building it in memory"""
+        return StreamingHttpResponse(iter_json(data), content_type='application/json')
+
+    @staticmethod
+    def _raw_json_response(payload):
+        """Send stored dashboard JSON text as is, without parsing and re-encoding it"""
+        return HttpResponse(payload, content_type='application/json')
+
     def get(self, request):
         try:
             # Get dashboard type from query params (default to 'smart')
@@ -859,19 +1017,63 @@ class DashboardBudgetTransferView(APIView):
                 # Only refresh when explicitly requested
                 data = refresh_dashboard_data(dashboard_type)
                 if data:
-                    return Response(data, status=status.HTTP_200_OK)
+                    return self._json_response(data)
                 else:
                     return Response(
                         {"error": "Failed to refresh dashboard data"}, 
                         status=status.HTTP_500_INTERNAL_SERVER_ERROR
                     )
+
+            # Smart dashboard filters / drill-downs are answered live from the cube
+            filters = parse_smart_filters(request.query_params)
+            if filters is None:
+                return Response(
+                    {"error": "cost_center_code, account_code and fiscal_year must be integers"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            is_filtered = dashboard_type == 'smart' and is_filtered_smart(filters)
+
+            versions = get_dashboard_versions()
+            if request.user.abilities.count() > 0:
+                # Users limited to entities get the merge of the scope slices inside them
+                entity_codes = get_user_entity_codes(request.user)
+                etag = None if is_filtered else dashboard_etag(dashboard_type, versions, entity_codes)
+                if self._not_modified(request, etag):
+                    return self._cache_response(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+                data = dashboard_for_entities(
+                    entity_codes, dashboard_type, filters if is_filtered else None
+                )
+                if data is None:
+                    return Response(
+                        {"error": f"Invalid dashboard type: {dashboard_type}"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                return self._cache_response(self._json_response(data), etag)
+            elif is_filtered:
+                data = dashboard_smart(
+                    filters["cost_center_code"],
+                    filters["account_code"],
+                    filters["fiscal_year"],
+                    filters["status"],
+                )
+                if data:
+                    return self._cache_response(self._json_response(data), None)
+                return Response(
+                    {"error": "Failed to compute dashboard data"},
+                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                )
             else:
+                etag = dashboard_etag(dashboard_type, versions)
+                if self._not_modified(request, etag):
+                    return self._cache_response(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
                 # Always try to get existing cached data first
                 if dashboard_type == 'all':
                     # Get all dashboard data (both smart and normal)
-                    data = get_all_dashboard_data()
-                    if data:
-                        return Response(data, status=status.HTTP_200_OK)
+                    payload = get_all_dashboard_payload()
+                    if payload:
+                        return self._cache_response(self._raw_json_response(payload), etag)
                     else:
                         # Return empty structure if no data exists yet
                         return Response(
@@ -883,9 +1085,9 @@ class DashboardBudgetTransferView(APIView):
                         )
                 else:
                     # Get specific dashboard type (smart or normal)
-                    data = get_saved_dashboard_data(dashboard_type)
-                    if data:
-                        return Response(data, status=status.HTTP_200_OK)
+                    payload = get_saved_dashboard_payload(dashboard_type)
+                    if payload:
+                        return self._cache_response(self._raw_json_response(payload), etag)
                     else:
                         # Return message if no cached data exists
                         return Response(
@@ -905,4 +1107,115 @@ class DashboardBudgetTransferView(APIView):
             )
 
 
+class DashboardTopView(APIView):
+    """
+    Top-N cost centers, accounts or combinations by transferred amount
+
+    Query params: group_by (cost_center, account or combination; default
+    cost_center), sort (total_from_center or total_to_center; default
+    total_from_center), limit (default 10, at most 100) and the smart
+    dashboard filters (cost_center_code, account_code, fiscal_year, status).
+    Users limited to entities only see the transfers inside them.
+    """
+    permission_classes = [IsAuthenticated]
+    max_limit = 100
+
+    def get(self, request):
+        group_by = request.query_params.get('group_by', 'cost_center')
+        sort = request.query_params.get('sort', 'total_from_center')
+        if group_by not in SMART_GROUPINGS:
+            return Response(
+                {"error": f"group_by must be one of {', '.join(SMART_GROUPINGS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if sort not in ('total_from_center', 'total_to_center'):
+            return Response(
+                {"error": "sort must be total_from_center or total_to_center"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.max_limit))
+
+        filters = parse_smart_filters(request.query_params)
+        if filters is None:
+            return Response(
+                {"error": "cost_center_code, account_code and fiscal_year must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            data = dashboard_top(group_by, sort, limit, get_dashboard_scope_ids(request.user), filters)
+            return Response(data, status=status.HTTP_200_OK)
+        except Exception as e:
+            return Response(
+                {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class DashboardCombinationsView(APIView):
+    """
+    Paginated smart dashboard drill-down
+
+    Query params: group_by (cost_center, account or combination; default
+    combination), sort (total_from_center, total_to_center or empty for code
+    order), order (desc or asc; default desc), page, page_size (default 50,
+    at most 500) and the smart dashboard filters.
+    """
+    permission_classes = [IsAuthenticated]
+    max_page_size = 500
+
+    def get(self, request):
+        group_by = request.query_params.get('group_by', 'combination')
+        sort = request.query_params.get('sort') or None
+        order = request.query_params.get('order', 'desc').lower()
+        if group_by not in SMART_GROUPINGS:
+            return Response(
+                {"error": f"group_by must be one of {', '.join(SMART_GROUPINGS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if sort not in (None, 'total_from_center', 'total_to_center'):
+            return Response(
+                {"error": "sort must be total_from_center or total_to_center"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if order not in ('asc', 'desc'):
+            return Response({"error": "order must be asc or desc"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            page_size = int(request.query_params.get('page_size', 50))
+        except ValueError:
+            return Response(
+                {"error": "page and page_size must be integers"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        page_size = max(1, min(page_size, self.max_page_size))
+
+        filters = parse_smart_filters(request.query_params)
+        if filters is None:
+            return Response(
+                {"error": "cost_center_code, account_code and fiscal_year must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            data = dashboard_combinations(
+                group_by, sort, order == 'desc', page, page_size,
+                get_dashboard_scope_ids(request.user), filters
+            )
+        except Exception as e:
+            return Response(
+                {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        def page_link(number):
+            # Keep the grouping, sort and filters in the links
+            params = request.query_params.copy()
+            params['page'] = number
+            params['page_size'] = page_size
+            return f"?{params.urlencode()}"
 
+        data['next'] = page_link(page + 1) if page * page_size < data['count'] else None
+        data['previous'] = page_link(page - 1) if page > 1 else None
+        return Response(data, status=status.HTTP_200_OK)
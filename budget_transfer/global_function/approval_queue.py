@@ -0,0 +1,86 @@
+"""
+Approvers' work queue.
+
+The approval list shows the pending transfers waiting at the user's level,
+for a code prefix, newest first. xx_ApprovalQueueItem holds exactly those
+transfers with the fields the list returns, indexed on (status_level,
+code_prefix, request_date, transaction_id), so an inbox page is one range
+scan of that index instead of a filter over every transfer.
+
+The budget_management signals keep a transfer's row in step on every save
+(queued while pending, removed on approval, rejection or delete), in the
+same database transaction; `manage.py rebuild_approval_queue` rebuilds the
+table from the transfers.
+"""
+from django.db import IntegrityError, transaction
+
+BATCH_SIZE = 1000
+QUEUE_FIELDS = (
+    'status_level', 'code', 'request_date', 'amount', 'requested_by', 'user_id', 'transaction_date',
+)
+
+
+def code_prefix(code):
+    """FAR of FAR-0042"""
+    return str(code or '').split('-', 1)[0].strip().upper()[:10]
+
+
+def _queue_values(values):
+    """Queue row fields of a transfer given as a dict of its fields"""
+    row = {field: values.get(field) for field in QUEUE_FIELDS}
+    row['status_level'] = row['status_level'] or 0
+    row['amount'] = row['amount'] or 0
+    row['transaction_date'] = row['transaction_date'] or ''
+    row['code_prefix'] = code_prefix(row['code'])
+    return row
+
+
+def sync_approval_queue_item(transfer):
+    """Queue a pending xx_BudgetTransfer with its current fields, unqueue any other"""
+    from budget_management.models import xx_ApprovalQueueItem
+
+    if transfer.status != 'pending':
+        remove_approval_queue_item(transfer.transaction_id)
+        return
+    row = _queue_values({field: getattr(transfer, field) for field in QUEUE_FIELDS})
+    items = xx_ApprovalQueueItem.objects.filter(transaction_id=transfer.transaction_id)
+    if items.update(**row):
+        return
+    try:
+        with transaction.atomic():
+            xx_ApprovalQueueItem.objects.create(transaction_id=transfer.transaction_id, **row)
+    except IntegrityError:
+        # Queued by a concurrent save meanwhile
+        items.update(**row)
+
+
+def remove_approval_queue_item(transaction_id):
+    from budget_management.models import xx_ApprovalQueueItem
+
+    xx_ApprovalQueueItem.objects.filter(transaction_id=transaction_id).delete()
+
+
+def rebuild_approval_queue(transfer_model, queue_model):
+    """
+    Rebuild the queue from the pending transfers
+
+    Takes the model classes so migrations can pass their historical models.
+
+    Returns:
+        int: Transfers queued
+    """
+    transfers = transfer_model.objects.filter(status='pending').values('transaction_id', *QUEUE_FIELDS)
+    with transaction.atomic():
+        queue_model.objects.all().delete()
+        count = 0
+        batch = []
+        for values in transfers.iterator(chunk_size=BATCH_SIZE):
+            batch.append(queue_model(transaction_id=values['transaction_id'], **_queue_values(values)))
+            if len(batch) == BATCH_SIZE:
+                queue_model.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            queue_model.objects.bulk_create(batch)
+            count += len(batch)
+    return count
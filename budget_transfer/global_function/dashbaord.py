@@ -6,17 +6,30 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
 from django.utils import timezone
-from django.db.models import Q, Sum, Count, Case, When, Value, F
+from django.db.models import Q, Sum, Case, When, Value, F
 from django.db.models.functions import Cast, Substr, Upper
 from django.db.models import CharField, DecimalField
 from user_management.models import xx_notification
 from budget_management.models import (
-    xx_BudgetTransfer,
     xx_BudgetTransferAttachment,
     xx_BudgetTransferRejectReason,
-    xx_DashboardBudgetTransfer,
+    xx_DashboardSection,
+    xx_DashboardAccountTotal,
+    xx_DashboardScopeCounter,
+    xx_DashboardSeriesBucket,
 )
-from adjd_transaction.models import xx_TransactionTransfer
+from django.db import IntegrityError, transaction
+import json
+from budget_transfer.global_function.json_stream import dumps_streamed
+from budget_transfer.global_function.dashboard_aggregates import (
+    SERIES_GRANULARITIES,
+    get_dashboard_counters,
+    get_scope_ids_within,
+)
+from django.conf import settings
+from django.utils.http import quote_etag
+from datetime import timedelta
+import hashlib
 import time
 import multiprocessing
 from collections import defaultdict
@@ -25,129 +38,58 @@ from decimal import Decimal
 
 
 
-def dashboard_smart(filter_cost_center=None, filter_account_code=None):
+def dashboard_smart(filter_cost_center=None, filter_account_code=None,
+                    filter_fiscal_year=None, filter_status='approved'):
     """
-    Optimized smart dashboard using database-level aggregations
+    Optimized smart dashboard answered from the incrementally maintained
+    (cost center, account, fiscal year, status) cube, filtered or not
     
     Args:
         filter_cost_center (int, optional): Filter by specific cost center code
         filter_account_code (int, optional): Filter by specific account code
+        filter_fiscal_year (int, optional): Filter by fiscal year of the transfers
+        filter_status (str, optional): Transfer status to total (default 'approved')
     
     Returns:
         dict: Dashboard data with optional filters applied
     """
     try:
         start_time = time.time()
+        filters = {
+            "cost_center_code": filter_cost_center,
+            "account_code": filter_account_code,
+            "fiscal_year": filter_fiscal_year,
+            "status": filter_status,
+        }
+        is_filtered = is_filtered_smart(filters)
 
         print("Starting optimized smart dashboard calculation...")
-        if filter_cost_center or filter_account_code:
-            print(f"Filters applied: cost_center={filter_cost_center}, account_code={filter_account_code}")
+        if is_filtered:
+            print(f"Filters applied: {filters}")
 
-        # PHASE 1: Database-level aggregations for approved transfers
+        # PHASE 1: Indexed lookups on the cube (one GROUP BY per grouping)
         aggregation_start = time.time()
-        
-        # Build base queryset with optimized filtering
-        base_queryset = xx_TransactionTransfer.objects.select_related('transaction').filter(
-            transaction__status="approved"
-        )
-        
-        # Apply additional filters if provided
-        if filter_cost_center:
-            base_queryset = base_queryset.filter(cost_center_code=filter_cost_center)
-        if filter_account_code:
-            base_queryset = base_queryset.filter(account_code=filter_account_code)
-
-        # Aggregate by cost center code (single database query)
-        cost_center_totals = list(base_queryset.values('cost_center_code').annotate(
-            total_from_center=Sum('from_center'),
-            total_to_center=Sum('to_center')
-        ).order_by('cost_center_code'))
-
-        # Aggregate by account code (single database query)
-        account_code_totals = list(base_queryset.values('account_code').annotate(
-            total_from_center=Sum('from_center'),
-            total_to_center=Sum('to_center')
-        ).order_by('account_code'))
-
-        # Aggregate by combination of cost center and account code (single database query)
-        all_combinations = list(base_queryset.values('cost_center_code', 'account_code').annotate(
-            total_from_center=Sum('from_center'),
-            total_to_center=Sum('to_center')
-        ).order_by('cost_center_code', 'account_code'))
-
-        # Get filtered individual records if filters are applied
-        if filter_cost_center or filter_account_code:
-            filtered_combinations = list(base_queryset.values(
-                'cost_center_code', 'account_code', 'from_center', 'to_center'
-            ))
-        else:
-            # If no filters, use aggregated data to avoid large result sets
-            filtered_combinations = all_combinations
-
-        print(f"Database aggregations completed in {time.time() - aggregation_start:.2f}s")
-
-        # PHASE 2: Format response data
-        format_start = time.time()
-        
-        # Convert Decimal to float for JSON serialization
-        for item in cost_center_totals:
-            item['total_from_center'] = float(item['total_from_center'] or 0)
-            item['total_to_center'] = float(item['total_to_center'] or 0)
-
-        for item in account_code_totals:
-            item['total_from_center'] = float(item['total_from_center'] or 0)
-            item['total_to_center'] = float(item['total_to_center'] or 0)
-
-        for item in all_combinations:
-            item['total_from_center'] = float(item['total_from_center'] or 0)
-            item['total_to_center'] = float(item['total_to_center'] or 0)
-
-        # Convert filtered combinations
-        for item in filtered_combinations:
-            if 'from_center' in item:  # Individual records
-                item['from_center'] = float(item['from_center'] or 0)
-                item['to_center'] = float(item['to_center'] or 0)
-
-        print(f"Data formatting completed in {time.time() - format_start:.2f}s")
-
-        # Prepare final response
-        data = {
-            "filtered_combinations": filtered_combinations,
-            "cost_center_totals": cost_center_totals,
-            "account_code_totals": account_code_totals,
-            "all_combinations": all_combinations,
-            "applied_filters": {
-                "cost_center_code": filter_cost_center,
-                "account_code": filter_account_code,
-            },
-            "performance_metrics": {
-                "total_processing_time": round(time.time() - start_time, 2),
-                "aggregation_time": round(time.time() - aggregation_start, 2),
-                "cost_center_groups": len(cost_center_totals),
-                "account_code_groups": len(account_code_totals),
-                "total_combinations": len(all_combinations)
-            }
-        }
+        data = build_smart_payload(cube_queryset(filters=filters), filters)
+        data["performance_metrics"].update({
+            "total_processing_time": round(time.time() - start_time, 2),
+            "aggregation_time": round(time.time() - aggregation_start, 2),
+        })
 
         print(f"Total optimized processing time: {time.time() - start_time:.2f}s")
-        print(f"Found {len(cost_center_totals)} cost centers, {len(account_code_totals)} account codes")
+        print(f"Found {data['performance_metrics']['cost_center_groups']} cost centers, "
+              f"{data['performance_metrics']['account_code_groups']} account codes")
+
+        # Filtered results are answered directly and never replace the stored section
+        if is_filtered:
+            return data
 
         # Save dashboard data
         save_start = time.time()
         try:
-            dashboard, created = xx_DashboardBudgetTransfer.objects.get_or_create(
-                Dashboard_id=1,
-                defaults={'data': '{}'}
-            )
-            
-            existing_data = dashboard.get_data() or {}
-            existing_data['smart'] = data
-            
-            dashboard.set_data(existing_data)
-            dashboard.save()
+            version = save_dashboard_section('smart', data)
             
             print(f"Dashboard data saved in {time.time() - save_start:.2f}s")
-            print(f"Smart dashboard data {'created' if created else 'updated'} successfully")
+            print(f"Smart dashboard data saved as version {version}")
             return data
             
         except Exception as save_error:
@@ -160,9 +102,197 @@ def dashboard_smart(filter_cost_center=None, filter_account_code=None):
         traceback.print_exc()
         return False
 
+
+def is_filtered_smart(filters):
+    """True if smart dashboard filters differ from the stored (approved, unfiltered) section"""
+    return any(
+        filters.get(field) is not None for field in ('cost_center_code', 'account_code', 'fiscal_year')
+    ) or filters.get('status', 'approved') != 'approved'
+
+
+def cube_queryset(scope_ids=None, filters=None):
+    """
+    Queryset over the cube for the given scopes and filters
+
+    Args:
+        scope_ids (list, optional): Only these scopes (all transfers when None)
+        filters (dict, optional): cost_center_code, account_code, fiscal_year
+            and status (default 'approved')
+
+    Returns:
+        QuerySet: Cube rows making up the requested slice
+    """
+    filters = filters or {}
+    queryset = xx_DashboardAccountTotal.objects.filter(status=filters.get('status') or 'approved')
+    for field in ('cost_center_code', 'account_code', 'fiscal_year'):
+        if filters.get(field) is not None:
+            queryset = queryset.filter(**{field: filters[field]})
+    if scope_ids is not None:
+        queryset = queryset.filter(scope_filter(scope_ids))
+    return queryset
+
+
+class CubeTotals:
+    """
+    Cube rows summed by the given fields, grouped and ordered by the database.
+
+    Iterating runs the query again through a server-side cursor and yields one
+    flat dict per group, so the groups are never held in memory as a list.
+    Slicing (totals[start:stop]) runs a LIMIT/OFFSET query and returns a list.
+    """
+    CHUNK_SIZE = 2000
+    SORT_FIELDS = {
+        'total_from_center': 'sum_from_center',
+        'total_to_center': 'sum_to_center',
+    }
+
+    def __init__(self, queryset, fields, sort=None, descending=True):
+        """
+        Args:
+            queryset (QuerySet): Cube rows, see cube_queryset()
+            fields (list): Fields to group by
+            sort (str, optional): 'total_from_center' or 'total_to_center' to order
+                the groups by that total (by the group fields otherwise)
+            descending (bool): Largest totals first when sorting by a total
+        """
+        self.fields = fields
+        # None first whatever the database does with NULLs
+        ordering = [F(field).asc(nulls_first=True) for field in fields]
+        if sort is not None:
+            total = F(self.SORT_FIELDS[sort])
+            # The group fields keep the order stable between pages of equal totals
+            ordering.insert(0, total.desc() if descending else total.asc())
+        self.queryset = (
+            queryset.values(*fields)
+            .annotate(sum_from_center=Sum('total_from_center'), sum_to_center=Sum('total_to_center'))
+            # Cells emptied by deleted or moved lines
+            .exclude(sum_from_center=0, sum_to_center=0)
+            .order_by(*ordering)
+        )
+
+    def count(self):
+        return self.queryset.count()
+
+    def _format(self, row):
+        item = {field: row[field] for field in self.fields}
+        item['total_from_center'] = float(row['sum_from_center'] or 0)
+        item['total_to_center'] = float(row['sum_to_center'] or 0)
+        return item
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("CubeTotals only supports slicing")
+        return [self._format(row) for row in self.queryset[index]]
+
+    def __iter__(self):
+        for row in self.queryset.iterator(chunk_size=self.CHUNK_SIZE):
+            yield self._format(row)
+
+
+# Groupings offered by the top-N / drill-down endpoints
+SMART_GROUPINGS = {
+    'cost_center': ['cost_center_code'],
+    'account': ['account_code'],
+    'combination': ['cost_center_code', 'account_code'],
+}
+
+
+def dashboard_top(group_by='cost_center', sort='total_from_center', limit=10,
+                  scope_ids=None, filters=None):
+    """
+    Top-N cost centers, accounts or combinations by transferred amount, read
+    from the dashboard cube with one ordered, limited GROUP BY
+
+    Args:
+        group_by (str): 'cost_center', 'account' or 'combination'
+        sort (str): 'total_from_center' or 'total_to_center'
+        limit (int): Number of groups to return
+        scope_ids (list, optional): Only these scopes (all transfers when None)
+        filters (dict, optional): Smart dashboard filters, see cube_queryset()
+
+    Returns:
+        dict: Top groups with the applied grouping, sort and filters
+    """
+    filters = filters or {}
+    totals = CubeTotals(cube_queryset(scope_ids, filters), SMART_GROUPINGS[group_by], sort)
+    return {
+        "group_by": group_by,
+        "sort": sort,
+        "limit": limit,
+        "results": totals[:limit],
+        "applied_filters": smart_filters_payload(filters),
+    }
+
+
+def dashboard_combinations(group_by='combination', sort=None, descending=True, page=1,
+                           page_size=50, scope_ids=None, filters=None):
+    """
+    One page of the smart dashboard groups, so clients can drill down without
+    downloading every combination
+
+    Args:
+        group_by (str): 'cost_center', 'account' or 'combination'
+        sort (str, optional): 'total_from_center' or 'total_to_center'
+            (ordered by cost center / account code when None)
+        descending (bool): Largest totals first when sorting by a total
+        page (int): 1-based page number
+        page_size (int): Groups per page
+        scope_ids (list, optional): Only these scopes (all transfers when None)
+        filters (dict, optional): Smart dashboard filters, see cube_queryset()
+
+    Returns:
+        dict: 'results' for the page and the total group 'count'
+    """
+    filters = filters or {}
+    totals = CubeTotals(cube_queryset(scope_ids, filters), SMART_GROUPINGS[group_by], sort, descending)
+    start = (page - 1) * page_size
+    return {
+        "results": totals[start:start + page_size],
+        "count": totals.count(),
+        "group_by": group_by,
+        "sort": sort,
+        "applied_filters": smart_filters_payload(filters),
+    }
+
+
+def smart_filters_payload(filters):
+    """Smart dashboard filters as echoed back in the responses"""
+    return {
+        "cost_center_code": filters.get('cost_center_code'),
+        "account_code": filters.get('account_code'),
+        "fiscal_year": filters.get('fiscal_year'),
+        "status": filters.get('status') or 'approved',
+    }
+
+
+def build_smart_payload(queryset, filters):
+    """
+    Build the smart dashboard payload from a cube queryset (see cube_queryset).
+    The totals are lazy CubeTotals; encode the payload with json_stream.iter_json.
+
+    The queryset is already filtered, so all_combinations are the combinations
+    of the applied filters; they are emitted once (the former
+    filtered_combinations key repeated the same list).
+    """
+    cost_center_totals = CubeTotals(queryset, ['cost_center_code'])
+    account_code_totals = CubeTotals(queryset, ['account_code'])
+    all_combinations = CubeTotals(queryset, ['cost_center_code', 'account_code'])
+    return {
+        "cost_center_totals": cost_center_totals,
+        "account_code_totals": account_code_totals,
+        "all_combinations": all_combinations,
+        "applied_filters": smart_filters_payload(filters),
+        "performance_metrics": {
+            "cost_center_groups": cost_center_totals.count(),
+            "account_code_groups": account_code_totals.count(),
+            "total_combinations": all_combinations.count(),
+        },
+    }
+
+
 def dashboard_normal():
     """
-    Optimized normal dashboard using database-level aggregations and counting
+    Optimized normal dashboard built from the incrementally maintained counters
     """
     try:
         start_time = time.time()
@@ -171,71 +301,26 @@ def dashboard_normal():
         # PHASE 1: Database-level counting and aggregations
         count_start = time.time()
 
-        # Get all transfers with minimal data loading
-        transfers_queryset = xx_BudgetTransfer.objects.only(
-            'code', 'status', 'status_level', 'request_date'
-        )
-
-        # Use database aggregations for counting
-        total_count = transfers_queryset.count()
-        
-        # Count by status using database aggregation
-        status_counts = transfers_queryset.aggregate(
-            approved=Count('transaction_id', filter=Q(status='approved')),
-            rejected=Count('transaction_id', filter=Q(status='rejected')),
-            pending=Count('transaction_id', filter=Q(status='pending'))
-        )
-
-        # Count by status level using database aggregation
-        level_counts = transfers_queryset.aggregate(
-            level1=Count('transaction_id', filter=Q(status_level=1)),
-            level2=Count('transaction_id', filter=Q(status_level=2)),
-            level3=Count('transaction_id', filter=Q(status_level=3)),
-            level4=Count('transaction_id', filter=Q(status_level=4))
-        )
-
-        # Count by code prefix using database functions
-        code_counts = transfers_queryset.aggregate(
-            far=Count('transaction_id', filter=Q(code__istartswith='FAR')),
-            afr=Count('transaction_id', filter=Q(code__istartswith='AFR')),
-            fad=Count('transaction_id', filter=Q(code__istartswith='FAD'))
-        )
-
-        # Get request dates efficiently (only non-null dates)
-        request_dates = list(
-            transfers_queryset.filter(request_date__isnull=False)
-            .values_list('request_date', flat=True)
-            .order_by('-request_date')[:1000]  # Limit to recent 1000 for performance
-        )
+        # Counts are maintained incrementally by the budget transfer signals
+        counters = get_dashboard_counters()
+        total_count = counters.get('total', 0)
 
-        # Convert datetime objects to ISO format strings for JSON serialization
-        request_dates_iso = [date.isoformat() for date in request_dates]
+        # Request date series come from the incrementally maintained buckets
+        request_series = get_dashboard_series()
 
         print(f"Database counting completed in {time.time() - count_start:.2f}s")
 
         # PHASE 2: Format response data
-        data = {
-            "total_transfers": total_count,
-            "total_transfers_far": code_counts['far'],
-            "total_transfers_afr": code_counts['afr'],
-            "total_transfers_fad": code_counts['fad'],
-            "approved_transfers": status_counts['approved'],
-            "rejected_transfers": status_counts['rejected'],
-            "pending_transfers": status_counts['pending'],
-            "pending_transfers_by_level": {
-                "Level1": level_counts['level1'],
-                "Level2": level_counts['level2'],
-                "Level3": level_counts['level3'],
-                "Level4": level_counts['level4'],
-            },
-            "request_dates": request_dates_iso,
+        data = format_normal_counters(counters)
+        data.update({
+            "request_series": request_series,
             "performance_metrics": {
                 "total_processing_time": round(time.time() - start_time, 2),
                 "counting_time": round(time.time() - count_start, 2),
                 "total_records_processed": total_count,
-                "request_dates_retrieved": len(request_dates_iso)
+                "series_points": sum(len(points) for points in request_series.values())
             }
-        }
+        })
 
         print(f"Total optimized processing time: {time.time() - start_time:.2f}s")
         print(f"Processed {total_count} transfers")
@@ -243,19 +328,10 @@ def dashboard_normal():
         # Save dashboard data
         save_start = time.time()
         try:
-            dashboard, created = xx_DashboardBudgetTransfer.objects.get_or_create(
-                Dashboard_id=1,
-                defaults={'data': '{}'}
-            )
-            
-            existing_data = dashboard.get_data() or {}
-            existing_data['normal'] = data
-            
-            dashboard.set_data(existing_data)
-            dashboard.save()
+            version = save_dashboard_section('normal', data)
             
             print(f"Dashboard data saved in {time.time() - save_start:.2f}s")
-            print(f"Normal dashboard data {'created' if created else 'updated'} successfully")
+            print(f"Normal dashboard data saved as version {version}")
             return data
             
         except Exception as save_error:
@@ -269,9 +345,221 @@ def dashboard_normal():
         return False
 
 
+def format_normal_counters(counters):
+    """
+    Build the counter part of the normal dashboard from counter_key -> value
+
+    Args:
+        counters (dict): Counters as returned by get_dashboard_counters()
+
+    Returns:
+        dict: Totals per code prefix, status and pending level
+    """
+    return {
+        "total_transfers": counters.get('total', 0),
+        "total_transfers_far": counters.get('code:FAR', 0),
+        "total_transfers_afr": counters.get('code:AFR', 0),
+        "total_transfers_fad": counters.get('code:FAD', 0),
+        "approved_transfers": counters.get('status:approved', 0),
+        "rejected_transfers": counters.get('status:rejected', 0),
+        "pending_transfers": counters.get('status:pending', 0),
+        "pending_transfers_by_level": {
+            f"Level{level}": counters.get(f'level:{level}', 0) for level in range(1, 5)
+        },
+    }
+
+
+def series_window_start(granularity, today=None):
+    """
+    First period included in a dashboard series. Day and week series cover the
+    last DASHBOARD_SERIES_DAYS / DASHBOARD_SERIES_WEEKS; month series are complete.
+    """
+    today = today or timezone.localdate()
+    if granularity == 'day':
+        return today - timedelta(days=getattr(settings, 'DASHBOARD_SERIES_DAYS', 90) - 1)
+    if granularity == 'week':
+        weeks = getattr(settings, 'DASHBOARD_SERIES_WEEKS', 104)
+        return today - timedelta(days=today.weekday(), weeks=weeks - 1)
+    return None
+
+
+def get_dashboard_series(scope_ids=None):
+    """
+    Transfer counts and amounts per period, status and code type
+
+    Args:
+        scope_ids (list, optional): Only merge these scopes (all transfers when None)
+
+    Returns:
+        dict: Granularity ('day', 'week', 'month') -> list of
+        {'period', 'status', 'type', 'count', 'amount'} sorted by period
+    """
+    series = {}
+    for granularity in SERIES_GRANULARITIES:
+        queryset = xx_DashboardSeriesBucket.objects.filter(granularity=granularity)
+        window_start = series_window_start(granularity)
+        if window_start:
+            queryset = queryset.filter(period_start__gte=window_start)
+        if scope_ids is not None:
+            queryset = queryset.filter(scope_filter(scope_ids))
+
+        rows = (
+            queryset.values('period_start', 'status', 'transfer_type')
+            .annotate(count=Sum('transfer_count'), amount=Sum('total_amount'))
+            .exclude(count=0)
+            .order_by('period_start', 'status', 'transfer_type')
+        )
+        series[granularity] = [
+            {
+                "period": row['period_start'].isoformat(),
+                "status": row['status'],
+                "type": row['transfer_type'],
+                "count": row['count'],
+                "amount": float(row['amount'] or 0),
+            }
+            for row in rows
+        ]
+    return series
+
+
+# Oracle rejects IN lists longer than 1000 items
+SCOPE_CHUNK_SIZE = 500
+
+
+def scope_filter(scope_ids):
+    """
+    Q matching rows of the given scopes in a single query: the ids are split in
+    several ORed IN lists, which Oracle accepts whatever their total length
+    """
+    condition = Q(scope_id__in=[])
+    for start in range(0, len(scope_ids), SCOPE_CHUNK_SIZE):
+        condition |= Q(scope_id__in=scope_ids[start:start + SCOPE_CHUNK_SIZE])
+    return condition
+
+
+def dashboard_for_entities(entity_codes, dashboard_type='all', filters=None):
+    """
+    Entity-scoped dashboard merged from the per-scope slices, without scanning
+    the transfers. A transfer is counted when all its lines belong to the given
+    entities (transfers without lines are counted for everyone), like
+    filter_budget_transfers_all_in_entities; unlike the lists, the user's own
+    transfers outside their entities are not added.
+
+    Args:
+        entity_codes (list): Entity codes the user may see (children included)
+        dashboard_type (str): 'smart', 'normal' or 'all'
+        filters (dict, optional): Smart dashboard filters, see cube_queryset()
+
+    Returns:
+        dict: Section payload, or section name -> payload for 'all'
+    """
+    start_time = time.time()
+    scope_ids = get_scope_ids_within(entity_codes)
+
+    sections = {}
+    if dashboard_type in ('normal', 'all'):
+        counters = dict(
+            xx_DashboardScopeCounter.objects.filter(scope_filter(scope_ids))
+            .values('counter_key')
+            .annotate(total=Sum('value'))
+            .values_list('counter_key', 'total')
+        )
+
+        request_series = get_dashboard_series(scope_ids)
+
+        normal = format_normal_counters(counters)
+        normal.update({
+            "request_series": request_series,
+            "performance_metrics": {
+                "total_processing_time": round(time.time() - start_time, 2),
+                "scopes_merged": len(scope_ids),
+                "series_points": sum(len(points) for points in request_series.values()),
+            },
+        })
+        sections['normal'] = normal
+
+    if dashboard_type in ('smart', 'all'):
+        smart = build_smart_payload(cube_queryset(scope_ids, filters), filters or {})
+        smart["performance_metrics"].update({
+            "total_processing_time": round(time.time() - start_time, 2),
+            "scopes_merged": len(scope_ids),
+        })
+        sections['smart'] = smart
+
+    if dashboard_type == 'all':
+        return sections
+    return sections.get(dashboard_type)
+
+
+def save_dashboard_section(section, data):
+    """
+    Store one dashboard section in its own row and bump its version.
+    Only that row is written, so concurrent smart and normal refreshes
+    can never overwrite each other.
+
+    Args:
+        section (str): 'smart' or 'normal'
+        data (dict or str): Section payload, or its JSON encoding
+
+    Returns:
+        int: New version of the section
+    """
+    # Encoded incrementally: the lazy totals are never materialized as lists
+    payload = data if isinstance(data, str) else dumps_streamed(data)
+    with transaction.atomic():
+        updated = xx_DashboardSection.objects.filter(section=section).update(
+            data=payload, version=F('version') + 1, updated_at=timezone.now()
+        )
+        if not updated:
+            try:
+                with transaction.atomic():
+                    xx_DashboardSection.objects.create(section=section, data=payload, version=1)
+            except IntegrityError:
+                # Another refresh created the row in the meantime
+                xx_DashboardSection.objects.filter(section=section).update(
+                    data=payload, version=F('version') + 1, updated_at=timezone.now()
+                )
+        return xx_DashboardSection.objects.filter(section=section).values_list(
+            'version', flat=True
+        ).first()
+
+
+def get_dashboard_versions():
+    """Return the stored version of every dashboard section as section -> version"""
+    return dict(xx_DashboardSection.objects.values_list('section', 'version'))
+
+
+def dashboard_etag(dashboard_type, versions, entity_codes=None):
+    """
+    Build the ETag of a dashboard response from the section versions
+
+    Args:
+        dashboard_type (str): 'smart', 'normal' or 'all'
+        versions (dict): Section versions as returned by get_dashboard_versions()
+        entity_codes (list, optional): Entity codes of an entity-scoped dashboard
+
+    Returns:
+        str: Quoted ETag, or None when a stored section has not been built yet
+    """
+    if entity_codes is None:
+        # Stored sections: only the requested ones matter
+        sections = ['normal', 'smart'] if dashboard_type == 'all' else [dashboard_type]
+        if any(versions.get(section) is None for section in sections):
+            return None
+    else:
+        # Merged slices are read live and change with either section
+        # (a line change can move a transfer between scopes)
+        sections = ['normal', 'smart']
+
+    parts = [dashboard_type] + [f"{section}:{versions.get(section, 0)}" for section in sections]
+    if entity_codes is not None:
+        parts.append(",".join(sorted(str(code) for code in entity_codes)))
+    return quote_etag(hashlib.sha1("|".join(parts).encode('utf-8')).hexdigest())
+
+
 def get_saved_dashboard_data(dashboard_type='smart'):
     """
-    Retrieve saved dashboard data from database
+    Retrieve one saved dashboard section from database
     
     Args:
         dashboard_type (str): 'smart' or 'normal'
@@ -280,31 +568,60 @@ def get_saved_dashboard_data(dashboard_type='smart'):
         dict: Dashboard data or None if not found
     """
     try:
-        dashboard = xx_DashboardBudgetTransfer.objects.get(Dashboard_id=1)
-        all_data = dashboard.get_data() or {}
-        return all_data.get(dashboard_type)
-    except xx_DashboardBudgetTransfer.DoesNotExist:
-        print(f"No saved dashboard data found")
-        return None
+        payload = xx_DashboardSection.objects.filter(section=dashboard_type).values_list(
+            'data', flat=True
+        ).first()
+        if not payload:
+            print(f"No saved {dashboard_type} dashboard data found")
+            return None
+        return json.loads(payload)
     except Exception as e:
         print(f"Error retrieving {dashboard_type} dashboard data: {e}")
         return None
 
 
+def get_saved_dashboard_payload(dashboard_type='smart'):
+    """
+    Retrieve one saved dashboard section as its stored JSON text, without parsing it
+
+    Returns:
+        str: JSON document or None if not found
+    """
+    return xx_DashboardSection.objects.filter(section=dashboard_type).values_list(
+        'data', flat=True
+    ).first() or None
+
+
+def get_all_dashboard_payload():
+    """
+    Retrieve all saved dashboard sections as one JSON object (section -> data),
+    assembled from the stored texts without parsing them
+
+    Returns:
+        str: JSON document or None if nothing is saved yet
+    """
+    sections = [
+        f"{json.dumps(section)}: {payload}"
+        for section, payload in xx_DashboardSection.objects.order_by('section').values_list('section', 'data')
+        if payload
+    ]
+    if not sections:
+        return None
+    return "{" + ", ".join(sections) + "}"
+
+
 def get_all_dashboard_data():
     """
-    Retrieve all dashboard data (both smart and normal) from database
+    Retrieve all dashboard sections (smart, normal, ...) from database
     
     Returns:
-        dict: All dashboard data or None if not found
+        dict: Section name -> dashboard data, empty if nothing is saved yet
     """
     try:
-        dashboard = xx_DashboardBudgetTransfer.objects.get(Dashboard_id=1)
+        sections = xx_DashboardSection.objects.values_list('section', 'data')
+        data = {section: json.loads(payload) for section, payload in sections if payload}
         print("Retrieved dashboard data successfully")
-        return dashboard.get_data() or {}
-    except xx_DashboardBudgetTransfer.DoesNotExist:
-        print("No saved dashboard data found")
-        return {}
+        return data
     except Exception as e:
         print(f"Error retrieving dashboard data: {e}")
         return {}
@@ -0,0 +1,770 @@
+"""
+Incremental dashboard aggregates.
+
+Every save, delete or status change of a budget transfer (and every change of
+one of its lines) applies a small delta to the stored counters instead of
+re-scanning XX_BUDGET_TRANSFER_XX and XX_Transaction_Transfer_XX.
+`rebuild_dashboard_aggregates()` recomputes everything from scratch and is
+meant to be run periodically (see the `rebuild_dashboard_aggregates`
+management command) to check and correct the incremental result.
+
+Transfer line from/to amounts are summed into a cube keyed by scope, cost
+center, account, fiscal year and transfer status; the smart dashboard, its
+filters and drill-downs are all answered from it.
+
+Besides the global counters, every transfer is attributed to a scope: the set
+of cost centers its lines touch. Counters and the cube are also kept per
+scope, so an entity-scoped dashboard is the merge of the scopes that lie
+completely inside the user's entities (the same rule
+`filter_budget_transfers_all_in_entities` applies to transfer lists).
+
+Transfer counts and amounts are also bucketed by request date per day, week
+and month, status and code type, so the dashboard ships a time series instead
+of raw request dates.
+"""
+import hashlib
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Sum
+from django.utils import timezone
+
+from budget_management.models import (
+    xx_BudgetTransfer,
+    xx_DashboardAccountTotal,
+    xx_DashboardCounter,
+    xx_DashboardScope,
+    xx_DashboardScopeCounter,
+    xx_DashboardScopeEntity,
+    xx_DashboardSeriesBucket,
+    xx_DashboardTransferScope,
+)
+from adjd_transaction.models import xx_TransactionTransfer
+from public_funtion.entity_scope_cache import entity_codes_q
+
+
+TRANSFER_CODE_PREFIXES = ("FAR", "AFR", "FAD")
+SERIES_GRANULARITIES = ("day", "week", "month")
+
+# Fields needed to place a transfer in the counters and series; used for the pre_save snapshot
+TRANSFER_STATE_FIELDS = ("status", "status_level", "code", "request_date", "amount", "fy")
+LINE_STATE_FIELDS = ("transaction_id", "cost_center_code", "account_code", "from_center", "to_center")
+
+ZERO_TOTALS = (Decimal("0"), Decimal("0"))
+
+# Scopes are never deleted, so their ids can be cached for the life of the process
+_scope_ids = {}
+
+
+def transfer_counter_keys(state):
+    """
+    Return the counter keys a transfer contributes to.
+
+    Args:
+        state (dict): Transfer state with 'status', 'status_level' and 'code'
+
+    Returns:
+        list: Counter keys, e.g. ['total', 'status:pending', 'level:2', 'code:FAR']
+    """
+    keys = ["total"]
+    if state.get("status"):
+        keys.append(f"status:{state['status']}")
+    if state.get("status_level") is not None:
+        keys.append(f"level:{state['status_level']}")
+    prefix = (state.get("code") or "")[:3].upper()
+    if prefix in TRANSFER_CODE_PREFIXES:
+        keys.append(f"code:{prefix}")
+    return keys
+
+
+def transfer_type(code):
+    """Code type of a transfer: FAR, AFR, FAD or OTHER"""
+    prefix = (code or "")[:3].upper()
+    return prefix if prefix in TRANSFER_CODE_PREFIXES else "OTHER"
+
+
+def period_start(value, granularity):
+    """
+    Return the first day of the period a request date falls in.
+
+    Args:
+        value (datetime): Request date
+        granularity (str): 'day', 'week' (weeks start on Monday) or 'month'
+    """
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    day = value.date()
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def transfer_series_keys(state):
+    """
+    Return the series buckets a transfer contributes to.
+
+    Args:
+        state (dict): Transfer state with 'request_date', 'status' and 'code'
+
+    Returns:
+        list: (granularity, period_start, status, transfer_type) tuples, empty
+        when the transfer has no request date
+    """
+    if not state.get("request_date"):
+        return []
+    status = state.get("status") or "none"
+    code_type = transfer_type(state.get("code"))
+    return [
+        (granularity, period_start(state["request_date"], granularity), status, code_type)
+        for granularity in SERIES_GRANULARITIES
+    ]
+
+
+def scope_key(cost_center_codes):
+    """Canonical scope key for a collection of cost center codes ('' for a transfer without lines)"""
+    return ",".join(sorted({str(code) for code in cost_center_codes if code is not None}))
+
+
+def scope_entity_rows(scope_id, key):
+    """xx_DashboardScopeEntity rows of a scope, one per cost center of its key"""
+    return [
+        xx_DashboardScopeEntity(scope_id=scope_id, entity_code=code)
+        for code in key.split(",") if code
+    ]
+
+
+def get_scope_id(key):
+    """Return the id of the scope with the given key, creating it if needed"""
+    if key in _scope_ids:
+        return _scope_ids[key]
+    scope_hash = hashlib.sha256(key.encode("utf-8")).hexdigest()
+    scope_id = (
+        xx_DashboardScope.objects.filter(scope_hash=scope_hash).values_list("id", flat=True).first()
+    )
+    if scope_id is None:
+        try:
+            with transaction.atomic():
+                scope_id = xx_DashboardScope.objects.create(
+                    scope_hash=scope_hash, entity_codes=key
+                ).id
+                xx_DashboardScopeEntity.objects.bulk_create(scope_entity_rows(scope_id, key))
+        except IntegrityError:
+            scope_id = xx_DashboardScope.objects.get(scope_hash=scope_hash).id
+    # Only cache committed rows, a rolled back scope must not be reused
+    transaction.on_commit(partial(_scope_ids.__setitem__, key, scope_id))
+    return scope_id
+
+
+def get_scope_ids(keys):
+    """Return key -> scope id for many scope keys, creating the missing scopes in bulk"""
+    hashes = {hashlib.sha256(key.encode("utf-8")).hexdigest(): key for key in set(keys)}
+
+    def load(scope_hashes):
+        scope_hashes = list(scope_hashes)
+        found = {}
+        for start in range(0, len(scope_hashes), 500):
+            rows = xx_DashboardScope.objects.filter(
+                scope_hash__in=scope_hashes[start:start + 500]
+            ).values_list("scope_hash", "id")
+            found.update((hashes[scope_hash], scope_id) for scope_hash, scope_id in rows)
+        return found
+
+    scope_ids = load(hashes)
+    missing = {scope_hash: key for scope_hash, key in hashes.items() if key not in scope_ids}
+    if missing:
+        xx_DashboardScope.objects.bulk_create(
+            [xx_DashboardScope(scope_hash=scope_hash, entity_codes=key) for scope_hash, key in missing.items()],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        created = load(missing)
+        xx_DashboardScopeEntity.objects.bulk_create(
+            [row for key, scope_id in created.items() for row in scope_entity_rows(scope_id, key)],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        scope_ids.update(created)
+    return scope_ids
+
+
+def get_transfer_state(transaction_id):
+    """Load the stored dashboard-relevant state of a transfer, or None if it does not exist"""
+    if transaction_id is None:
+        return None
+    return (
+        xx_BudgetTransfer.objects.filter(transaction_id=transaction_id)
+        .values(*TRANSFER_STATE_FIELDS)
+        .first()
+    )
+
+
+def get_line_state(transfer_id):
+    """Load the stored dashboard-relevant state of a transfer line, or None if it does not exist"""
+    if transfer_id is None:
+        return None
+    return (
+        xx_TransactionTransfer.objects.filter(transfer_id=transfer_id)
+        .values(*LINE_STATE_FIELDS)
+        .first()
+    )
+
+
+def instance_state(instance, fields):
+    """Snapshot the given fields of a model instance as a dict"""
+    return {field: getattr(instance, field) for field in fields}
+
+
+def _transfer_lines(transaction_id):
+    return list(
+        xx_TransactionTransfer.objects.filter(transaction_id=transaction_id).values(
+            "cost_center_code", "account_code", "from_center", "to_center"
+        )
+    )
+
+
+def _stored_scope_id(transaction_id):
+    return (
+        xx_DashboardTransferScope.objects.filter(transaction_id=transaction_id)
+        .values_list("scope_id", flat=True)
+        .first()
+    )
+
+
+def _apply_counter_deltas(deltas):
+    """Add each delta to its counter row, creating missing rows"""
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        updated = xx_DashboardCounter.objects.filter(counter_key=key).update(
+            value=F("value") + delta
+        )
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                xx_DashboardCounter.objects.create(counter_key=key, value=delta)
+        except IntegrityError:
+            # Another request created the row in the meantime
+            xx_DashboardCounter.objects.filter(counter_key=key).update(
+                value=F("value") + delta
+            )
+
+
+def _apply_scope_counter_deltas(deltas):
+    """Add each delta to its (scope, counter) row, creating missing rows"""
+    for (scope_id, key), delta in deltas.items():
+        if not delta:
+            continue
+        rows = xx_DashboardScopeCounter.objects.filter(scope_id=scope_id, counter_key=key)
+        if rows.update(value=F("value") + delta):
+            continue
+        try:
+            with transaction.atomic():
+                xx_DashboardScopeCounter.objects.create(
+                    scope_id=scope_id, counter_key=key, value=delta
+                )
+        except IntegrityError:
+            rows.update(value=F("value") + delta)
+
+
+def _apply_series_deltas(deltas):
+    """Add (count, amount) deltas to the per scope series buckets, creating missing rows"""
+    for (scope_id, granularity, start, status, code_type), (delta_count, delta_amount) in deltas.items():
+        if not delta_count and not delta_amount:
+            continue
+        rows = xx_DashboardSeriesBucket.objects.filter(
+            scope_id=scope_id,
+            granularity=granularity,
+            period_start=start,
+            status=status,
+            transfer_type=code_type,
+        )
+        updated = rows.update(
+            transfer_count=F("transfer_count") + delta_count,
+            total_amount=F("total_amount") + delta_amount,
+        )
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                xx_DashboardSeriesBucket.objects.create(
+                    scope_id=scope_id,
+                    granularity=granularity,
+                    period_start=start,
+                    status=status,
+                    transfer_type=code_type,
+                    transfer_count=delta_count,
+                    total_amount=delta_amount,
+                )
+        except IntegrityError:
+            rows.update(
+                transfer_count=F("transfer_count") + delta_count,
+                total_amount=F("total_amount") + delta_amount,
+            )
+
+
+def _apply_account_deltas(deltas):
+    """Add (from, to) deltas to the cube cells, creating missing rows"""
+    for key, (delta_from, delta_to) in deltas.items():
+        if not delta_from and not delta_to:
+            continue
+        scope_id, cost_center_code, account_code, fiscal_year, status = key
+        rows = xx_DashboardAccountTotal.objects.filter(
+            scope_id=scope_id,
+            cost_center_code=cost_center_code,
+            account_code=account_code,
+            fiscal_year=fiscal_year,
+            status=status,
+        )
+        updated = rows.update(
+            total_from_center=F("total_from_center") + delta_from,
+            total_to_center=F("total_to_center") + delta_to,
+        )
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                xx_DashboardAccountTotal.objects.create(
+                    scope_id=scope_id,
+                    cost_center_code=cost_center_code,
+                    account_code=account_code,
+                    fiscal_year=fiscal_year,
+                    status=status,
+                    total_from_center=delta_from,
+                    total_to_center=delta_to,
+                )
+        except IntegrityError:
+            rows.update(
+                total_from_center=F("total_from_center") + delta_from,
+                total_to_center=F("total_to_center") + delta_to,
+            )
+
+
+def _add_line(deltas, scope_id, parent, line, sign):
+    """Book a line in the cube cell of its parent transfer's scope, fiscal year and status"""
+    key = (scope_id, line["cost_center_code"], line["account_code"], parent["fy"], parent["status"])
+    delta_from, delta_to = deltas.get(key, ZERO_TOTALS)
+    deltas[key] = (
+        delta_from + sign * Decimal(str(line["from_center"] or 0)),
+        delta_to + sign * Decimal(str(line["to_center"] or 0)),
+    )
+
+
+def _add_counters(deltas, scope_id, state, sign):
+    for key in transfer_counter_keys(state):
+        deltas[(scope_id, key)] += sign
+
+
+def _add_series(deltas, scope_id, state, sign):
+    amount = Decimal(str(state.get("amount") or 0))
+    for key in transfer_series_keys(state):
+        delta_count, delta_amount = deltas.get((scope_id,) + key, (0, Decimal("0")))
+        deltas[(scope_id,) + key] = (delta_count + sign, delta_amount + sign * amount)
+
+
+def _cube_cell(state):
+    """Part of the cube key that comes from the transfer, None if its lines are not booked"""
+    return (state.get("fy"), state.get("status")) if state else None
+
+
+def apply_transfer_delta(transaction_id, previous, current):
+    """
+    Move a transfer from its previous state to its current state in the aggregates.
+
+    Args:
+        transaction_id (int): Transfer primary key
+        previous (dict or None): State before the change (None on create)
+        current (dict or None): State after the change (None on delete, called
+            before the transfer and its lines are deleted)
+    """
+    scope_id = _stored_scope_id(transaction_id)
+    tracked = scope_id is not None
+    if not tracked:
+        # New transfer (or one the rebuild has not seen yet): scope from its lines
+        scope_id = get_scope_id(
+            scope_key(line["cost_center_code"] for line in _transfer_lines(transaction_id))
+        )
+        if current is not None:
+            xx_DashboardTransferScope.objects.update_or_create(
+                transaction_id=transaction_id, defaults={"scope_id": scope_id}
+            )
+
+    counter_deltas = defaultdict(int)
+    scope_counter_deltas = defaultdict(int)
+    series_deltas = {}
+    if previous:
+        for key in transfer_counter_keys(previous):
+            counter_deltas[key] -= 1
+        _add_counters(scope_counter_deltas, scope_id, previous, -1)
+        _add_series(series_deltas, scope_id, previous, -1)
+    if current:
+        for key in transfer_counter_keys(current):
+            counter_deltas[key] += 1
+        _add_counters(scope_counter_deltas, scope_id, current, 1)
+        _add_series(series_deltas, scope_id, current, 1)
+
+    # Lines were booked under the previous state only if the transfer was tracked
+    booked = previous if tracked else None
+    account_deltas = {}
+    if _cube_cell(booked) != _cube_cell(current):
+        # Called before a delete, so the lines of a deleted transfer are still there
+        for line in _transfer_lines(transaction_id):
+            if booked:
+                _add_line(account_deltas, scope_id, booked, line, -1)
+            if current:
+                _add_line(account_deltas, scope_id, current, line, 1)
+
+    with transaction.atomic():
+        _apply_counter_deltas(counter_deltas)
+        _apply_scope_counter_deltas(scope_counter_deltas)
+        _apply_series_deltas(series_deltas)
+        _apply_account_deltas(account_deltas)
+        if current is None:
+            # Untracked from now on: the line signals of the cascade skip this transfer
+            xx_DashboardTransferScope.objects.filter(transaction_id=transaction_id).delete()
+
+
+def apply_line_delta(previous, current):
+    """
+    Move a transfer line from its previous state to its current state in the
+    cube. Only lines of transfers that are still tracked (have a scope row)
+    count. The delta is booked under the transfer's stored scope; the scope
+    itself is re-synchronised once the surrounding transaction commits, when
+    all line changes of a batch are visible.
+
+    Args:
+        previous (dict or None): Line state before the change (None on create)
+        current (dict or None): Line state after the change (None on delete)
+
+    Returns:
+        bool: True if approved totals (the smart dashboard) changed
+    """
+    account_deltas = {}
+    parents = {}
+
+    def booked_parent(transaction_id):
+        """(scope_id, state) the parent's lines are booked under, or None if they do not count"""
+        if transaction_id not in parents:
+            scope_id = _stored_scope_id(transaction_id)
+            state = get_transfer_state(transaction_id) if scope_id is not None else None
+            parents[transaction_id] = (scope_id, state) if state else None
+        return parents[transaction_id]
+
+    transaction_ids = set()
+    for line, sign in ((previous, -1), (current, 1)):
+        if not line or line["transaction_id"] is None:
+            continue
+        transaction_ids.add(line["transaction_id"])
+        parent = booked_parent(line["transaction_id"])
+        if parent is not None:
+            _add_line(account_deltas, parent[0], parent[1], line, sign)
+
+    for transaction_id in transaction_ids:
+        transaction.on_commit(partial(sync_transfer_scope, transaction_id))
+
+    if not account_deltas:
+        return False
+    with transaction.atomic():
+        _apply_account_deltas(account_deltas)
+    return any(key[4] == "approved" for key in account_deltas)
+
+
+def sync_transfer_scope(transaction_id):
+    """
+    Recompute a transfer's scope from its lines and, if it changed, move the
+    transfer's counters, series buckets and cube cells to the new scope.
+    """
+    state = get_transfer_state(transaction_id)
+    if state is None:
+        return
+    lines = _transfer_lines(transaction_id)
+    new_scope_id = get_scope_id(scope_key(line["cost_center_code"] for line in lines))
+    old_scope_id = _stored_scope_id(transaction_id)
+    if old_scope_id == new_scope_id:
+        return
+
+    scope_counter_deltas = defaultdict(int)
+    series_deltas = {}
+    account_deltas = {}
+    if old_scope_id is not None:
+        _add_counters(scope_counter_deltas, old_scope_id, state, -1)
+        _add_series(series_deltas, old_scope_id, state, -1)
+    _add_counters(scope_counter_deltas, new_scope_id, state, 1)
+    _add_series(series_deltas, new_scope_id, state, 1)
+    for line in lines:
+        if old_scope_id is not None:
+            _add_line(account_deltas, old_scope_id, state, line, -1)
+        _add_line(account_deltas, new_scope_id, state, line, 1)
+
+    with transaction.atomic():
+        _apply_scope_counter_deltas(scope_counter_deltas)
+        _apply_series_deltas(series_deltas)
+        _apply_account_deltas(account_deltas)
+        xx_DashboardTransferScope.objects.update_or_create(
+            transaction_id=transaction_id, defaults={"scope_id": new_scope_id}
+        )
+
+    # Entity-scoped dashboards changed even if the global sections did not;
+    # refreshing bumps the section versions their ETag is built from
+    from budget_transfer.global_function.dashboard_refresh import schedule_dashboard_refresh
+    schedule_dashboard_refresh("smart", "normal")
+
+
+def get_dashboard_counters():
+    """Return all stored counters as a dict of counter_key -> value"""
+    return dict(xx_DashboardCounter.objects.values_list("counter_key", "value"))
+
+
+def get_scope_ids_within(entity_codes):
+    """
+    Return the ids of the scopes whose cost centers all belong to the given entity codes.
+    Transfers without lines (empty scope) are visible to everyone, as in the list views.
+
+    One NOT EXISTS query on the scope entities, no scope is loaded.
+    """
+    allowed = sorted({str(code) for code in entity_codes})
+    outside = xx_DashboardScopeEntity.objects.filter(scope_id=OuterRef("pk"))
+    if allowed:
+        outside = outside.exclude(entity_codes_q("entity_code", allowed))
+    return list(
+        xx_DashboardScope.objects.filter(~Exists(outside)).order_by("id").values_list("id", flat=True)
+    )
+
+
+def compute_dashboard_aggregates():
+    """
+    Compute the counters, scopes, cube and series from scratch.
+
+    Returns:
+        dict: 'counters' (counter_key -> value), 'scope_counters'
+        ((scope_key, counter_key) -> value), 'account_totals' ((scope_key,
+        cost_center_code, account_code, fiscal_year, status) -> (from, to)),
+        'series' ((scope_key, granularity, period_start, status, transfer_type)
+        -> (count, amount)) and 'transfer_scopes' (transaction_id -> scope_key)
+    """
+    centers = defaultdict(set)
+    for transaction_id, cost_center_code in xx_TransactionTransfer.objects.values_list(
+        "transaction_id", "cost_center_code"
+    ).distinct():
+        centers[transaction_id].add(cost_center_code)
+
+    counters = defaultdict(int)
+    scope_counters = defaultdict(int)
+    series = defaultdict(lambda: (0, Decimal("0")))
+    transfer_scopes = {}
+    rows = xx_BudgetTransfer.objects.values("transaction_id", *TRANSFER_STATE_FIELDS)
+    for row in rows.iterator():
+        key = scope_key(centers.get(row["transaction_id"], ()))
+        transfer_scopes[row["transaction_id"]] = key
+        for counter_key in transfer_counter_keys(row):
+            counters[counter_key] += 1
+            scope_counters[(key, counter_key)] += 1
+        amount = row["amount"] or Decimal("0")
+        for series_key in transfer_series_keys(row):
+            count, total = series[(key,) + series_key]
+            series[(key,) + series_key] = (count + 1, total + amount)
+
+    totals = defaultdict(lambda: ZERO_TOTALS)
+    rows = (
+        xx_TransactionTransfer.objects.filter(transaction__isnull=False)
+        .values(
+            "transaction_id",
+            "cost_center_code",
+            "account_code",
+            "transaction__fy",
+            "transaction__status",
+        )
+        .annotate(total_from_center=Sum("from_center"), total_to_center=Sum("to_center"))
+    )
+    for row in rows:
+        key = (
+            transfer_scopes.get(row["transaction_id"], ""),
+            row["cost_center_code"],
+            row["account_code"],
+            row["transaction__fy"],
+            row["transaction__status"],
+        )
+        total_from, total_to = totals[key]
+        totals[key] = (
+            total_from + (row["total_from_center"] or Decimal("0")),
+            total_to + (row["total_to_center"] or Decimal("0")),
+        )
+
+    return {
+        "counters": dict(counters),
+        "scope_counters": dict(scope_counters),
+        "account_totals": dict(totals),
+        "series": dict(series),
+        "transfer_scopes": transfer_scopes,
+    }
+
+
+def _diff(expected, stored, default):
+    """Keys whose expected and stored values differ, as (key, stored, expected)"""
+    return [
+        (key, stored.get(key, default), expected.get(key, default))
+        for key in set(expected) | set(stored)
+        if expected.get(key, default) != stored.get(key, default)
+    ]
+
+
+def rebuild_dashboard_aggregates(check_only=False):
+    """
+    Recompute the aggregates from scratch and compare them with the stored ones.
+
+    Args:
+        check_only (bool): Only report differences, do not rewrite the stored aggregates
+
+    Returns:
+        dict: Differences found, {'counters': [...], 'scope_counters': [...],
+        'account_totals': [...], 'series': [...], 'transfer_scopes': [...]}
+    """
+    expected = compute_dashboard_aggregates()
+    scope_keys = dict(xx_DashboardScope.objects.values_list("id", "entity_codes"))
+    scope_keys = {scope_id: key or "" for scope_id, key in scope_keys.items()}
+
+    stored_counters = get_dashboard_counters()
+    stored_scope_counters = {
+        (scope_keys[scope_id], key): value
+        for scope_id, key, value in xx_DashboardScopeCounter.objects.values_list(
+            "scope_id", "counter_key", "value"
+        )
+    }
+    stored_totals = {
+        (
+            scope_keys.get(row.scope_id, ""),
+            row.cost_center_code,
+            row.account_code,
+            row.fiscal_year,
+            row.status,
+        ): (
+            row.total_from_center,
+            row.total_to_center,
+        )
+        for row in xx_DashboardAccountTotal.objects.all()
+    }
+    stored_series = {
+        (scope_keys[row.scope_id], row.granularity, row.period_start, row.status, row.transfer_type): (
+            row.transfer_count,
+            row.total_amount,
+        )
+        for row in xx_DashboardSeriesBucket.objects.all()
+    }
+    stored_scopes = {
+        transaction_id: scope_keys[scope_id]
+        for transaction_id, scope_id in xx_DashboardTransferScope.objects.values_list(
+            "transaction_id", "scope_id"
+        )
+    }
+
+    diffs = {
+        "counters": [
+            {"key": key, "stored": old, "expected": new}
+            for key, old, new in sorted(_diff(expected["counters"], stored_counters, 0))
+        ],
+        "scope_counters": [
+            {"scope": key[0], "key": key[1], "stored": old, "expected": new}
+            for key, old, new in _diff(expected["scope_counters"], stored_scope_counters, 0)
+        ],
+        "account_totals": [
+            {
+                "scope": key[0],
+                "cost_center_code": key[1],
+                "account_code": key[2],
+                "fiscal_year": key[3],
+                "status": key[4],
+                "stored": [float(old[0]), float(old[1])],
+                "expected": [float(new[0]), float(new[1])],
+            }
+            for key, old, new in _diff(expected["account_totals"], stored_totals, ZERO_TOTALS)
+        ],
+        "series": [
+            {
+                "scope": key[0],
+                "granularity": key[1],
+                "period_start": key[2].isoformat(),
+                "status": key[3],
+                "transfer_type": key[4],
+                "stored": [old[0], float(old[1])],
+                "expected": [new[0], float(new[1])],
+            }
+            for key, old, new in _diff(expected["series"], stored_series, (0, Decimal("0")))
+        ],
+        "transfer_scopes": [
+            {"transaction_id": key, "stored": old, "expected": new}
+            for key, old, new in _diff(expected["transfer_scopes"], stored_scopes, None)
+        ],
+    }
+
+    if not check_only and any(diffs.values()):
+        scope_ids = get_scope_ids(
+            [key[0] for key in expected["scope_counters"]]
+            + [key[0] for key in expected["account_totals"]]
+            + [key[0] for key in expected["series"]]
+            + list(expected["transfer_scopes"].values())
+        )
+        with transaction.atomic():
+            xx_DashboardCounter.objects.all().delete()
+            xx_DashboardCounter.objects.bulk_create(
+                [
+                    xx_DashboardCounter(counter_key=key, value=value)
+                    for key, value in expected["counters"].items()
+                ]
+            )
+            xx_DashboardScopeCounter.objects.all().delete()
+            xx_DashboardScopeCounter.objects.bulk_create(
+                [
+                    xx_DashboardScopeCounter(
+                        scope_id=scope_ids[key[0]], counter_key=key[1], value=value
+                    )
+                    for key, value in expected["scope_counters"].items()
+                ],
+                batch_size=1000,
+            )
+            xx_DashboardAccountTotal.objects.all().delete()
+            xx_DashboardAccountTotal.objects.bulk_create(
+                [
+                    xx_DashboardAccountTotal(
+                        scope_id=scope_ids[key[0]],
+                        cost_center_code=key[1],
+                        account_code=key[2],
+                        fiscal_year=key[3],
+                        status=key[4],
+                        total_from_center=value[0],
+                        total_to_center=value[1],
+                    )
+                    for key, value in expected["account_totals"].items()
+                ],
+                batch_size=1000,
+            )
+            xx_DashboardSeriesBucket.objects.all().delete()
+            xx_DashboardSeriesBucket.objects.bulk_create(
+                [
+                    xx_DashboardSeriesBucket(
+                        scope_id=scope_ids[key[0]],
+                        granularity=key[1],
+                        period_start=key[2],
+                        status=key[3],
+                        transfer_type=key[4],
+                        transfer_count=value[0],
+                        total_amount=value[1],
+                    )
+                    for key, value in expected["series"].items()
+                ],
+                batch_size=1000,
+            )
+            xx_DashboardTransferScope.objects.all().delete()
+            xx_DashboardTransferScope.objects.bulk_create(
+                [
+                    xx_DashboardTransferScope(transaction_id=transaction_id, scope_id=scope_ids[key])
+                    for transaction_id, key in expected["transfer_scopes"].items()
+                ],
+                batch_size=1000,
+            )
+
+    return diffs
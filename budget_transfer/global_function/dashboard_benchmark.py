@@ -0,0 +1,153 @@
+"""
+Dashboard benchmark helpers.
+
+`generate_synthetic_transfers()` bulk-inserts realistic budget transfers and
+lines; `measure()` runs a callable and reports wall time, database query
+count and peak Python memory. Used by the `benchmark_dashboard` management
+command, which runs everything inside a transaction that is rolled back.
+"""
+import random
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.utils import timezone
+
+from budget_management.models import xx_BudgetTransfer
+from adjd_transaction.models import xx_TransactionTransfer
+
+
+STATUSES = ("approved", "pending", "rejected")
+BATCH_SIZE = 5000
+
+
+def generate_synthetic_transfers(count, lines_per_transfer=2, cost_centers=50, accounts=200,
+                                 fiscal_years=(2023, 2024, 2025), seed=42):
+    """
+    Bulk insert synthetic transfers with their lines (signals are not sent,
+    rebuild the dashboard aggregates afterwards).
+
+    Args:
+        count (int): Number of transfers
+        lines_per_transfer (int): Lines per transfer
+        cost_centers (int): Number of distinct cost center codes used
+        accounts (int): Number of distinct account codes used
+        fiscal_years (tuple): Fiscal years to spread the transfers over
+        seed (int): Random seed, so runs are comparable
+
+    Returns:
+        list: Cost center codes used
+    """
+    rng = random.Random(seed)
+    cost_center_codes = [10000 + index for index in range(cost_centers)]
+    account_codes = [50000 + index for index in range(accounts)]
+    now = timezone.now()
+
+    created = 0
+    while created < count:
+        batch_size = min(BATCH_SIZE, count - created)
+        transfers = []
+        for index in range(created, created + batch_size):
+            status = rng.choice(STATUSES)
+            transfers.append(
+                xx_BudgetTransfer(
+                    transaction_date=(now - timedelta(days=rng.randrange(730))).strftime("%Y-%m-%d"),
+                    amount=Decimal(rng.randrange(100, 1000000)) / 100,
+                    status=status,
+                    status_level=4 if status == "approved" else rng.randint(1, 4),
+                    code=f"{rng.choice(('FAR', 'AFR', 'FAD'))}-{index + 1:06d}",
+                    fy=rng.choice(fiscal_years),
+                    requested_by="benchmark",
+                )
+            )
+        transfers = xx_BudgetTransfer.objects.bulk_create(transfers)
+        if transfers[0].pk is None:
+            # Backends that do not return primary keys from bulk inserts
+            transfers = list(
+                xx_BudgetTransfer.objects.filter(requested_by="benchmark").order_by("-pk")[:batch_size]
+            )
+
+        lines = []
+        for transfer in transfers:
+            for _ in range(lines_per_transfer):
+                value = Decimal(rng.randrange(100, 100000)) / 100
+                outgoing = rng.random() < 0.5
+                lines.append(
+                    xx_TransactionTransfer(
+                        transaction=transfer,
+                        cost_center_code=rng.choice(cost_center_codes),
+                        account_code=rng.choice(account_codes),
+                        from_center=value if outgoing else 0,
+                        to_center=0 if outgoing else value,
+                    )
+                )
+        xx_TransactionTransfer.objects.bulk_create(lines, batch_size=BATCH_SIZE)
+        created += batch_size
+
+    return cost_center_codes
+
+
+def measure(func, *args, **kwargs):
+    """
+    Run func once and measure it
+
+    Returns:
+        dict: 'time' (seconds), 'queries' (count) and 'peak_memory_kb' (Python allocations)
+    """
+    query_count = 0
+
+    def count_queries(execute, sql, params, many, context):
+        # Counted with a wrapper, the debug query log is capped at 9000 entries
+        nonlocal query_count
+        query_count += 1
+        return execute(sql, params, many, context)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(count_queries):
+            func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "time": round(elapsed, 4),
+        "queries": query_count,
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def find_regressions(results, baseline, max_ratio, min_time=0.05, min_memory_kb=1024):
+    """
+    Compare benchmark results with a baseline.
+
+    A metric regresses when it is more than max_ratio times its baseline value;
+    times under min_time seconds and memory under min_memory_kb are treated as
+    noise. Query counts are compared exactly against the ratio.
+
+    Args:
+        results (dict): size -> benchmark -> metrics, as produced by the command
+        baseline (dict): Same shape, from an earlier run
+        max_ratio (float): Allowed growth factor
+
+    Returns:
+        list: Human readable regression descriptions
+    """
+    floors = {"time": min_time, "queries": 1, "peak_memory_kb": min_memory_kb}
+    regressions = []
+    for size, benchmarks in results.items():
+        for name, metrics in benchmarks.items():
+            reference = baseline.get(size, {}).get(name)
+            if not reference:
+                continue
+            for metric, value in metrics.items():
+                allowed = max(reference.get(metric, 0), floors[metric]) * max_ratio
+                if value > allowed:
+                    regressions.append(
+                        f"{name} @ {size} transfers: {metric} {value} > {allowed:.4g} "
+                        f"(baseline {reference.get(metric)})"
+                    )
+    return regressions
@@ -0,0 +1,114 @@
+"""
+Coalescing dashboard refresh queue.
+
+Saves only mark a dashboard section dirty; a background worker thread inside
+the app process rebuilds each dirty section at most once per debounce window,
+however many saves arrived in the meantime. A bulk approval of 50 transfers
+therefore triggers a single smart and a single normal rebuild, off the request
+thread.
+
+Settings:
+    DASHBOARD_REFRESH_ASYNC (bool): Run refreshes in the background worker
+        (default True). When False, refreshes run synchronously after commit.
+    DASHBOARD_REFRESH_DEBOUNCE_SECONDS (float): Length of the debounce window
+        (default 5 seconds).
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from budget_transfer.global_function.dashbaord import refresh_dashboard_data
+
+logger = logging.getLogger("budget_transfer_signals")
+
+DASHBOARD_SECTIONS = ("smart", "normal")
+
+
+class DashboardRefreshWorker:
+    """Background thread that rebuilds dirty dashboard sections once per debounce window"""
+
+    def __init__(self, debounce_seconds):
+        self.debounce_seconds = debounce_seconds
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def mark_dirty(self, *sections):
+        """Queue the given sections for the next rebuild and make sure the worker runs"""
+        with self._lock:
+            self._dirty.update(sections)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="dashboard-refresh", daemon=True
+                )
+                self._thread.start()
+        self._wakeup.set()
+
+    def _take_dirty(self):
+        with self._lock:
+            sections = self._dirty
+            self._dirty = set()
+            self._wakeup.clear()
+            return sections
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Let the burst of saves finish before rebuilding
+            time.sleep(self.debounce_seconds)
+            sections = self._take_dirty()
+            if sections:
+                run_dashboard_refresh(sections)
+
+
+def run_dashboard_refresh(sections):
+    """Rebuild the given dashboard sections in the current thread"""
+    close_old_connections()
+    try:
+        for section in DASHBOARD_SECTIONS:
+            if section in sections:
+                refresh_dashboard_data(section)
+        logger.info(f"Dashboard sections refreshed: {', '.join(sorted(sections))}")
+    except Exception as e:
+        logger.error(f"Error refreshing dashboard sections {sorted(sections)}: {str(e)}")
+    finally:
+        close_old_connections()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_refresh_worker():
+    """Return the process-wide refresh worker, creating it on first use"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = DashboardRefreshWorker(
+                getattr(settings, "DASHBOARD_REFRESH_DEBOUNCE_SECONDS", 5)
+            )
+        return _worker
+
+
+def schedule_dashboard_refresh(*sections):
+    """
+    Mark dashboard sections dirty once the current transaction commits.
+
+    Args:
+        *sections (str): 'smart' and/or 'normal'
+    """
+    sections = [section for section in sections if section in DASHBOARD_SECTIONS]
+    if not sections:
+        return
+
+    def enqueue():
+        if getattr(settings, "DASHBOARD_REFRESH_ASYNC", True):
+            get_refresh_worker().mark_dirty(*sections)
+        else:
+            run_dashboard_refresh(set(sections))
+
+    transaction.on_commit(enqueue)
@@ -0,0 +1,68 @@
+"""
+Incremental JSON encoding.
+
+`iter_json()` yields a JSON document piece by piece. Besides dicts, lists
+and scalars it accepts any other iterable (generators, lazy query results)
+and encodes it as an array while iterating it, so large dashboard payloads
+are never held as Python lists or as one big string unless the caller joins
+the chunks.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+
+def _encode_scalar(value):
+    if isinstance(value, Decimal):
+        return json.dumps(float(value))
+    if isinstance(value, (datetime, date)):
+        return json.dumps(value.isoformat())
+    return json.dumps(value)
+
+
+def iter_json(value):
+    """
+    Yield the JSON encoding of value in chunks.
+
+    Args:
+        value: dict, list/tuple, any other non-string iterable (encoded as an
+            array), or a JSON scalar / Decimal / date
+
+    Yields:
+        str: Consecutive pieces of the JSON document
+    """
+    if isinstance(value, dict):
+        yield "{"
+        first = True
+        for key, item in value.items():
+            if not first:
+                yield ", "
+            first = False
+            yield json.dumps(str(key))
+            yield ": "
+            yield from iter_json(item)
+        yield "}"
+    elif isinstance(value, (str, int, float, bool, Decimal, date)) or value is None:
+        yield _encode_scalar(value)
+    elif hasattr(value, "__iter__"):
+        yield "["
+        first = True
+        for item in value:
+            if not first:
+                yield ", "
+            first = False
+            if isinstance(item, dict) and all(
+                isinstance(field, (str, int, float, bool)) or field is None for field in item.values()
+            ):
+                # Flat rows (the common case) are encoded in one call
+                yield json.dumps(item)
+            else:
+                yield from iter_json(item)
+        yield "]"
+    else:
+        yield _encode_scalar(value)
+
+
+def dumps_streamed(value):
+    """Encode value with iter_json() into one string (the only full copy)"""
+    return "".join(iter_json(value))
@@ -0,0 +1,123 @@
+"""
+Transfer code allocation.
+
+Transfer codes are PREFIX-NNNN (FAR-0042), numbered per prefix. The last
+number handed out per prefix is kept in one xx_TransferCodeSequence row,
+incremented under select_for_update, so two concurrent creators can never
+get the same code and taking a number is a single-row read and update
+whatever the number of transfers. Numbers past 9999 simply widen the code
+(FAR-10000).
+
+With TRANSFER_CODE_BLOCK_SIZE above 1 each process reserves a block of
+numbers at a time and hands them out from memory: fewer row locks, but codes
+are then only increasing per process, and the rest of a block is skipped
+when the process stops.
+"""
+import re
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from budget_transfer.global_function.transfer_filters import TRANSFER_CODE_PREFIXES
+
+DEFAULT_PREFIX = 'FAR'
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def transfer_code_prefix(transfer_type):
+    """Code prefix of a transfer type (FAR for unknown types)"""
+    transfer_type = str(transfer_type or '').strip().upper()
+    return transfer_type if transfer_type in TRANSFER_CODE_PREFIXES else DEFAULT_PREFIX
+
+
+def format_transfer_code(prefix, number):
+    return f"{prefix}-{number:04d}"
+
+
+def highest_code_number(transfer_model, prefix):
+    """
+    Highest number among the codes of a prefix, compared as numbers (FAR-10000
+    is above FAR-9999)
+
+    Takes the model class so migrations can pass their historical model.
+    """
+    pattern = re.compile(rf'^{re.escape(prefix)}-(\d+)$')
+    highest = 0
+    codes = transfer_model.objects.filter(code__startswith=f"{prefix}-").values_list('code', flat=True)
+    for code in codes.iterator():
+        match = pattern.match(code.strip())
+        if match:
+            highest = max(highest, int(match.group(1)))
+    return highest
+
+
+def sync_transfer_code_sequences(transfer_model, sequence_model):
+    """
+    Move each prefix's sequence up to the highest code in use (never down)
+
+    Returns:
+        dict: prefix -> last value
+    """
+    result = {}
+    with transaction.atomic():
+        for prefix in TRANSFER_CODE_PREFIXES:
+            highest = highest_code_number(transfer_model, prefix)
+            sequence, created = sequence_model.objects.select_for_update().get_or_create(
+                prefix=prefix, defaults={'last_value': highest}
+            )
+            if not created and sequence.last_value < highest:
+                sequence.last_value = highest
+                sequence.save(update_fields=['last_value'])
+            result[prefix] = sequence.last_value
+    return result
+
+
+def _reserve_numbers(prefix, count):
+    """Reserve the next count numbers of a prefix, returns (first, last)"""
+    from budget_management.models import xx_BudgetTransfer, xx_TransferCodeSequence
+
+    with transaction.atomic():
+        sequence = xx_TransferCodeSequence.objects.select_for_update().filter(prefix=prefix).first()
+        if sequence is None:
+            # A prefix the migration did not seed: start after its existing codes
+            try:
+                with transaction.atomic():
+                    xx_TransferCodeSequence.objects.create(
+                        prefix=prefix, last_value=highest_code_number(xx_BudgetTransfer, prefix)
+                    )
+            except IntegrityError:
+                pass  # created by another worker meanwhile
+            sequence = xx_TransferCodeSequence.objects.select_for_update().get(prefix=prefix)
+        first = sequence.last_value + 1
+        sequence.last_value += count
+        sequence.save(update_fields=['last_value'])
+    return first, sequence.last_value
+
+
+def next_transfer_code(transfer_type):
+    """
+    Allocate the code of a new transfer
+
+    Args:
+        transfer_type (str): FAR, AFR or FAD (anything else is FAR)
+
+    Returns:
+        str: The code, e.g. 'FAR-0042'
+    """
+    prefix = transfer_code_prefix(transfer_type)
+    block_size = max(1, int(getattr(settings, 'TRANSFER_CODE_BLOCK_SIZE', 1)))
+    if block_size == 1:
+        number, _ = _reserve_numbers(prefix, 1)
+        return format_transfer_code(prefix, number)
+
+    with _blocks_lock:
+        block = _blocks.get(prefix)
+        if block is None or block[0] > block[1]:
+            block = list(_reserve_numbers(prefix, block_size))
+            _blocks[prefix] = block
+        number = block[0]
+        block[0] += 1
+    return format_transfer_code(prefix, number)
@@ -0,0 +1,118 @@
+"""
+Filters of the budget transfer lists.
+
+Every filter is an equality or a range on a column of XX_BUDGET_TRANSFER_XX
+covered by one of the composite indexes of xx_BudgetTransfer, ending in
+transaction_id so the list order (and its keyset cursor) comes from the
+index too. Code search is a prefix match (LIKE 'FAR-12%'), which an index on
+code can serve, where icontains has to scan every row.
+"""
+import re
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+TRANSFER_CODE_PREFIXES = ('FAR', 'AFR', 'FAD')
+STATUSES = ('pending', 'approved', 'rejected')
+
+
+class TransferFilterError(ValueError):
+    """A filter value cannot be used"""
+
+
+def _day_start(value, name):
+    day = parse_date(str(value)[:10]) if value else None
+    if day is None:
+        raise TransferFilterError(f"{name} must be a date (YYYY-MM-DD)")
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _integer(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise TransferFilterError(f"{name} must be an integer")
+
+
+def parse_transfer_filters(data):
+    """
+    Read the list filters of a request
+
+    Args:
+        data (dict): Request data; recognised keys are date, start_date,
+            end_date (request date, inclusive), status, status_level, type,
+            fy, requested_by, user_id, code and search (code prefix)
+
+    Returns:
+        dict: The filters given, converted
+
+    Raises:
+        TransferFilterError: A value has the wrong type
+    """
+    filters = {}
+    if data.get('date'):
+        start = _day_start(data['date'], 'date')
+        filters['request_date_from'] = start
+        filters['request_date_to'] = start + timedelta(days=1)
+    if data.get('start_date'):
+        filters['request_date_from'] = _day_start(data['start_date'], 'start_date')
+    if data.get('end_date'):
+        filters['request_date_to'] = _day_start(data['end_date'], 'end_date') + timedelta(days=1)
+
+    status = data.get('status')
+    if status:
+        if str(status).lower() not in STATUSES:
+            raise TransferFilterError(f"status must be one of {', '.join(STATUSES)}")
+        filters['status'] = str(status).lower()
+    for name in ('status_level', 'fy', 'user_id'):
+        if data.get(name) not in (None, ''):
+            filters[name] = _integer(data[name], name)
+    if data.get('type'):
+        filters['type'] = str(data['type']).strip()
+    if data.get('requested_by'):
+        filters['requested_by'] = str(data['requested_by']).strip()
+
+    search = data.get('search') or data.get('code')
+    if search and str(search).strip():
+        filters['search'] = str(search).strip()
+    return filters
+
+
+def code_search_q(text):
+    """
+    Prefix match of transfer codes ("FAR-00", "far", "12")
+
+    Codes are upper case PREFIX-NNNN; a bare number is looked for after each
+    prefix, both as typed and zero padded to the code width.
+    """
+    text = text.strip().upper()
+    if not re.fullmatch(r'\d+', text):
+        return Q(code__startswith=text)
+    condition = Q()
+    for prefix in TRANSFER_CODE_PREFIXES:
+        condition |= Q(code__startswith=f"{prefix}-{text}")
+        condition |= Q(code=f"{prefix}-{int(text):04d}")
+    return condition
+
+
+def apply_transfer_filters(transfers, filters):
+    """
+    Filter an xx_BudgetTransfer queryset
+
+    Args:
+        transfers (QuerySet): xx_BudgetTransfer queryset
+        filters (dict): As returned by parse_transfer_filters()
+    """
+    if 'request_date_from' in filters:
+        transfers = transfers.filter(request_date__gte=filters['request_date_from'])
+    if 'request_date_to' in filters:
+        transfers = transfers.filter(request_date__lt=filters['request_date_to'])
+    for name in ('status', 'status_level', 'type', 'fy', 'requested_by', 'user_id'):
+        if name in filters:
+            transfers = transfers.filter(**{name: filters[name]})
+    if 'search' in filters:
+        transfers = transfers.filter(code_search_q(filters['search']))
+    return transfers
@@ -0,0 +1,212 @@
+"""
+Full-text search over the free text of budget transfers.
+
+The notes of xx_BudgetTransfer and the reason, account_name and
+cost_center_name of xx_TransactionTransfer are NCLOB columns in Oracle that
+the queries avoid, so they are indexed in a SQLite FTS5 side index
+(TRANSFER_SEARCH_INDEX_PATH) instead: one document per transfer (its notes)
+and one per transfer line, each carrying the transaction_id.
+
+The signals of both models refresh a document once their transaction
+commits; `manage.py rebuild_transfer_search_index` rebuilds the index from
+the database (first deployment, or changes that skip the signals). Searches
+are ranked with bm25 and grouped per transaction.
+"""
+import logging
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SOURCE_TRANSFER = 'transfer'
+SOURCE_LINE = 'line'
+BATCH_SIZE = 1000
+
+
+def document_rowid(source, source_id):
+    """Rowid of a document, so replacing it is a point delete (transfers even, lines odd)"""
+    return int(source_id) * 2 + (1 if source == SOURCE_LINE else 0)
+
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+
+
+def index_path():
+    return str(getattr(settings, 'TRANSFER_SEARCH_INDEX_PATH', Path(settings.BASE_DIR) / 'transfer_search.sqlite3'))
+
+
+def _connection():
+    """This thread's connection to the side index (created with its schema on first use)"""
+    path = index_path()
+    connection = getattr(_local, 'connection', None)
+    if connection is not None and _local.path == path:
+        return connection
+
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    # Several worker processes write to the index, readers do not block writers
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    with _schema_lock:
+        connection.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS transfer_text USING fts5("
+            "source UNINDEXED, source_id UNINDEXED, transaction_id UNINDEXED, body, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    _local.connection = connection
+    _local.path = path
+    return connection
+
+
+def _body(*values):
+    return '\n'.join(str(value) for value in values if value not in (None, ''))
+
+
+def _write_documents(documents):
+    """Replace documents given as (source, source_id, transaction_id, body)"""
+    connection = _connection()
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        connection.executemany(
+            'DELETE FROM transfer_text WHERE rowid = ?',
+            [(document_rowid(source, source_id),) for source, source_id, _, _ in documents],
+        )
+        connection.executemany(
+            'INSERT INTO transfer_text (rowid, source, source_id, transaction_id, body) VALUES (?, ?, ?, ?, ?)',
+            [
+                (document_rowid(source, source_id), source, source_id, transaction_id, body)
+                for source, source_id, transaction_id, body in documents if body
+            ],
+        )
+        connection.execute('COMMIT')
+    except Exception:
+        connection.execute('ROLLBACK')
+        raise
+
+
+def index_transfer(transfer):
+    """Index the notes of an xx_BudgetTransfer"""
+    _write_documents([(SOURCE_TRANSFER, transfer.transaction_id, transfer.transaction_id, _body(transfer.notes))])
+
+
+def index_transfer_line(line):
+    """Index the reason, account name and cost center name of an xx_TransactionTransfer"""
+    _write_documents([(
+        SOURCE_LINE,
+        line.transfer_id,
+        line.transaction_id,
+        _body(line.reason, line.account_name, line.cost_center_name),
+    )])
+
+
+def remove_transfer(transaction_id):
+    """Drop a transfer and its lines from the index"""
+    connection = _connection()
+    connection.execute('DELETE FROM transfer_text WHERE transaction_id = ?', (transaction_id,))
+
+
+def remove_transfer_line(transfer_id):
+    """Drop a transfer line from the index"""
+    connection = _connection()
+    connection.execute('DELETE FROM transfer_text WHERE rowid = ?', (document_rowid(SOURCE_LINE, transfer_id),))
+
+
+def rebuild_transfer_search_index():
+    """
+    Rebuild the side index from the database
+
+    Returns:
+        dict: Documents indexed ('transfers', 'lines')
+    """
+    from adjd_transaction.models import xx_TransactionTransfer
+    from budget_management.models import xx_BudgetTransfer
+
+    connection = _connection()
+    connection.execute('DELETE FROM transfer_text')
+    counts = {'transfers': 0, 'lines': 0}
+
+    batch = []
+    rows = xx_BudgetTransfer.objects.exclude(notes__isnull=True).values_list('transaction_id', 'notes')
+    for transaction_id, notes in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append((SOURCE_TRANSFER, transaction_id, transaction_id, _body(notes)))
+        if len(batch) == BATCH_SIZE:
+            _write_documents(batch)
+            counts['transfers'] += len(batch)
+            batch = []
+    if batch:
+        _write_documents(batch)
+        counts['transfers'] += len(batch)
+
+    batch = []
+    rows = xx_TransactionTransfer.objects.values_list(
+        'transfer_id', 'transaction_id', 'reason', 'account_name', 'cost_center_name'
+    )
+    for transfer_id, transaction_id, reason, account_name, cost_center_name in rows.iterator(chunk_size=BATCH_SIZE):
+        batch.append((SOURCE_LINE, transfer_id, transaction_id, _body(reason, account_name, cost_center_name)))
+        if len(batch) == BATCH_SIZE:
+            _write_documents(batch)
+            counts['lines'] += len(batch)
+            batch = []
+    if batch:
+        _write_documents(batch)
+        counts['lines'] += len(batch)
+
+    connection.execute("INSERT INTO transfer_text (transfer_text) VALUES ('optimize')")
+    return counts
+
+
+def match_expression(text):
+    """
+    FTS5 query of the words of text: every word must appear, the last one as
+    a prefix (search as you type)
+
+    Returns:
+        str: The expression, or None when text has no words
+    """
+    words = re.findall(r'\w+', text or '')
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' AND '.join(terms)
+
+
+def search_transfers(text, limit=50):
+    """
+    Transactions whose indexed text matches text, best first
+
+    Returns:
+        list: dicts with 'transaction_id', 'rank' (bm25, lower is better) and
+            'snippet' of the best matching document
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return []
+    connection = _connection()
+    best = connection.execute(
+        "SELECT transaction_id, MIN(rank) AS best FROM transfer_text "
+        "WHERE transfer_text MATCH ? GROUP BY transaction_id ORDER BY best LIMIT ?",
+        (expression, limit),
+    ).fetchall()
+    if not best:
+        return []
+
+    # snippet() cannot be aggregated, take the one of each transaction's best document
+    snippets = {}
+    placeholders = ', '.join('?' * len(best))
+    rows = connection.execute(
+        "SELECT transaction_id, snippet(transfer_text, 3, '[', ']', '...', 12) FROM transfer_text "
+        f"WHERE transfer_text MATCH ? AND transaction_id IN ({placeholders}) ORDER BY rank",
+        [expression] + [transaction_id for transaction_id, _ in best],
+    )
+    for transaction_id, snippet in rows:
+        snippets.setdefault(transaction_id, snippet)
+    return [
+        {'transaction_id': transaction_id, 'rank': rank, 'snippet': snippets.get(transaction_id)}
+        for transaction_id, rank in best
+    ]
@@ -158,6 +158,29 @@ MEDIA_ROOT = BASE_DIR / 'uploads'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Dashboard refresh queue: saves mark the dashboard dirty and a background
+# worker rebuilds it at most once per debounce window
+DASHBOARD_REFRESH_ASYNC = True
+DASHBOARD_REFRESH_DEBOUNCE_SECONDS = 5
+# Window of the daily / weekly request series on the dashboard (monthly is complete)
+DASHBOARD_SERIES_DAYS = 90
+DASHBOARD_SERIES_WEEKS = 104
+# Pivot fund movements older than this are folded into snapshots and deleted
+PIVOT_FUND_JOURNAL_RETENTION_DAYS = 365
+# First month of the fiscal year (fiscal years are named after the year they end in)
+FISCAL_YEAR_START_MONTH = 1
+# In-process cache of pivot funds and transfer rules used by the validations
+PIVOT_CACHE_MAX_ENTRIES = 10000
+PIVOT_CACHE_TTL_SECONDS = 60
+# In-process cache of the users' allowed entity codes (checked against a generation counter)
+ENTITY_SCOPE_CACHE_MAX_ENTRIES = 5000
+ENTITY_SCOPE_CACHE_TTL_SECONDS = 600
+# SQLite FTS5 side index of the transfer notes / line reasons (transfer_search)
+TRANSFER_SEARCH_INDEX_PATH = BASE_DIR / 'transfer_search.sqlite3'
+# Transfer code numbers reserved per process at a time (1: strictly increasing codes, see transfer_codes)
+TRANSFER_CODE_BLOCK_SIZE = 1
+
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
@@ -0,0 +1,97 @@
+"""
+In-process cache of the entity codes each user may work on.
+
+A user's scope is the subtree (XX_EntityClosure) of the entities of their
+abilities, per ability type. Cached scopes carry the generation of
+XX_EntityScopeGeneration they were read at; the signals of xx_UserAbility and
+XX_Entity bump the generation, so every process drops stale scopes on their
+next use at the cost of one primary key read. Entries also expire after
+ENTITY_SCOPE_CACHE_TTL_SECONDS for changes that skip the signals.
+"""
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+
+from account_and_entitys.models import XX_Entity, XX_EntityScopeGeneration
+from public_funtion.hierarchy_closure import subtree_codes
+from public_funtion.lru_cache import LRUCache
+
+
+GENERATION_NAME = 'entity_scope'
+IN_LIST_SIZE = 1000  # Oracle's limit of items in an IN list
+
+_cache = LRUCache(
+    getattr(settings, 'ENTITY_SCOPE_CACHE_MAX_ENTRIES', 5000),
+    getattr(settings, 'ENTITY_SCOPE_CACHE_TTL_SECONDS', 600),
+)
+
+
+def current_generation():
+    """Stored generation of the entity scopes (0 before the first change)"""
+    return (
+        XX_EntityScopeGeneration.objects.filter(name=GENERATION_NAME)
+        .values_list('generation', flat=True)
+        .first()
+    ) or 0
+
+
+def bump_entity_scope_generation():
+    """Mark every cached entity scope stale (abilities or the entity tree changed)"""
+    updated = XX_EntityScopeGeneration.objects.filter(name=GENERATION_NAME).update(
+        generation=F('generation') + 1
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                XX_EntityScopeGeneration.objects.create(name=GENERATION_NAME, generation=1)
+        except IntegrityError:
+            # Created concurrently
+            XX_EntityScopeGeneration.objects.filter(name=GENERATION_NAME).update(
+                generation=F('generation') + 1
+            )
+    _cache.clear()
+
+
+def _load_entity_codes(user_id, Type):
+    # One filter() call, so both conditions apply to the same ability row
+    conditions = {'user_abilities__user_id': user_id}
+    if Type is not None:
+        conditions['user_abilities__Type'] = Type
+    abilities = XX_Entity.objects.filter(**conditions).values('entity')
+    codes = subtree_codes(XX_Entity, abilities).values_list('descendant', flat=True)
+    return tuple(sorted(set(codes)))
+
+
+def get_allowed_entity_codes(user, Type=None):
+    """
+    Entity codes (children included) the user has abilities on
+
+    Args:
+        user: xx_User instance
+        Type (str, optional): Only abilities of this type ('edit' or 'approve'); all when None
+
+    Returns:
+        tuple: Sorted entity codes
+    """
+    generation = current_generation()
+    key = (user.pk, Type)
+    loader = lambda: (generation, _load_entity_codes(user.pk, Type))
+    cached_generation, codes = _cache.get(key, loader)
+    if cached_generation != generation:
+        _cache.discard(lambda cached_key: cached_key == key)
+        cached_generation, codes = _cache.get(key, loader)
+    return codes
+
+
+def entity_codes_q(field, codes):
+    """Q of field IN codes, ORed in lists of at most IN_LIST_SIZE codes"""
+    codes = list(codes)
+    condition = Q(**{f'{field}__in': codes[:IN_LIST_SIZE]})
+    for start in range(IN_LIST_SIZE, len(codes), IN_LIST_SIZE):
+        condition |= Q(**{f'{field}__in': codes[start:start + IN_LIST_SIZE]})
+    return condition
+
+
+def clear_entity_scope_cache():
+    """Forget the cached scopes of this process"""
+    _cache.clear()
@@ -0,0 +1,177 @@
+"""
+Closure tables of the XX_Entity and XX_Account trees.
+
+Both trees link a node to its parent by code (`parent` holds the parent's
+entity / account code). The closure tables store every (ancestor,
+descendant) code pair with its depth, each node being its own ancestor at
+depth 0, so a subtree is a single indexed read on `ancestor`.
+
+The signals of account_and_entitys keep the tables in step with saves and
+deletes one node at a time; changes that skip the signals (bulk loads,
+queryset updates, SQL scripts) need `manage.py rebuild_hierarchy_closure`.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+
+
+def _hierarchies():
+    from account_and_entitys.models import XX_Account, XX_AccountClosure, XX_Entity, XX_EntityClosure
+
+    return {
+        XX_Entity: (XX_EntityClosure, 'entity'),
+        XX_Account: (XX_AccountClosure, 'account'),
+    }
+
+
+def closure_of(model):
+    """(closure model, code field) of XX_Entity or XX_Account"""
+    return _hierarchies()[model]
+
+
+def build_closure_rows(nodes):
+    """
+    Closure pairs of a tree given as code -> parent code
+
+    A node's ancestors are found by walking up its parent codes; the walk
+    stops at a parent that is not a node, or when it comes back to a node
+    already seen (cycles in the data).
+
+    Returns:
+        list: (ancestor, descendant, depth) tuples
+    """
+    rows = []
+    for code in nodes:
+        seen = {code}
+        rows.append((code, code, 0))
+        parent = nodes[code]
+        depth = 1
+        while parent in nodes and parent not in seen:
+            rows.append((parent, code, depth))
+            seen.add(parent)
+            parent = nodes[parent]
+            depth += 1
+    return rows
+
+
+def rebuild_closure(node_model, closure_model, code_field):
+    """
+    Rebuild a closure table from scratch
+
+    Takes the model classes so migrations can pass their historical models.
+
+    Returns:
+        int: Closure rows written
+    """
+    nodes = {
+        str(code): (str(parent) if parent not in (None, '') else None)
+        for code, parent in node_model.objects.values_list(code_field, 'parent').iterator()
+    }
+    rows = build_closure_rows(nodes)
+    with transaction.atomic():
+        closure_model.objects.all().delete()
+        closure_model.objects.bulk_create(
+            [closure_model(ancestor=ancestor, descendant=descendant, depth=depth)
+             for ancestor, descendant, depth in rows],
+            batch_size=BATCH_SIZE,
+        )
+    return len(rows)
+
+
+def rebuild_hierarchy_closures():
+    """
+    Rebuild the entity and account closure tables
+
+    Returns:
+        dict: Closure rows written per table ('entity', 'account')
+    """
+    return {
+        code_field: rebuild_closure(model, closure_model, code_field)
+        for model, (closure_model, code_field) in _hierarchies().items()
+    }
+
+
+def _subtree(closure_model, code):
+    """code -> depth below code of the nodes of its subtree (code included)"""
+    return dict(closure_model.objects.filter(ancestor=code).values_list('descendant', 'depth'))
+
+
+def _detach(closure_model, code):
+    """Cut the subtree of code from the ancestors of code"""
+    subtree = list(_subtree(closure_model, code))
+    if subtree:
+        closure_model.objects.filter(descendant__in=subtree).exclude(ancestor__in=subtree).delete()
+    return subtree
+
+
+def _attach(node_model, closure_model, code_field, code, parent):
+    """
+    Link the subtree of code under parent (when parent is a node)
+
+    Returns:
+        bool: False when parent is inside the subtree; the table is then
+            rebuilt, the walk-up rules decide how the cycle is stored
+    """
+    if parent in (None, '') or not node_model.objects.filter(**{code_field: parent}).exists():
+        return True
+    subtree = _subtree(closure_model, code)
+    if parent in subtree:
+        logger.warning(f"{node_model.__name__} {code} is its own ancestor, rebuilding the closure")
+        rebuild_closure(node_model, closure_model, code_field)
+        return False
+    ancestors = closure_model.objects.filter(descendant=parent).values_list('ancestor', 'depth')
+    closure_model.objects.bulk_create(
+        [
+            closure_model(ancestor=ancestor, descendant=descendant, depth=ancestor_depth + 1 + depth)
+            for ancestor, ancestor_depth in ancestors
+            for descendant, depth in subtree.items()
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    return True
+
+
+def add_node(node_model, code, parent):
+    """A node was created: its own row, then it takes its parent and its orphans"""
+    closure_model, code_field = closure_of(node_model)
+    code = str(code)
+    with transaction.atomic():
+        closure_model.objects.get_or_create(ancestor=code, descendant=code, defaults={'depth': 0})
+        # Nodes created earlier may already point at this code
+        for child in node_model.objects.filter(parent=code).values_list(code_field, flat=True):
+            child = str(child)
+            if child != code and not _attach(node_model, closure_model, code_field, child, code):
+                return
+        _attach(node_model, closure_model, code_field, code, parent)
+
+
+def move_node(node_model, code, parent):
+    """The parent of a node changed: move its subtree under the new parent"""
+    closure_model, code_field = closure_of(node_model)
+    code = str(code)
+    with transaction.atomic():
+        _detach(closure_model, code)
+        _attach(node_model, closure_model, code_field, code, parent)
+
+
+def remove_node(node_model, code):
+    """A node was deleted: its children become roots, as the parent lookup no longer finds it"""
+    closure_model, code_field = closure_of(node_model)
+    code = str(code)
+    with transaction.atomic():
+        _detach(closure_model, code)
+        closure_model.objects.filter(Q(ancestor=code) | Q(descendant=code)).delete()
+
+
+def subtree_codes(node_model, codes):
+    """
+    Codes of the nodes under the given codes, the codes included (as a
+    subquery, e.g. for entity__in / cost_center_code__in filters)
+    """
+    closure_model, _ = closure_of(node_model)
+    return closure_model.objects.filter(ancestor__in=codes).values('descendant')
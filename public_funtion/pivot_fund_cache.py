@@ -0,0 +1,101 @@
+"""
+In-process read-through cache of pivot funds and account/entity limit rules
+for the transfer validations.
+
+Entries are kept in LRU order (PIVOT_CACHE_MAX_ENTRIES) and are dropped by
+the code paths that change them: the ledger posting and the pivot fund /
+limit CRUD views call invalidate_pivot_fund() / invalidate_account_entity_limit(),
+which evict immediately and again when the transaction commits. Other worker
+processes only see their own invalidations, so entries also expire after
+PIVOT_CACHE_TTL_SECONDS.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from account_and_entitys.models import XX_ACCOUNT_ENTITY_LIMIT, XX_PivotFund
+from public_funtion.lru_cache import LRUCache
+
+
+PIVOT_FUND_FIELDS = ('id', 'entity', 'account', 'year', 'budget', 'fund', 'encumbrance', 'actual')
+LIMIT_FIELDS = (
+    'id',
+    'entity_id',
+    'account_id',
+    'is_transer_allowed',
+    'is_transer_allowed_for_source',
+    'is_transer_allowed_for_target',
+    'source_count',
+    'target_count',
+)
+
+
+_cache = LRUCache(
+    getattr(settings, 'PIVOT_CACHE_MAX_ENTRIES', 10000),
+    getattr(settings, 'PIVOT_CACHE_TTL_SECONDS', 60),
+)
+
+
+def get_cached_pivot_fund(entity, account, year):
+    """
+    Pivot fund of a cost center / account in a fiscal year
+
+    Returns:
+        dict: The fund's PIVOT_FUND_FIELDS, or None if there is no such fund
+    """
+    key = ('fund', str(entity), str(account), int(year))
+    return _cache.get(
+        key,
+        lambda: XX_PivotFund.objects.filter(entity=entity, account=account, year=year)
+        .values(*PIVOT_FUND_FIELDS)
+        .first(),
+    )
+
+
+def get_cached_account_entity_limit(entity, account):
+    """
+    Transfer rules of a cost center / account
+
+    Returns:
+        dict: The rule's LIMIT_FIELDS, or None if no rule exists
+    """
+    key = ('limit', str(entity), str(account))
+    return _cache.get(
+        key,
+        lambda: XX_ACCOUNT_ENTITY_LIMIT.objects.filter(entity_id=str(entity), account_id=str(account))
+        .values(*LIMIT_FIELDS)
+        .first(),
+    )
+
+
+def _invalidate(match):
+    _cache.discard(match)
+    # Readers in other transactions may cache the old row until this one commits
+    transaction.on_commit(lambda: _cache.discard(match))
+
+
+def invalidate_pivot_fund(entity, account, year=None):
+    """Forget a cached pivot fund (every year when year is None)"""
+    entity, account = str(entity), str(account)
+    _invalidate(
+        lambda key: key[0] == 'fund' and key[1] == entity and key[2] == account
+        and (year is None or key[3] == int(year))
+    )
+
+
+def invalidate_pivot_funds(funds):
+    """Forget several cached pivot funds, given as (entity, account, year) tuples"""
+    keys = {('fund', str(entity), str(account), int(year)) for entity, account, year in funds}
+    if keys:
+        _invalidate(lambda key: key in keys)
+
+
+def invalidate_account_entity_limit(entity, account):
+    """Forget the cached transfer rules of a cost center / account"""
+    entity, account = str(entity), str(account)
+    _invalidate(lambda key: key[0] == 'limit' and key[1] == entity and key[2] == account)
+
+
+def clear_pivot_cache():
+    """Forget every cached fund and rule (after bulk imports)"""
+    _cache.clear()
+    transaction.on_commit(_cache.clear)
@@ -0,0 +1,277 @@
+"""
+Bulk pivot fund import / upsert from Excel or CSV.
+
+The file is read in chunks (openpyxl read-only mode for Excel, pandas
+chunked reader for CSV), each chunk is validated column-wise with pandas and
+the valid rows are upserted on (entity, account, year): the existing funds
+of the chunk are read with select_for_update (in the ledger's lock order, so
+an import and a posting cannot interleave), then bulk_update for those and
+bulk_create for the new ones.
+
+Only the amount columns present in the file are written, so a file with just
+budget reloads the budget of a year without touching encumbrance / actual,
+and a blank cell leaves the stored value of an existing fund alone.
+Encumbrance / actual changes to funds the movement journal already tracks are
+journaled as adjustments. Invalid rows are skipped and reported with their
+spreadsheet row number.
+"""
+from decimal import Decimal
+
+import pandas as pd
+from django.db import transaction
+from django.db.models import Q
+
+from account_and_entitys.models import XX_PivotFund, XX_PivotFundMovement, XX_PivotFundSnapshot
+from public_funtion.pivot_fund_cache import clear_pivot_cache
+from public_funtion.pivot_fund_journal import record_movements
+
+
+CHUNK_SIZE = 1000  # rows per chunk, also keeps the IN lists under Oracle's 1000 items
+KEY_COLUMNS = ['entity', 'account', 'year']
+AMOUNT_COLUMNS = ['budget', 'fund', 'actual', 'encumbrance']
+MAX_AMOUNT = Decimal('1e28')  # DecimalField(max_digits=30, decimal_places=2)
+
+
+class PivotFundImportError(Exception):
+    """The file cannot be imported at all (format or missing columns)"""
+
+
+def _normalize_columns(columns):
+    return [str(column).strip().lower() for column in columns]
+
+
+def iter_pivot_fund_chunks(file, file_name, chunk_size=CHUNK_SIZE):
+    """
+    Read a pivot fund file in DataFrame chunks of text cells
+
+    Yields:
+        tuple: (first spreadsheet row number of the chunk, DataFrame)
+    """
+    name = (file_name or '').lower()
+    if name.endswith('.csv'):
+        reader = pd.read_csv(file, dtype=str, keep_default_na=False, chunksize=chunk_size)
+        row_number = 2  # header is row 1
+        for chunk in reader:
+            chunk.columns = _normalize_columns(chunk.columns)
+            yield row_number, chunk
+            row_number += len(chunk)
+        return
+
+    if not name.endswith(('.xlsx', '.xlsm')):
+        raise PivotFundImportError('Please upload a .xlsx or .csv file')
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _normalize_columns(header)
+        row_number = 2
+        batch = []
+        for values in rows:
+            batch.append(['' if value is None else str(value) for value in values])
+            if len(batch) == chunk_size:
+                yield row_number, pd.DataFrame(batch, columns=columns)
+                row_number += len(batch)
+                batch = []
+        if batch:
+            yield row_number, pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def validate_pivot_fund_chunk(frame, amount_columns):
+    """
+    Validate and convert one chunk with column-wise operations
+
+    Args:
+        frame (DataFrame): Text cells with at least the key columns
+        amount_columns (list): Amount columns present in the file
+
+    Returns:
+        tuple: (DataFrame of valid rows with converted values,
+            Series of error lists indexed like frame)
+    """
+    errors = pd.Series([[] for _ in range(len(frame))], index=frame.index, dtype=object)
+
+    def flag(mask, message):
+        for index in frame.index[mask]:
+            errors[index].append(message)
+
+    clean = pd.DataFrame(index=frame.index)
+    for column in ('entity', 'account'):
+        # Excel hands numeric codes over as floats ("100.0")
+        values = frame[column].astype(str).str.strip().str.replace(r'^(\d+)\.0+$', r'\1', regex=True)
+        flag(values == '', f'{column} is required')
+        flag(values.str.len() > 50, f'{column} is longer than 50 characters')
+        clean[column] = values
+
+    years = pd.to_numeric(frame['year'].astype(str).str.strip(), errors='coerce')
+    flag(years.isna() | (years % 1 != 0) | (years < 1900) | (years > 2999), 'year must be a 4 digit year')
+    clean['year'] = years
+
+    for column in amount_columns:
+        text = frame[column].astype(str).str.strip().str.replace(',', '', regex=False)
+        amounts = pd.to_numeric(text, errors='coerce')
+        flag((text != '') & amounts.isna(), f'{column} must be a number')
+        flag(amounts.abs() >= float(MAX_AMOUNT), f'{column} is too large')
+        clean[column] = amounts.round(2)
+
+    valid = errors.map(len) == 0
+    return clean[valid], errors
+
+
+def _to_decimal(value):
+    if value is None or pd.isna(value):
+        return None
+    return Decimal(str(value)).quantize(Decimal('0.01'))
+
+
+def _lock_existing_funds(keys):
+    """
+    Lock the existing funds of the chunk keys, in the ledger's lock order
+    (see post_pivot_fund_lines)
+
+    Returns:
+        dict: (entity, account, year) -> XX_PivotFund
+    """
+    funds = XX_PivotFund.objects.select_for_update().filter(
+        entity__in={key[0] for key in keys},
+        account__in={key[1] for key in keys},
+        year__in={key[2] for key in keys},
+    ).order_by('entity', 'account', 'year', 'id')
+    existing = {}
+    for fund in funds:
+        key = (str(fund.entity), str(fund.account), fund.year)
+        if key in keys:
+            existing[key] = fund
+    return existing
+
+
+def _journaled_funds(keys):
+    """Chunk keys the movement journal tracks (funds with a snapshot)"""
+    condition = Q(entity__in={key[0] for key in keys}) & Q(account__in={key[1] for key in keys})
+    tracked = XX_PivotFundSnapshot.objects.filter(
+        condition, year__in={key[2] for key in keys}
+    ).values_list('entity', 'account', 'year').distinct()
+    return {key for key in tracked if key in keys}
+
+
+def _upsert_chunk(records, amount_columns):
+    """
+    Upsert one chunk of validated records
+
+    Returns:
+        tuple: (created count, updated count)
+    """
+    keys = set(records)
+    existing = _lock_existing_funds(keys)
+
+    # Journal the encumbrance / actual changes of tracked funds as adjustments,
+    # from the locked values so no posting can change them meanwhile
+    movements = []
+    tracked = _journaled_funds(set(existing)) if {'encumbrance', 'actual'} & set(amount_columns) else set()
+    for key in tracked:
+        old = existing[key]
+        new = records[key]
+        encumbrance_delta = Decimal('0')
+        actual_delta = Decimal('0')
+        if new.get('encumbrance') is not None:
+            encumbrance_delta = new['encumbrance'] - (old.encumbrance or Decimal('0'))
+        if new.get('actual') is not None:
+            actual_delta = new['actual'] - (old.actual or Decimal('0'))
+        if encumbrance_delta or actual_delta:
+            movements.append(XX_PivotFundMovement(
+                entity=key[0],
+                account=key[1],
+                year=key[2],
+                decide=0,
+                encumbrance_delta=encumbrance_delta,
+                actual_delta=actual_delta,
+            ))
+
+    to_create = []
+    to_update = []
+    for key, values in records.items():
+        fund = existing.get(key)
+        if fund is None:
+            to_create.append(XX_PivotFund(entity=key[0], account=key[1], year=key[2], **values))
+            continue
+        # Blank cells keep the stored value
+        changed = False
+        for column, value in values.items():
+            if value is not None and value != getattr(fund, column):
+                setattr(fund, column, value)
+                changed = True
+        if changed:
+            to_update.append(fund)
+    if to_create:
+        XX_PivotFund.objects.bulk_create(to_create)
+    if to_update:
+        XX_PivotFund.objects.bulk_update(to_update, amount_columns)
+
+    record_movements(movements)
+    return len(records) - len(existing), len(existing)
+
+
+def import_pivot_funds(file, file_name, dry_run=False, chunk_size=CHUNK_SIZE):
+    """
+    Validate and upsert a pivot fund file
+
+    Args:
+        file: Excel (.xlsx) or CSV file object with the columns entity,
+            account, year and any of budget, fund, actual, encumbrance
+        file_name (str): Name of the file, selects the reader
+        dry_run (bool): Only validate, write nothing
+
+    Returns:
+        dict: 'rows', 'created', 'updated', 'error_count' and 'errors'
+            (one entry per invalid row: 'row' number and 'errors')
+
+    Raises:
+        PivotFundImportError: Unsupported file or missing key columns
+    """
+    summary = {'rows': 0, 'created': 0, 'updated': 0, 'error_count': 0, 'errors': []}
+    seen = {}
+
+    with transaction.atomic():
+        for first_row, frame in iter_pivot_fund_chunks(file, file_name, chunk_size):
+            missing = [column for column in KEY_COLUMNS if column not in frame.columns]
+            if missing:
+                raise PivotFundImportError(f"Missing columns: {', '.join(missing)}")
+            amount_columns = [column for column in AMOUNT_COLUMNS if column in frame.columns]
+
+            frame = frame.reset_index(drop=True)
+            summary['rows'] += len(frame)
+            valid, errors = validate_pivot_fund_chunk(frame, amount_columns)
+
+            records = {}
+            columns = [valid[column] for column in amount_columns]
+            for index, entity, account, year, *amounts in zip(
+                valid.index, valid['entity'], valid['account'], valid['year'], *columns
+            ):
+                key = (entity, account, int(year))
+                if key in seen:
+                    errors[index].append(f'duplicate of row {seen[key]}')
+                    continue
+                seen[key] = first_row + index
+                records[key] = {
+                    column: _to_decimal(amount) for column, amount in zip(amount_columns, amounts)
+                }
+
+            for index, row_errors in errors.items():
+                if row_errors:
+                    summary['error_count'] += 1
+                    summary['errors'].append({'row': first_row + index, 'errors': row_errors})
+
+            if records and not dry_run:
+                created, updated = _upsert_chunk(records, amount_columns)
+                summary['created'] += created
+                summary['updated'] += updated
+
+    if not dry_run:
+        clear_pivot_cache()
+    return summary
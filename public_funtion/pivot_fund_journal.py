@@ -0,0 +1,228 @@
+"""
+Pivot fund movement journal.
+
+Every posting of the ledger (pivot_fund_ledger) appends one
+XX_PivotFundMovement per transfer line in the same transaction as the fund
+update, so the journal is the history of XX_PivotFund. XX_PivotFundSnapshot
+rows materialize the balances at a journal position:
+
+    balance(t) = latest snapshot taken at or before t
+                 + movements after that snapshot created at or before t
+
+`compact_pivot_fund_journal()` folds settled movements into new snapshots
+(only for the funds that moved) and deletes the movements older than the
+retention window once a snapshot covers them. Balances can be replayed
+exactly within the retention window and at snapshot granularity before it.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from account_and_entitys.models import XX_PivotFundMovement, XX_PivotFundSnapshot
+
+
+# Movements younger than this may still have lower ids committing after them
+SETTLE_DELAY = timedelta(minutes=5)
+
+
+def record_movements(movements):
+    """
+    Append movements to the journal (inside the posting transaction)
+
+    Args:
+        movements (list): Unsaved XX_PivotFundMovement objects
+    """
+    if movements:
+        XX_PivotFundMovement.objects.bulk_create(movements, batch_size=1000)
+
+
+def journal_fund_change(before, after):
+    """
+    Record a change made to a fund outside the ledger (the pivot fund views)
+    as adjustment movements, inside the transaction making the change
+
+    Only funds the journal tracks (with a snapshot) are journaled, the others
+    get their baseline from their values at their first posting. A fund that
+    no longer exists counts as zero, so a delete, or an update moving a fund
+    to another entity / account / year, journals the values leaving its key.
+
+    Args:
+        before (XX_PivotFund): The fund as locked before the change, or None
+            for a creation
+        after (XX_PivotFund): The fund as saved, or None for a delete
+    """
+    deltas = {}
+    for fund, sign in ((before, -1), (after, 1)):
+        if fund is None:
+            continue
+        key = (str(fund.entity), str(fund.account), fund.year)
+        encumbrance, actual = deltas.get(key, (Decimal('0'), Decimal('0')))
+        deltas[key] = (
+            encumbrance + sign * (fund.encumbrance or Decimal('0')),
+            actual + sign * (fund.actual or Decimal('0')),
+        )
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+
+    condition = Q()
+    for entity, account, year in deltas:
+        condition |= Q(entity=entity, account=account, year=year)
+    tracked = set(
+        XX_PivotFundSnapshot.objects.filter(condition).values_list('entity', 'account', 'year').distinct()
+    )
+    record_movements([
+        XX_PivotFundMovement(
+            entity=entity,
+            account=account,
+            year=year,
+            decide=0,
+            encumbrance_delta=encumbrance,
+            actual_delta=actual,
+        )
+        for (entity, account, year), (encumbrance, actual) in deltas.items()
+        if (entity, account, year) in tracked
+    ])
+
+
+def ensure_baseline_snapshots(funds):
+    """
+    Snapshot the current values of locked funds the journal does not know yet
+    (funds created by imports), before their first movement is recorded.
+    Baselines sit at position 0: the fund has no earlier movements.
+
+    Args:
+        funds (list): XX_PivotFund rows locked by the caller, not yet changed
+    """
+    condition = Q()
+    for fund in funds:
+        condition |= Q(entity=str(fund.entity), account=str(fund.account), year=fund.year)
+    known = set(
+        XX_PivotFundSnapshot.objects.filter(condition).values_list('entity', 'account', 'year').distinct()
+    )
+    XX_PivotFundSnapshot.objects.bulk_create([
+        XX_PivotFundSnapshot(
+            entity=str(fund.entity),
+            account=str(fund.account),
+            year=fund.year,
+            encumbrance=fund.encumbrance or Decimal('0'),
+            actual=fund.actual or Decimal('0'),
+            last_movement_id=0,
+        )
+        for fund in funds if (str(fund.entity), str(fund.account), fund.year) not in known
+    ])
+
+
+def pivot_fund_balance(entity, account, year=None, as_of=None):
+    """
+    Replay the encumbrance and actual of one fund from the journal
+
+    Args:
+        entity: Cost center code of the fund
+        account: Account code of the fund
+        year (int, optional): Fund year (any year when None, for single-year funds)
+        as_of (datetime, optional): Point in time (now when None)
+
+    Returns:
+        dict: 'encumbrance', 'actual' and 'last_movement_id', or None if no
+            snapshot of the fund exists at that time
+    """
+    # Codes are journaled as text
+    entity, account = str(entity), str(account)
+    snapshots = XX_PivotFundSnapshot.objects.filter(entity=entity, account=account)
+    movements = XX_PivotFundMovement.objects.filter(entity=entity, account=account)
+    if year is not None:
+        snapshots = snapshots.filter(year=year)
+        movements = movements.filter(year=year)
+    if as_of is not None:
+        snapshots = snapshots.filter(created_at__lte=as_of)
+        movements = movements.filter(created_at__lte=as_of)
+
+    snapshot = snapshots.order_by('-created_at', '-id').first()
+    if snapshot is None:
+        return None
+
+    totals = movements.filter(id__gt=snapshot.last_movement_id).aggregate(
+        encumbrance=Sum('encumbrance_delta'), actual=Sum('actual_delta'), last_id=Max('id')
+    )
+    return {
+        'encumbrance': snapshot.encumbrance + (totals['encumbrance'] or Decimal('0')),
+        'actual': snapshot.actual + (totals['actual'] or Decimal('0')),
+        'last_movement_id': totals['last_id'] or snapshot.last_movement_id,
+    }
+
+
+def compact_pivot_fund_journal(retention_days=None, now=None):
+    """
+    Fold settled movements into snapshots, then delete movements older than
+    the retention window that a snapshot already covers.
+
+    Each run folds every movement in (previous position, new position], so a
+    snapshot exists for every fund that moved and the runs chain exactly.
+
+    Args:
+        retention_days (int, optional): Defaults to PIVOT_FUND_JOURNAL_RETENTION_DAYS
+        now (datetime, optional): Reference time (timezone.now() when None)
+
+    Returns:
+        dict: 'snapshots' created, 'movements_deleted' and the new 'position'
+    """
+    if retention_days is None:
+        retention_days = getattr(settings, 'PIVOT_FUND_JOURNAL_RETENTION_DAYS', 365)
+    now = now or timezone.now()
+
+    with transaction.atomic():
+        previous_position = (
+            XX_PivotFundSnapshot.objects.aggregate(position=Max('last_movement_id'))['position'] or 0
+        )
+        position = XX_PivotFundMovement.objects.filter(
+            id__gt=previous_position, created_at__lte=now - SETTLE_DELAY
+        ).aggregate(position=Max('id'))['position']
+
+        created = 0
+        if position:
+            moved = (
+                XX_PivotFundMovement.objects.filter(id__gt=previous_position, id__lte=position)
+                .values('entity', 'account', 'year')
+                .annotate(encumbrance=Sum('encumbrance_delta'), actual=Sum('actual_delta'))
+            )
+            snapshots = []
+            for row in moved.iterator():
+                # Only the movements after the latest snapshot are being folded
+                latest = (
+                    XX_PivotFundSnapshot.objects.filter(
+                        entity=row['entity'], account=row['account'], year=row['year']
+                    )
+                    .order_by('-created_at', '-id')
+                    .first()
+                )
+                base_encumbrance = latest.encumbrance if latest else Decimal('0')
+                base_actual = latest.actual if latest else Decimal('0')
+                snapshots.append(XX_PivotFundSnapshot(
+                    entity=row['entity'],
+                    account=row['account'],
+                    year=row['year'],
+                    encumbrance=base_encumbrance + (row['encumbrance'] or Decimal('0')),
+                    actual=base_actual + (row['actual'] or Decimal('0')),
+                    last_movement_id=position,
+                ))
+            XX_PivotFundSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+            created = len(snapshots)
+        else:
+            position = previous_position
+
+        # Movements before the horizon are deleted up to the last position
+        # snapshotted before it, so replay stays exact from the horizon on
+        horizon = now - timedelta(days=retention_days)
+        covered = XX_PivotFundSnapshot.objects.filter(created_at__lte=horizon).aggregate(
+            position=Max('last_movement_id')
+        )['position'] or 0
+        deleted = 0
+        if covered:
+            deleted, _ = XX_PivotFundMovement.objects.filter(id__lte=covered).delete()
+
+    return {'snapshots': created, 'movements_deleted': deleted, 'position': position}
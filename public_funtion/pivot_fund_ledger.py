@@ -0,0 +1,228 @@
+"""
+Set-based pivot fund ledger posting.
+
+`post_pivot_fund_lines()` posts every line of a transfer at once: the
+affected XX_PivotFund rows are locked with SELECT ... FOR UPDATE in a fixed
+order (entity, account, year, id), the encumbrance / actual deltas of all the
+lines are summed per fund and written back with one bulk UPDATE, all inside a
+single database transaction. Each line is also appended to the movement
+journal (pivot_fund_journal) in that transaction. Concurrent submissions and approvals touching
+the same funds therefore wait for each other instead of overwriting each
+other's totals, and locking in the same order everywhere avoids deadlocks.
+
+The decide codes are those of update_pivot_fund:
+    1  sent for approval  encumbrance += from_center
+    2  approved           encumbrance -= from_center, or actual += to_center
+    3  rejected           encumbrance += from_center
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+
+from account_and_entitys.models import XX_PivotFund, XX_PivotFundMovement
+from public_funtion.pivot_fund_cache import invalidate_pivot_funds
+from public_funtion.pivot_fund_lookup import get_transfer_fiscal_year
+from public_funtion.pivot_fund_journal import ensure_baseline_snapshots, record_movements
+
+
+class PivotFundPostingError(Exception):
+    """Raised by callers to roll back their transaction when a posting failed"""
+
+    def __init__(self, result):
+        super().__init__(result.get('error'))
+        self.result = result
+
+
+def to_decimal(value):
+    """Decimal for amounts that may be None, blank strings or floats"""
+    if value in (None, '', ' '):
+        return Decimal('0')
+    return Decimal(str(value).strip())
+
+
+def line_deltas(from_center, to_center, decide):
+    """
+    Encumbrance and actual change caused by one transfer line
+
+    Returns:
+        tuple: (encumbrance delta, actual delta) as Decimals
+    """
+    from_center = to_decimal(from_center)
+    to_center = to_decimal(to_center)
+    if decide == 1:
+        return from_center, Decimal('0')
+    if decide == 2:
+        if from_center > 0:
+            return -from_center, Decimal('0')
+        if to_center > 0:
+            return Decimal('0'), to_center
+    elif decide == 3:
+        if from_center > 0:
+            return from_center, Decimal('0')
+    return Decimal('0'), Decimal('0')
+
+
+def _line_values(line):
+    """
+    (cost center, account, from_center, to_center, transaction id, line id) of
+    a transfer line, dict or tuple (the ids are None when not given)
+    """
+    if isinstance(line, dict):
+        return (
+            line.get('cost_center_code'),
+            line.get('account_code'),
+            line.get('from_center'),
+            line.get('to_center'),
+            line.get('transaction_id'),
+            line.get('transfer_id'),
+        )
+    if isinstance(line, (tuple, list)):
+        return (tuple(line) + (None, None))[:6]
+    return (
+        line.cost_center_code,
+        line.account_code,
+        line.from_center,
+        line.to_center,
+        line.transaction_id,
+        line.transfer_id,
+    )
+
+
+def post_pivot_fund_lines(lines, decide, fiscal_year=None):
+    """
+    Post the lines of one transfer to the pivot funds in a single transaction.
+    Nothing is written if a line has no pivot fund (or an ambiguous one).
+
+    The funds of the transfer's fiscal year are used: fiscal_year when given,
+    else the year of the lines' transfer (see pivot_fund_lookup). Lines
+    without a transfer and no fiscal_year match any year and fail when
+    several years are loaded.
+
+    Call it inside the caller's transaction.atomic() to make the posting part
+    of a larger unit (e.g. the status change of the transfer); the locks are
+    then held until that transaction ends.
+
+    Args:
+        lines: xx_TransactionTransfer objects, dicts or
+            (cost_center_code, account_code, from_center, to_center) tuples
+        decide (int): 1 submit, 2 approve, 3 reject
+        fiscal_year (int, optional): Fiscal year of the funds
+
+    Returns:
+        dict: 'status' ('updated' or 'failed'), 'updates' with the before and
+            after encumbrance / actual per fund, and on failure 'error' with
+            'missing_pivot_funds' / 'ambiguous_pivot_funds'
+    """
+    # Sum the deltas per fund first, a fund is updated once however many lines hit it
+    deltas = {}
+    journal = []
+    for line in lines:
+        (cost_center_code, account_code, from_center, to_center,
+         transaction_id, transfer_id) = _line_values(line)
+        key = (str(cost_center_code), str(account_code))
+        encumbrance, actual = line_deltas(from_center, to_center, decide)
+        journal.append((key, transaction_id, transfer_id, encumbrance, actual))
+        entry = deltas.setdefault(key, {
+            'from_center': Decimal('0'),
+            'to_center': Decimal('0'),
+            'encumbrance': Decimal('0'),
+            'actual': Decimal('0'),
+            'lines': 0,
+        })
+        entry['from_center'] += to_decimal(from_center)
+        entry['to_center'] += to_decimal(to_center)
+        entry['encumbrance'] += encumbrance
+        entry['actual'] += actual
+        entry['lines'] += 1
+
+    if not deltas:
+        return {'status': 'updated', 'updates': []}
+
+    if fiscal_year is None:
+        transaction_id = next((line[1] for line in journal if line[1] is not None), None)
+        if transaction_id is not None:
+            fiscal_year = get_transfer_fiscal_year(transaction_id)
+
+    # Point reads on the (entity, account, year) unique index
+    condition = Q()
+    for entity, account in deltas:
+        if fiscal_year is None:
+            condition |= Q(entity=entity, account=account)
+        else:
+            condition |= Q(entity=entity, account=account, year=fiscal_year)
+
+    with transaction.atomic():
+        funds = list(
+            XX_PivotFund.objects.select_for_update()
+            .filter(condition)
+            .order_by('entity', 'account', 'year', 'id')
+        )
+        funds_by_key = {}
+        for fund in funds:
+            # The columns are numbers in some databases, compare the codes as text
+            funds_by_key.setdefault((str(fund.entity), str(fund.account)), []).append(fund)
+
+        missing = [
+            {'cost_center_code': entity, 'account_code': account, 'year': fiscal_year}
+            for entity, account in deltas if (entity, account) not in funds_by_key
+        ]
+        ambiguous = [
+            {'cost_center_code': entity, 'account_code': account, 'years': [fund.year for fund in matches]}
+            for (entity, account), matches in funds_by_key.items() if len(matches) > 1
+        ]
+        if missing or ambiguous:
+            return {
+                'status': 'failed',
+                'error': 'Pivot fund not found' if missing else 'Several pivot funds match',
+                'missing_pivot_funds': missing,
+                'ambiguous_pivot_funds': ambiguous,
+                'updates': [],
+            }
+
+        ensure_baseline_snapshots([matches[0] for matches in funds_by_key.values()])
+
+        updates = []
+        changed = []
+        for (entity, account), entry in sorted(deltas.items()):
+            fund = funds_by_key[(entity, account)][0]
+            old_encumbrance = to_decimal(fund.encumbrance)
+            old_actual = to_decimal(fund.actual)
+            fund.encumbrance = old_encumbrance + entry['encumbrance']
+            fund.actual = old_actual + entry['actual']
+            if entry['encumbrance'] or entry['actual']:
+                changed.append(fund)
+            updates.append({
+                'cost_center_code': entity,
+                'account_code': account,
+                'year': fund.year,
+                'lines': entry['lines'],
+                'from_center': entry['from_center'],
+                'to_center': entry['to_center'],
+                'status': 'updated seccessfully',
+                'encumbrance_old_value': old_encumbrance,
+                'encumbrance_new_value': fund.encumbrance,
+                'actual_old_value': old_actual,
+                'actual_new_value': fund.actual,
+            })
+
+        # One UPDATE ... CASE statement for all the changed funds
+        if changed:
+            XX_PivotFund.objects.bulk_update(changed, ['encumbrance', 'actual'])
+            invalidate_pivot_funds([(fund.entity, fund.account, fund.year) for fund in changed])
+
+        record_movements([
+            XX_PivotFundMovement(
+                entity=key[0],
+                account=key[1],
+                year=funds_by_key[key][0].year,
+                transaction_id=transaction_id,
+                transfer_id=transfer_id,
+                decide=decide,
+                encumbrance_delta=encumbrance,
+                actual_delta=actual,
+            )
+            for key, transaction_id, transfer_id, encumbrance, actual in journal
+        ])
+
+    return {'status': 'updated', 'updates': updates}
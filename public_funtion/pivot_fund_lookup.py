@@ -0,0 +1,134 @@
+"""
+Fiscal-year aware pivot fund access.
+
+XX_PivotFund is unique on (entity, account, year); lookups filter on all
+three columns so they are point reads on that composite index however many
+years are loaded. The year of a transfer is its `fy`, or the fiscal year of
+its `transaction_date`, or the current fiscal year.
+"""
+import re
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import DecimalField, F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from account_and_entitys.models import XX_PivotFund
+
+
+def fiscal_year_of(day):
+    """
+    Fiscal year containing a date; fiscal years are named after the calendar
+    year they end in (FISCAL_YEAR_START_MONTH, default January)
+    """
+    start_month = getattr(settings, 'FISCAL_YEAR_START_MONTH', 1)
+    if start_month > 1 and day.month >= start_month:
+        return day.year + 1
+    return day.year
+
+
+def parse_transaction_date(value):
+    """transaction_date (stored as text) as a date, or None if it has no usable date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not value:
+        return None
+    value = str(value).strip()
+    for date_format in ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d'):
+        try:
+            return datetime.strptime(value[:10], date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def resolve_fiscal_year(fy=None, transaction_date=None):
+    """
+    Fiscal year of a transfer
+
+    Args:
+        fy (int, optional): The transfer's fy, used when set
+        transaction_date (str/date, optional): Used when fy is not set
+
+    Returns:
+        int: Fiscal year (the current one when neither gives a year)
+    """
+    if fy not in (None, ''):
+        return int(fy)
+    day = parse_transaction_date(transaction_date)
+    if day is not None:
+        return fiscal_year_of(day)
+    if transaction_date:
+        # Unknown date format, fall back on a four digit year in it
+        match = re.search(r'(19|20)\d{2}', str(transaction_date))
+        if match:
+            return int(match.group(0))
+    return fiscal_year_of(timezone.localdate())
+
+
+def get_transfer_fiscal_year(transfer):
+    """
+    Fiscal year of an xx_BudgetTransfer (object or transaction id)
+
+    Returns:
+        int: Fiscal year, see resolve_fiscal_year()
+    """
+    if hasattr(transfer, 'transaction_date'):
+        return resolve_fiscal_year(transfer.fy, transfer.transaction_date)
+
+    from budget_management.models import xx_BudgetTransfer
+
+    values = xx_BudgetTransfer.objects.filter(pk=transfer).values('fy', 'transaction_date').first()
+    if values is None:
+        return resolve_fiscal_year()
+    return resolve_fiscal_year(values['fy'], values['transaction_date'])
+
+
+def get_pivot_fund(entity, account, year):
+    """
+    The pivot fund of a cost center / account for a fiscal year
+
+    Returns:
+        XX_PivotFund: The fund, or None if there is none for that year
+    """
+    return XX_PivotFund.objects.filter(entity=entity, account=account, year=year).first()
+
+
+def get_pivot_funds_bulk(pairs, year):
+    """
+    Pivot funds of many cost center / account pairs for one fiscal year, in a
+    single query: the pairs are ORed (entity, account, year) index lookups,
+    the portable form of a tuple IN list
+
+    Available is computed by the database as budget - encumbrance - actual
+    (missing amounts count as 0).
+
+    Args:
+        pairs (list): (entity, account) tuples
+        year (int): Fiscal year of the funds
+
+    Returns:
+        dict: (entity, account) as text -> dict with entity, account, year,
+            budget, fund, actual, encumbrance and available
+    """
+    pairs = {(str(entity), str(account)) for entity, account in pairs}
+    if not pairs:
+        return {}
+
+    condition = Q()
+    for entity, account in pairs:
+        condition |= Q(entity=entity, account=account)
+
+    zero = Value(Decimal('0'), output_field=DecimalField(max_digits=30, decimal_places=2))
+    rows = (
+        XX_PivotFund.objects.filter(condition, year=year)
+        .annotate(
+            available=Coalesce(F('budget'), zero) - Coalesce(F('encumbrance'), zero) - Coalesce(F('actual'), zero)
+        )
+        .values('entity', 'account', 'year', 'budget', 'fund', 'actual', 'encumbrance', 'available')
+    )
+    return {(str(row['entity']), str(row['account'])): row for row in rows}
@@ -0,0 +1,398 @@
+"""
+Pivot fund reconciliation.
+
+Two checks, each run over the data in chunks so memory stays bounded:
+
+1. Transfers against the journal. The postings a transfer should have made
+   follow from its state: submitted (status_level >= 2) posts decide 1,
+   reaching the last approval level posts decide 2, and every rejection
+   (status_level -1, or a reject reason of a reopened transfer) is a
+   submit + reject pair. The expected deltas of a transaction's lines are
+   compared with the movements journaled for the transaction, per fund; a
+   difference is drift left by a posting that failed partway. The comparison
+   is not per line: saving a transaction deletes and recreates its lines, so
+   movements can carry line ids that no longer exist.
+
+2. XX_PivotFund against the journal replay (snapshot + later movements),
+   which finds balances changed outside the ledger.
+
+Only transfers requested since journal_start() are checked, the postings of
+older ones may predate the journal or have been compacted away: an earlier
+`since` is moved up to it, otherwise every older transfer would show as
+unposted and repair would post it a second time.
+
+With repair, transfer drift is posted to the fund as an adjustment movement
+(decide 0) of the transaction, so the next run finds it settled, and
+journal drift is recorded as an adjustment bringing the journal to the fund.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+
+from account_and_entitys.models import XX_PivotFund, XX_PivotFundMovement, XX_PivotFundSnapshot
+from adjd_transaction.models import xx_TransactionTransfer
+from budget_management.models import xx_BudgetTransfer, xx_BudgetTransferRejectReason
+from public_funtion.pivot_fund_cache import invalidate_pivot_funds
+from public_funtion.pivot_fund_journal import ensure_baseline_snapshots, record_movements
+from public_funtion.pivot_fund_ledger import line_deltas, to_decimal
+from public_funtion.pivot_fund_lookup import resolve_fiscal_year
+
+
+CHUNK_SIZE = 500  # transfers (or funds) per chunk, keeps the IN lists under 1000 items
+
+
+def max_approval_level(code):
+    """Last approval level of a transfer, by its code prefix (as in the approval view)"""
+    prefix = (code or '').split('-')[0]
+    return 4 if prefix in ('FAR', 'AFR') else 3
+
+
+def transfer_postings(status_level, code, rejections=0):
+    """
+    Decide codes the workflow has posted for a transfer in its current state
+
+    Args:
+        status_level (int): The transfer's status_level
+        code (str): The transfer's code
+        rejections (int): Reject reasons recorded for the transfer
+
+    Returns:
+        list: Decide codes (1 submit, 2 approve, 3 reject)
+    """
+    status_level = status_level or 0
+    if status_level == -1:
+        rejections = max(rejections, 1)
+    postings = [1, 3] * rejections
+    if status_level >= 2:
+        postings.append(1)
+        if status_level >= max_approval_level(code):
+            postings.append(2)
+    return postings
+
+
+def expected_line_deltas(from_center, to_center, postings):
+    """Encumbrance and actual a transfer line should have posted in total"""
+    encumbrance = Decimal('0')
+    actual = Decimal('0')
+    for decide in postings:
+        encumbrance_delta, actual_delta = line_deltas(from_center, to_center, decide)
+        encumbrance += encumbrance_delta
+        actual += actual_delta
+    return encumbrance, actual
+
+
+def journal_start():
+    """
+    Time from which every posting is still in the journal: the last compaction
+    that deleted movements, or else the first (baseline) snapshot
+
+    Returns:
+        datetime: None when the journal is empty
+    """
+    first_movement = XX_PivotFundMovement.objects.aggregate(id=Min('id'))['id']
+    compacted = XX_PivotFundSnapshot.objects.filter(last_movement_id__gt=0)
+    if first_movement is not None:
+        # Movements up to these snapshots' positions were deleted
+        compacted = compacted.filter(last_movement_id__lt=first_movement)
+    start = compacted.aggregate(start=Max('created_at'))['start']
+    if start is None:
+        start = XX_PivotFundSnapshot.objects.aggregate(start=Min('created_at'))['start']
+    return start
+
+
+def _fund_rows(keys, model, fields):
+    """Rows of model for (entity, account, year) text keys, read with IN lists"""
+    rows = model.objects.filter(
+        entity__in={key[0] for key in keys},
+        account__in={key[1] for key in keys},
+        year__in={key[2] for key in keys},
+    ).values(*fields)
+    return [row for row in rows if (str(row['entity']), str(row['account']), row['year']) in keys]
+
+
+def _transfer_chunk_drift(transfers):
+    """
+    Expected minus journaled deltas of a chunk of transfers, per fund
+
+    Returns:
+        dict: (entity, account, year, transaction id) ->
+            (encumbrance drift, actual drift), only the entries that drifted
+    """
+    ids = [transfer['transaction_id'] for transfer in transfers]
+    rejections = dict(
+        xx_BudgetTransferRejectReason.objects.filter(Transcation_id__in=ids)
+        .values_list('Transcation_id')
+        .annotate(count=Count('id'))
+    )
+
+    expected = {}
+    by_id = {transfer['transaction_id']: transfer for transfer in transfers}
+    lines = xx_TransactionTransfer.objects.filter(transaction_id__in=ids).values_list(
+        'transaction_id', 'cost_center_code', 'account_code', 'from_center', 'to_center'
+    )
+    zero = (Decimal('0'), Decimal('0'))
+    for transaction_id, entity, account, from_center, to_center in lines:
+        if entity is None or account is None:
+            continue
+        transfer = by_id[transaction_id]
+        postings = transfer_postings(
+            transfer['status_level'], transfer['code'], rejections.get(transaction_id, 0)
+        )
+        year = resolve_fiscal_year(transfer['fy'], transfer['transaction_date'])
+        key = (str(entity), str(account), year, transaction_id)
+        encumbrance, actual = expected_line_deltas(from_center, to_center, postings)
+        total_encumbrance, total_actual = expected.get(key, zero)
+        expected[key] = (total_encumbrance + encumbrance, total_actual + actual)
+
+    posted = {}
+    movements = (
+        XX_PivotFundMovement.objects.filter(transaction_id__in=ids)
+        .values('entity', 'account', 'year', 'transaction_id')
+        .annotate(encumbrance=Sum('encumbrance_delta'), actual=Sum('actual_delta'))
+    )
+    for row in movements:
+        key = (row['entity'], row['account'], row['year'], row['transaction_id'])
+        posted[key] = (to_decimal(row['encumbrance']), to_decimal(row['actual']))
+
+    drift = {}
+    for key in expected.keys() | posted.keys():
+        expected_encumbrance, expected_actual = expected.get(key, zero)
+        posted_encumbrance, posted_actual = posted.get(key, zero)
+        difference = (expected_encumbrance - posted_encumbrance, expected_actual - posted_actual)
+        if difference != zero:
+            drift[key] = difference
+    return drift
+
+
+def _lock_funds(keys):
+    """Lock the funds of (entity, account, year) text keys, in the ledger's lock order"""
+    funds = XX_PivotFund.objects.select_for_update().filter(
+        entity__in={key[0] for key in keys},
+        account__in={key[1] for key in keys},
+        year__in={key[2] for key in keys},
+    ).order_by('entity', 'account', 'year', 'id')
+    return {
+        (str(fund.entity), str(fund.account), fund.year): fund
+        for fund in funds if (str(fund.entity), str(fund.account), fund.year) in keys
+    }
+
+
+def _repair_transfer_drift(drift):
+    """
+    Post the drift of transfers to their funds as adjustments
+
+    Returns:
+        list: Fund keys that do not exist (their drift is left as is)
+    """
+    fund_keys = {key[:3] for key in drift}
+    funds = _lock_funds(fund_keys)
+    ensure_baseline_snapshots(list(funds.values()))
+
+    movements = []
+    for (entity, account, year, transaction_id), (encumbrance, actual) in sorted(drift.items()):
+        fund = funds.get((entity, account, year))
+        if fund is None:
+            continue
+        fund.encumbrance = to_decimal(fund.encumbrance) + encumbrance
+        fund.actual = to_decimal(fund.actual) + actual
+        movements.append(XX_PivotFundMovement(
+            entity=entity,
+            account=account,
+            year=year,
+            transaction_id=transaction_id,
+            decide=0,
+            encumbrance_delta=encumbrance,
+            actual_delta=actual,
+        ))
+
+    if funds:
+        XX_PivotFund.objects.bulk_update(list(funds.values()), ['encumbrance', 'actual'])
+        invalidate_pivot_funds(funds.keys())
+    record_movements(movements)
+    return sorted(fund_keys - funds.keys())
+
+
+def _journal_balances(keys):
+    """
+    Journal replay of several funds: latest snapshot plus the movements after it
+
+    Returns:
+        dict: (entity, account, year) -> (encumbrance, actual), funds with a snapshot only
+    """
+    latest = {}
+    snapshots = _fund_rows(
+        keys, XX_PivotFundSnapshot,
+        ('entity', 'account', 'year', 'encumbrance', 'actual', 'last_movement_id', 'created_at', 'id'),
+    )
+    for row in sorted(snapshots, key=lambda row: (row['created_at'], row['id'])):
+        latest[(row['entity'], row['account'], row['year'])] = row
+
+    balances = {
+        key: (to_decimal(row['encumbrance']), to_decimal(row['actual']))
+        for key, row in latest.items()
+    }
+    # Snapshots of one compaction run share a position, so there are few of them
+    positions = {}
+    for key, row in latest.items():
+        positions.setdefault(row['last_movement_id'], set()).add(key)
+    for position, position_keys in positions.items():
+        movements = (
+            XX_PivotFundMovement.objects.filter(
+                entity__in={key[0] for key in position_keys},
+                account__in={key[1] for key in position_keys},
+                year__in={key[2] for key in position_keys},
+                id__gt=position,
+            )
+            .values('entity', 'account', 'year')
+            .annotate(encumbrance=Sum('encumbrance_delta'), actual=Sum('actual_delta'))
+        )
+        for row in movements:
+            key = (row['entity'], row['account'], row['year'])
+            if key in position_keys:
+                encumbrance, actual = balances[key]
+                balances[key] = (encumbrance + to_decimal(row['encumbrance']), actual + to_decimal(row['actual']))
+    return balances
+
+
+def _journal_chunk_drift(funds):
+    """
+    Funds of a chunk whose values differ from their journal replay
+
+    Args:
+        funds (list): XX_PivotFund rows (objects or values dicts)
+
+    Returns:
+        list: Drift entries with the ledger and journal values
+    """
+    values = {}
+    for fund in funds:
+        if isinstance(fund, dict):
+            key = (str(fund['entity']), str(fund['account']), fund['year'])
+            values[key] = (to_decimal(fund['encumbrance']), to_decimal(fund['actual']))
+        else:
+            key = (str(fund.entity), str(fund.account), fund.year)
+            values[key] = (to_decimal(fund.encumbrance), to_decimal(fund.actual))
+
+    drift = []
+    for key, (journal_encumbrance, journal_actual) in _journal_balances(set(values)).items():
+        ledger_encumbrance, ledger_actual = values[key]
+        if (ledger_encumbrance, ledger_actual) != (journal_encumbrance, journal_actual):
+            drift.append({
+                'entity': key[0],
+                'account': key[1],
+                'year': key[2],
+                'ledger_encumbrance': ledger_encumbrance,
+                'journal_encumbrance': journal_encumbrance,
+                'ledger_actual': ledger_actual,
+                'journal_actual': journal_actual,
+            })
+    return drift
+
+
+def reconcile_pivot_funds(repair=False, since=None, chunk_size=CHUNK_SIZE):
+    """
+    Reconcile the pivot funds with the transfers and the movement journal
+
+    Args:
+        repair (bool): Post the differences as adjustments instead of only
+            reporting them
+        since (datetime, optional): Check the transfers requested from then on
+            (default, and at the earliest: journal_start())
+        chunk_size (int): Transfers / funds read per chunk
+
+    Returns:
+        dict: 'since' (the start actually used), 'since_clamped' (True when
+            the given since was before the journal), 'transfers' and 'funds' checked, 'transfer_drift' (per
+            fund: 'encumbrance' / 'actual' drift and the 'transactions'),
+            'journal_drift' (funds whose values differ from the journal),
+            'missing_pivot_funds' and 'repaired'
+    """
+    start = journal_start()
+    since_clamped = since is not None and (start is None or since < start)
+    if since is None or since_clamped:
+        since = start
+
+    summary = {
+        'since': since,
+        'since_clamped': since_clamped,
+        'transfers': 0,
+        'funds': 0,
+        'transfer_drift': [],
+        'journal_drift': [],
+        'missing_pivot_funds': [],
+        'repaired': repair,
+    }
+
+    # 1. Transfers against their journaled movements
+    fund_drift = {}
+    last_id = 0
+    while since is not None:
+        with transaction.atomic():
+            transfers = xx_BudgetTransfer.objects.filter(
+                request_date__gte=since, transaction_id__gt=last_id
+            ).order_by('transaction_id')
+            if repair:
+                # Approvals lock the transfer too, so none is decided meanwhile
+                transfers = transfers.select_for_update()
+            transfers = list(
+                transfers.values('transaction_id', 'code', 'status_level', 'fy', 'transaction_date')[:chunk_size]
+            )
+            if not transfers:
+                break
+            last_id = transfers[-1]['transaction_id']
+            summary['transfers'] += len(transfers)
+
+            drift = _transfer_chunk_drift(transfers)
+            if drift and repair:
+                summary['missing_pivot_funds'].extend(_repair_transfer_drift(drift))
+
+        for (entity, account, year, transaction_id), (encumbrance, actual) in drift.items():
+            entry = fund_drift.setdefault((entity, account, year), {
+                'entity': entity,
+                'account': account,
+                'year': year,
+                'encumbrance': Decimal('0'),
+                'actual': Decimal('0'),
+                'transactions': set(),
+            })
+            entry['encumbrance'] += encumbrance
+            entry['actual'] += actual
+            entry['transactions'].add(transaction_id)
+
+    for key in sorted(fund_drift):
+        entry = fund_drift[key]
+        entry['transactions'] = sorted(entry['transactions'])
+        summary['transfer_drift'].append(entry)
+
+    # 2. Fund values against the journal replay
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            funds = XX_PivotFund.objects.filter(id__gt=last_id).order_by('id')
+            if repair:
+                funds = list(funds.select_for_update()[:chunk_size])
+            else:
+                funds = list(funds.values('id', 'entity', 'account', 'year', 'encumbrance', 'actual')[:chunk_size])
+            if not funds:
+                break
+            last_id = funds[-1].id if repair else funds[-1]['id']
+            summary['funds'] += len(funds)
+
+            drift = _journal_chunk_drift(funds)
+            if drift and repair:
+                # The fund is the reference for changes made outside the ledger
+                record_movements([
+                    XX_PivotFundMovement(
+                        entity=entry['entity'],
+                        account=entry['account'],
+                        year=entry['year'],
+                        decide=0,
+                        encumbrance_delta=entry['ledger_encumbrance'] - entry['journal_encumbrance'],
+                        actual_delta=entry['ledger_actual'] - entry['journal_actual'],
+                    )
+                    for entry in drift
+                ])
+            summary['journal_drift'].extend(drift)
+
+    return summary
@@ -4,3 +4,9 @@ class UserManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_management'
     verbose_name = 'User Management'
+
+    def ready(self):
+        """
+        Register the signals invalidating the cached user entity scopes
+        """
+        from . import signals  # noqa: F401
@@ -0,0 +1,23 @@
+"""
+Django signals for xx_UserAbility
+Ability changes make the cached user entity scopes stale
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+import logging
+from .models import xx_UserAbility
+from public_funtion.entity_scope_cache import bump_entity_scope_generation
+
+logger = logging.getLogger('user_ability_signals')
+
+
+@receiver(post_save, sender=xx_UserAbility)
+@receiver(post_delete, sender=xx_UserAbility)
+def user_ability_changed(sender, instance, **kwargs):
+    """
+    Function executed AFTER saving or deleting xx_UserAbility
+    """
+    try:
+        bump_entity_scope_generation()
+    except Exception as e:
+        logger.error(f"Error in user_ability_changed: {str(e)}")